@@ -1,84 +1,57 @@
 import streamlit as st
-import os
 import json
-import plotly.express as px
-import plotly.graph_objects as go
-from datetime import datetime
-from dotenv import load_dotenv
-
-import streamlit as st
-import os
-from dotenv import load_dotenv
-
 import tempfile
-import shutil
-
-# Para procesar imágenes
-with tempfile.NamedTemporaryFile(delete=False, suffix='.jpg') as tmp_file:
-    tmp_file.write(imagen.getvalue())
-    tmp_path = tmp_file.name
-    
-# Procesar imagen...
-# Al finalizar:
-os.unlink(tmp_path)
-
-# Cargar variables de entorno
-load_dotenv()
-
-# Obtener API Key - PRIORIDAD: Streamlit Secrets > .env
-API_KEY = st.secrets.get("GEMINI_API_KEY") if "GEMINI_API_KEY" in st.secrets else os.getenv("GEMINI_API_KEY")
-
-if not API_KEY:
-    st.error("❌ No se encontró la API Key de Gemini. Configúrala en Streamlit Cloud Secrets.")
-    st.stop()
+from datetime import datetime
 
+# Solo lo que necesita la pantalla de login. El SDK de Gemini, plotly,
+# PIL y el resto de utils se importan en la pestaña o función que los usa
+# (tras el login): el arranque en frío de un contenedor dormido no los
+# paga. Presupuesto comprobado en test_importacion.py.
 from utils.auth import (
-    init_db, 
     registrar_usuario, 
     login_usuario, 
     obtener_datos_usuario,
     cambiar_contraseña
 )
-from utils.gemini_vision import extraer_texto_imagen
-from utils.translator import traducir_texto, IDIOMAS
-from utils.gallery import (
-    init_gallery_db,
-    guardar_imagen,
-    obtener_imagenes_usuario,
-    eliminar_imagen,
-    eliminar_imagenes
-)
-from utils.stats import (
-    obtener_estadisticas_usuario,
-    exportar_datos_usuario,
-    analizar_idiomas_usuario
-)
-from utils.assistant import (
-    describir_imagen,
-    analizar_imagen_avanzado
-)
-from utils.social_content import (
-    generar_contenido_redes,
-    generar_variaciones_contenido
-)
+from utils.hash_contrasenas import HashSaturadoError
+from utils.arranque import iniciar_aplicacion
 
 # =========================
 # CONFIGURACIÓN GENERAL
 # =========================
-load_dotenv()
-API_KEY = os.getenv("GEMINI_API_KEY")
-
 st.set_page_config(
     page_title="OCR y Traducción con Gemini",
     page_icon="🧠",
     layout="wide"
 )
 
+
 # =========================
-# INICIALIZAR BASES DE DATOS
+# ARRANQUE (UNA VEZ POR PROCESO)
 # =========================
-init_db()
-init_gallery_db()
+@st.cache_resource(show_spinner="⏳ Preparando la aplicación...")
+def arrancar():
+    """
+    Configuración, migraciones, cliente de Gemini y pool de bcrypt: se
+    hace en el primer rerun del proceso y se reutiliza en los demás.
+    """
+    secretos = {"GEMINI_API_KEY": st.secrets["GEMINI_API_KEY"]} if "GEMINI_API_KEY" in st.secrets else {}
+    return iniciar_aplicacion(secretos)
+
+
+arranque = arrancar()
+
+if not arranque["listo"]:
+    # Sin caché: el siguiente rerun vuelve a intentarlo
+    arrancar.clear()
+    if not arranque["comprobaciones"]["api_key"]:
+        st.error("❌ No se encontró la API Key de Gemini. Configúrala en Streamlit Cloud Secrets.")
+    else:
+        fallidas = [nombre for nombre, ok in arranque["comprobaciones"].items() if not ok]
+        st.error(f"❌ La aplicación no está lista: {', '.join(fallidas)}")
+    st.stop()
+
+API_KEY = arranque["api_key"]
 
 # =========================
 # SESSION STATE
@@ -115,6 +88,56 @@ if "variaciones_contenido" not in st.session_state:
 if "imagenes_seleccionadas" not in st.session_state:
     st.session_state.imagenes_seleccionadas = set()
 
+# Paginación de la galería: cursores de las páginas visitadas
+if "galeria_cursores" not in st.session_state:
+    st.session_state.galeria_cursores = [None]
+
+if "galeria_filtros" not in st.session_state:
+    st.session_state.galeria_filtros = None
+
+# Miniaturas de las imágenes subidas (por file_id)
+if "miniaturas_subidas" not in st.session_state:
+    st.session_state.miniaturas_subidas = {}
+
+
+# =========================
+# MINIATURAS
+# =========================
+def miniatura_subida(archivo):
+    """
+    Miniatura WebP de un archivo subido para la vista previa. Se calcula
+    una sola vez por archivo, no en cada rerun.
+    """
+    from utils.procesado_imagen import crear_miniatura
+
+    miniaturas = st.session_state.miniaturas_subidas
+    if archivo.file_id not in miniaturas:
+        miniaturas[archivo.file_id] = crear_miniatura(archivo.getvalue()) or archivo.getvalue()
+    return miniaturas[archivo.file_id]
+
+
+@st.dialog("🖼️ Imagen original", width="large")
+def ver_imagen_original(imagen_id: int):
+    from utils.gallery import obtener_imagen_por_id, obtener_traducciones_imagen
+    from utils.translator import IDIOMAS
+
+    fila = obtener_imagen_por_id(imagen_id, st.session_state.usuario_id)
+    if fila and fila[0]:
+        st.image(fila[0], use_container_width=True)
+    else:
+        st.error("❌ No se encontró la imagen")
+        return
+
+    nombres_idiomas = {codigo: nombre for nombre, codigo in IDIOMAS.items()}
+    for codigo, traduccion in obtener_traducciones_imagen(imagen_id, st.session_state.usuario_id).items():
+        st.text_area(
+            f"🌐 {nombres_idiomas.get(codigo, codigo).capitalize()}",
+            traduccion,
+            height=120,
+            key=f"traduccion_{imagen_id}_{codigo}"
+        )
+
+
 # =========================
 # LOGIN / REGISTRO
 # =========================
@@ -135,7 +158,11 @@ if not st.session_state.autenticado:
 
     else:
         if st.button("➡️ Iniciar sesión"):
-            usuario_id = login_usuario(email, password)
+            try:
+                usuario_id = login_usuario(email, password)
+            except HashSaturadoError as e:
+                st.error(str(e))
+                st.stop()
             if usuario_id:
                 st.session_state.autenticado = True
                 st.session_state.usuario = email
@@ -146,6 +173,12 @@ if not st.session_state.autenticado:
 
     st.stop()
 
+# Las peticiones al modelo de esta ejecución cuentan para este usuario
+# en el reparto de la cola del planificador
+from utils.contexto_usuario import establecer_usuario
+
+establecer_usuario(st.session_state.usuario_id)
+
 # =========================
 # HEADER PRINCIPAL
 # =========================
@@ -174,6 +207,10 @@ tab_ocr, tab_galeria, tab_perfil, tab_asistente, tab_social = st.tabs([
 # TAB OCR Y TRADUCCIÓN
 # ======================================================
 with tab_ocr:
+    from utils.gemini_vision import extraer_texto_imagen_stream, extraer_texto_lote
+    from utils.translator import traducir_con_memoria, traducir_multiples, IDIOMAS
+    from utils.gallery import guardar_imagen, guardar_imagenes, LONGITUD_VISTA_PREVIA
+
     col1, col2 = st.columns(2)
 
     with col1:
@@ -198,20 +235,27 @@ with tab_ocr:
 
     with col2:
         if imagen:
-            st.image(imagen, use_container_width=True, caption="Vista previa de la imagen")
+            st.image(miniatura_subida(imagen), caption="Vista previa de la imagen")
 
     # ---------- OCR ----------
     if analizar and imagen:
-        with st.spinner("🤖 Extrayendo texto de la imagen..."):
-            texto = extraer_texto_imagen(imagen, API_KEY)
-            st.session_state.texto_extraido = texto
-            st.session_state.texto_traducido = ""
+        # El texto se muestra según llega; al terminar se sustituye por el
+        # área de texto de abajo
+        marcador_ocr = st.empty()
+        with marcador_ocr.container():
+            st.subheader("📄 Texto extraído")
+            texto = st.write_stream(extraer_texto_imagen_stream(imagen, API_KEY))
+        marcador_ocr.empty()
 
-            guardar_imagen(
-                usuario_id=st.session_state.usuario_id,
-                imagen_bytes=imagen.getvalue(),
-                texto_original=texto
-            )
+        st.session_state.texto_extraido = texto
+        st.session_state.texto_traducido = ""
+
+        guardar_imagen(
+            usuario_id=st.session_state.usuario_id,
+            imagen_bytes=imagen.getvalue(),
+            texto_original=texto,
+            tipo="ocr"
+        )
 
         st.success("✅ Texto extraído y guardado en la galería")
 
@@ -220,11 +264,19 @@ with tab_ocr:
         st.subheader("📄 Texto extraído")
         
         col_texto, col_botones = st.columns([4, 1])
+
+        # El editor se reinicia cuando cambia el texto extraído (nuevo OCR,
+        # imagen de la galería...); si no, conserva lo que edite el usuario
+        if (
+            "texto_original_area" not in st.session_state
+            or st.session_state.get("texto_original_base") != st.session_state.texto_extraido
+        ):
+            st.session_state.texto_original_base = st.session_state.texto_extraido
+            st.session_state.texto_original_area = st.session_state.texto_extraido
         
         with col_texto:
             texto_area = st.text_area(
                 "Texto original",
-                st.session_state.texto_extraido,
                 height=220,
                 key="texto_original_area",
                 label_visibility="collapsed"
@@ -233,21 +285,30 @@ with tab_ocr:
         with col_botones:
             if st.button("📋 Copiar", key="copiar_original", use_container_width=True):
                 st.write(f"""<script>
-                    navigator.clipboard.writeText(`{st.session_state.texto_extraido.replace('`', '\\`')}`);
+                    navigator.clipboard.writeText(`{texto_area.replace('`', '\\`')}`);
                 </script>""", unsafe_allow_html=True)
                 st.toast("✅ Texto copiado al portapapeles", icon="📋")
             
-            palabras = len(st.session_state.texto_extraido.split())
+            palabras = len(texto_area.split())
             st.metric("Palabras", palabras)
 
     # ---------- TRADUCCIÓN ----------
-    if traducir and st.session_state.texto_extraido:
-        with st.spinner("🌍 Traduciendo..."):
-            st.session_state.texto_traducido = traducir_texto(
-                st.session_state.texto_extraido,
-                idioma,
-                API_KEY
+    if traducir and st.session_state.texto_extraido and st.session_state.get("texto_original_area", "").strip():
+        marcador_traduccion = st.empty()
+        with marcador_traduccion.container():
+            st.subheader(f"🌐 Texto traducido ({idioma})")
+            # Se traduce el texto tal como lo ha editado el usuario: solo
+            # las frases nuevas o editadas van al modelo (la primera tanda
+            # en streaming, el resto en paralelo) y las demás salen de la
+            # memoria
+            st.session_state.texto_traducido = st.write_stream(
+                traducir_con_memoria(
+                    st.session_state.texto_original_area,
+                    idioma,
+                    API_KEY
+                )
             )
+        marcador_traduccion.empty()
 
     if st.session_state.texto_traducido:
         st.subheader(f"🌐 Texto traducido ({idioma})")
@@ -273,10 +334,97 @@ with tab_ocr:
             palabras_trad = len(st.session_state.texto_traducido.split())
             st.metric("Palabras", palabras_trad)
 
+    # ---------- VARIOS IDIOMAS ----------
+    if st.session_state.texto_extraido:
+        with st.expander("🌐 Traducir a varios idiomas a la vez"):
+            idiomas_multiples = st.multiselect(
+                "Idiomas de destino",
+                list(IDIOMAS.keys()),
+                default=[idioma],
+                key="idiomas_multiples"
+            )
+
+            if st.button("🌐 Traducir a todos", disabled=not idiomas_multiples, use_container_width=True):
+                try:
+                    with st.spinner(f"🤖 Traduciendo a {len(idiomas_multiples)} idioma(s)..."):
+                        st.session_state.traducciones_multiples = traducir_multiples(
+                            st.session_state.texto_extraido,
+                            idiomas_multiples,
+                            API_KEY
+                        )
+                except Exception as e:
+                    st.error(str(e))
+
+            for nombre_idioma, traduccion in st.session_state.get("traducciones_multiples", {}).items():
+                st.text_area(
+                    f"🌐 {nombre_idioma.capitalize()}",
+                    traduccion,
+                    height=150,
+                    key=f"traduccion_multiple_{nombre_idioma}"
+                )
+
+    # ---------- OCR POR LOTES ----------
+    with st.expander("📚 OCR por lotes (varias imágenes)"):
+        imagenes_lote = st.file_uploader(
+            "Selecciona las imágenes",
+            type=["png", "jpg", "jpeg"],
+            accept_multiple_files=True,
+            key="ocr_lote_uploader"
+        )
+
+        procesar_lote = st.button(
+            f"🚀 Extraer texto de {len(imagenes_lote)} imagen(es)" if imagenes_lote else "🚀 Extraer texto",
+            use_container_width=True,
+            disabled=not imagenes_lote
+        )
+
+        if procesar_lote and imagenes_lote:
+            progreso = st.progress(0.0, text="🤖 Procesando lote...")
+            correctas, fallidas = [], []
+
+            for item in extraer_texto_lote(imagenes_lote, API_KEY):
+                if item["error"]:
+                    fallidas.append(item)
+                    st.error(f"❌ {item['nombre']}: {item['error']}")
+                else:
+                    correctas.append(item)
+                    st.markdown(f"✅ **{item['nombre']}** ({item['segundos']:.1f} s)")
+                    st.caption(item["texto"][:LONGITUD_VISTA_PREVIA] or "(sin texto)")
+
+                hechas = len(correctas) + len(fallidas)
+                progreso.progress(
+                    hechas / len(imagenes_lote),
+                    text=f"🤖 {hechas}/{len(imagenes_lote)} procesadas"
+                )
+
+            if correctas:
+                correctas.sort(key=lambda item: item["indice"])
+                guardar_imagenes(
+                    st.session_state.usuario_id,
+                    [
+                        {
+                            "imagen_bytes": imagenes_lote[item["indice"]].getvalue(),
+                            "texto_original": item["texto"],
+                            "tipo": "ocr",
+                            "miniatura": item["miniatura"],
+                        }
+                        for item in correctas
+                    ]
+                )
+
+            progreso.empty()
+            st.success(f"✅ {len(correctas)} imagen(es) procesadas y guardadas en la galería")
+            if fallidas:
+                st.warning(f"⚠️ {len(fallidas)} imagen(es) con error")
+
 # ======================================================
 # TAB GENERADOR DE CONTENIDO (NUEVA)
 # ======================================================
 with tab_social:
+    from utils.social_content import generar_contenido_redes, generar_variaciones_contenido
+    from utils.gallery import guardar_imagen
+    from utils.planificador import ServicioSaturadoError
+
     st.title("📱 Generador de Contenido para Redes Sociales")
     st.markdown("Sube una imagen y genera contenido listo para publicar en diferentes plataformas.")
     
@@ -342,7 +490,7 @@ with tab_social:
     with col_preview:
         if imagen_social:
             st.subheader("👁️ Vista previa de la imagen")
-            st.image(imagen_social, use_container_width=True, caption="Imagen para contenido social")
+            st.image(miniatura_subida(imagen_social), caption="Imagen para contenido social")
             
             # Estadísticas de la imagen
             imagen_social.seek(0, 2)
@@ -422,11 +570,14 @@ with tab_social:
                 guardar_imagen(
                     usuario_id=st.session_state.usuario_id,
                     imagen_bytes=imagen_social.getvalue(),
-                    texto_original=f"CONTENIDO SOCIAL ({plataforma} - {estilo}):\n{json.dumps(contenido, indent=2)}"
+                    texto_original=f"CONTENIDO SOCIAL ({plataforma} - {estilo}):\n{json.dumps(contenido, indent=2)}",
+                    tipo="social"
                 )
                 
                 st.success("✅ Contenido generado y guardado en galería")
                 
+            except ServicioSaturadoError as e:
+                st.error(str(e))
             except Exception as e:
                 st.error(f"❌ Error al generar contenido: {str(e)}")
     
@@ -492,6 +643,16 @@ with tab_social:
 # TAB GALERÍA (sin cambios)
 # ======================================================
 with tab_galeria:
+    from utils.translator import traducir_imagenes, IDIOMAS
+    from utils.gallery import (
+        listar_imagenes_usuario,
+        obtener_miniatura,
+        obtener_imagen_por_id,
+        eliminar_imagen,
+        eliminar_imagenes,
+        TIPOS_RESULTADO
+    )
+
     st.subheader("🖼️ Mis imágenes guardadas")
     
     col1, col2 = st.columns([3, 1])
@@ -522,21 +683,104 @@ with tab_galeria:
                     st.session_state.imagenes_seleccionadas = set()
                     st.rerun()
 
-    imagenes = obtener_imagenes_usuario(st.session_state.usuario_id)
+            # Traducir el texto de las seleccionadas (en paralelo) y guardarlo
+            col_idiomas_lote, col_traducir_lote = st.columns([3, 1])
+            with col_idiomas_lote:
+                idiomas_lote = st.multiselect(
+                    "🌍 Idiomas",
+                    list(IDIOMAS.keys()),
+                    key="idiomas_galeria",
+                    label_visibility="collapsed",
+                    placeholder="🌍 Idiomas para traducir las seleccionadas"
+                )
+            with col_traducir_lote:
+                traducir_lote = st.button(
+                    "🌍 Traducir seleccionadas",
+                    disabled=not idiomas_lote,
+                    use_container_width=True
+                )
+
+            if traducir_lote:
+                seleccionadas = list(st.session_state.imagenes_seleccionadas)
+                progreso = st.progress(0.0, text="🤖 Traduciendo...")
+                traducidas = hechas = 0
+
+                for item in traducir_imagenes(
+                    st.session_state.usuario_id, seleccionadas, idiomas_lote, API_KEY
+                ):
+                    hechas += 1
+                    if item["error"]:
+                        st.error(f"❌ Imagen {item['imagen_id']}: {item['error']}")
+                    else:
+                        traducidas += 1
+                    progreso.progress(
+                        hechas / len(seleccionadas),
+                        text=f"🤖 {hechas}/{len(seleccionadas)} traducidas"
+                    )
+
+                progreso.empty()
+                st.success(f"✅ {traducidas} imagen(es) traducidas y guardadas")
+
+    # ---------- FILTROS ----------
+    col_filtro_fecha, col_filtro_tipo = st.columns(2)
+    with col_filtro_fecha:
+        rango_fechas = st.date_input("📅 Rango de fechas", value=[], key="galeria_rango")
+    with col_filtro_tipo:
+        tipo_filtro = st.selectbox(
+            "🏷️ Tipo de resultado",
+            ["todos", *TIPOS_RESULTADO.keys()],
+            format_func=lambda t: "Todos" if t == "todos" else TIPOS_RESULTADO[t],
+            key="galeria_tipo"
+        )
+
+    desde = rango_fechas[0] if len(rango_fechas) > 0 else None
+    hasta = rango_fechas[1] if len(rango_fechas) > 1 else None
+
+    # Al cambiar los filtros se vuelve a la primera página
+    filtros = (desde, hasta, tipo_filtro)
+    if st.session_state.galeria_filtros != filtros:
+        st.session_state.galeria_filtros = filtros
+        st.session_state.galeria_cursores = [None]
+
+    pagina = listar_imagenes_usuario(
+        st.session_state.usuario_id,
+        limite=12,
+        cursor_pagina=st.session_state.galeria_cursores[-1],
+        desde=desde,
+        hasta=hasta,
+        tipo=None if tipo_filtro == "todos" else tipo_filtro
+    )
+    imagenes = pagina["imagenes"]
 
     if not imagenes:
-        st.info("Aún no has guardado ninguna imagen")
+        if filtros == (None, None, "todos"):
+            st.info("Aún no has guardado ninguna imagen")
+        else:
+            st.info("No hay imágenes que coincidan con los filtros")
     else:
         cols = st.columns(3)
 
-        for i, (img_id, img_blob, texto, fecha) in enumerate(imagenes):
+        for i, imagen_meta in enumerate(imagenes):
+            img_id = imagen_meta["id"]
+
             with cols[i % 3]:
                 with st.container():
-                    st.image(img_blob, use_container_width=True)
-                    st.caption(f"📅 {fecha[:10]}")
+                    miniatura = obtener_miniatura(imagen_meta)
+                    if miniatura:
+                        st.image(miniatura, use_container_width=True)
+                    st.caption(
+                        f"📅 {imagen_meta['fecha'][:10]} | "
+                        f"{TIPOS_RESULTADO.get(imagen_meta['tipo'], imagen_meta['tipo'])} | "
+                        f"{imagen_meta['tamano'] / 1024:.0f} KB"
+                    )
+                    if imagen_meta["vista_previa"]:
+                        st.caption(imagen_meta["vista_previa"][:100] + ("…" if imagen_meta["longitud_texto"] > 100 else ""))
+
+                    if st.button("🔍 Ver original", key=f"ver_{img_id}", use_container_width=True):
+                        ver_imagen_original(img_id)
                     
                     seleccionada = st.checkbox(
-                        f"Seleccionar para eliminar",
+                        f"Seleccionar",
                         key=f"select_{img_id}",
                         value=img_id in st.session_state.imagenes_seleccionadas
                     )
@@ -547,7 +791,10 @@ with tab_galeria:
                         st.session_state.imagenes_seleccionadas.remove(img_id)
                     
                     if st.button("📄 Cargar texto", key=f"load_{img_id}", use_container_width=True):
-                        st.session_state.texto_extraido = texto
+                        fila = obtener_imagen_por_id(
+                            img_id, st.session_state.usuario_id, incluir_imagen=False
+                        )
+                        st.session_state.texto_extraido = fila[1] if fila else ""
                         st.session_state.texto_traducido = ""
                         st.success("Texto cargado para traducir")
                         st.rerun()
@@ -564,10 +811,29 @@ with tab_galeria:
                 
                 st.divider()
 
+    # ---------- PAGINACIÓN ----------
+    cursores = st.session_state.galeria_cursores
+    col_anterior, col_numero, col_siguiente = st.columns([1, 2, 1])
+    with col_anterior:
+        if st.button("⬅️ Anterior", disabled=len(cursores) == 1, use_container_width=True):
+            cursores.pop()
+            st.rerun()
+    with col_numero:
+        st.caption(f"Página {len(cursores)}")
+    with col_siguiente:
+        if st.button("Siguiente ➡️", disabled=not pagina["siguiente_cursor"], use_container_width=True):
+            cursores.append(pagina["siguiente_cursor"])
+            st.rerun()
+
 # ======================================================
 # TAB ASISTENTE IA (sin cambios)
 # ======================================================
 with tab_asistente:
+    from utils.assistant import describir_imagen_stream, analizar_imagen_avanzado_stream
+    from utils.servicio_gemini import analizar_todo
+    from utils.extraccion_combinada import extraer_todo
+    from utils.gallery import guardar_imagen, guardar_imagenes, TIPOS_RESULTADO
+
     st.title("🤖 Asistente IA para Imágenes")
     st.markdown("Sube una imagen y el asistente IA generará descripciones y análisis detallados.")
     
@@ -611,11 +877,39 @@ with tab_asistente:
                 use_container_width=True,
                 disabled=not imagen_asistente
             )
+
+        btn_todo = st.button(
+            "⚡ Analizar todo (OCR, descripción, análisis y redes)",
+            use_container_width=True,
+            disabled=not imagen_asistente,
+            help="Lanza las cuatro tareas a la vez sobre la misma imagen"
+        )
+
+        with st.expander("🧩 Modo combinado: texto, descripción y redes en una sola llamada"):
+            st.caption("La imagen se envía una sola vez y el modelo devuelve los tres resultados juntos.")
+            col_plat_comb, col_est_comb = st.columns(2)
+            with col_plat_comb:
+                plataforma_combinada = st.selectbox(
+                    "📱 Plataforma",
+                    ["instagram", "twitter", "linkedin", "tiktok", "facebook"],
+                    key="plataforma_combinada"
+                )
+            with col_est_comb:
+                estilo_combinado = st.selectbox(
+                    "🎨 Estilo",
+                    ["profesional", "creativo", "humoristico", "inspirador"],
+                    key="estilo_combinado"
+                )
+            btn_combinado = st.button(
+                "🧩 Extraer todo en una llamada",
+                use_container_width=True,
+                disabled=not imagen_asistente
+            )
     
     with col_preview:
         if imagen_asistente:
             st.subheader("👁️ Vista previa")
-            st.image(imagen_asistente, use_container_width=True, caption="Imagen para análisis")
+            st.image(miniatura_subida(imagen_asistente), caption="Imagen para análisis")
             
             imagen_asistente.seek(0, 2)
             tamaño_bytes = imagen_asistente.tell()
@@ -623,26 +917,121 @@ with tab_asistente:
             
             st.caption(f"Tamaño: {tamaño_bytes / 1024:.1f} KB")
     
-    if btn_descripcion and imagen_asistente:
-        with st.spinner("🤖 Generando descripción..."):
+    if btn_todo and imagen_asistente:
+        opciones_tareas = {
+            "descripcion": {"nivel_detalle": nivel_detalle},
+            "analisis": {"tipo_analisis": tipo_analisis},
+        }
+        textos_galeria = {
+            "ocr": lambda r: r,
+            "descripcion": lambda r: f"DESCRIPCIÓN ({nivel_detalle}):\n{r}",
+            "analisis": lambda r: f"ANÁLISIS ({tipo_analisis}):\n{r}",
+            "social": lambda r: f"CONTENIDO SOCIAL (instagram - profesional):\n{json.dumps(r, indent=2)}",
+        }
+
+        with st.status("⚡ Analizando la imagen...", expanded=True) as estado:
+            def mostrar_progreso(item):
+                etiqueta = TIPOS_RESULTADO[item["tarea"]]
+                if item["error"]:
+                    st.write(f"❌ {etiqueta}: {item['error']}")
+                else:
+                    st.write(f"✅ {etiqueta} ({item['segundos']:.1f} s)")
+
             try:
-                descripcion = describir_imagen(
+                resultados = analizar_todo(
                     imagen_asistente,
                     API_KEY,
-                    nivel_detalle
+                    opciones=opciones_tareas,
+                    al_completar=mostrar_progreso
                 )
-                st.session_state.descripcion_imagen = descripcion
-                
-                imagen_asistente.seek(0)
+            except Exception as e:
+                resultados = {}
+                st.error(f"❌ Error al analizar: {str(e)}")
+
+            campos_sesion = {
+                "ocr": "texto_extraido",
+                "descripcion": "descripcion_imagen",
+                "analisis": "analisis_avanzado",
+                "social": "contenido_redes",
+            }
+            for tarea, item in resultados.items():
+                if item["error"]:
+                    continue
+                st.session_state[campos_sesion[tarea]] = item["resultado"]
                 guardar_imagen(
                     usuario_id=st.session_state.usuario_id,
                     imagen_bytes=imagen_asistente.getvalue(),
-                    texto_original=f"DESCRIPCIÓN ({nivel_detalle}):\n{descripcion}"
+                    texto_original=textos_galeria[tarea](item["resultado"]),
+                    tipo=tarea
                 )
-                
-                st.success("✅ Descripción generada y guardada")
+
+            fallidas = [t for t, item in resultados.items() if item["error"]]
+            estado.update(
+                label="⚠️ Análisis completado con errores" if fallidas or not resultados
+                else "✅ Análisis completo y guardado en la galería",
+                state="error" if fallidas or not resultados else "complete",
+                expanded=bool(fallidas)
+            )
+
+    if btn_combinado and imagen_asistente:
+        with st.spinner("🧩 Extrayendo texto, descripción y contenido social..."):
+            try:
+                combinado = extraer_todo(
+                    imagen_asistente,
+                    API_KEY,
+                    nivel_detalle=nivel_detalle,
+                    estilo=estilo_combinado,
+                    plataforma=plataforma_combinada
+                )
+                st.session_state.texto_extraido = combinado["texto"]
+                st.session_state.texto_traducido = ""
+                st.session_state.descripcion_imagen = combinado["descripcion"]
+                st.session_state.contenido_redes = combinado["social"]
+
+                imagen_combinada = imagen_asistente.getvalue()
+                guardar_imagenes(st.session_state.usuario_id, [
+                    {"imagen_bytes": imagen_combinada, "texto_original": combinado["texto"], "tipo": "ocr"},
+                    {
+                        "imagen_bytes": imagen_combinada,
+                        "texto_original": f"DESCRIPCIÓN ({nivel_detalle}):\n{combinado['descripcion']}",
+                        "tipo": "descripcion"
+                    },
+                    {
+                        "imagen_bytes": imagen_combinada,
+                        "texto_original": f"CONTENIDO SOCIAL ({plataforma_combinada} - {estilo_combinado}):\n{json.dumps(combinado['social'], indent=2)}",
+                        "tipo": "social"
+                    },
+                ])
+
+                st.success("✅ Texto, descripción y contenido social generados y guardados. "
+                           "Los encontrarás también en las pestañas de OCR y de redes sociales.")
             except Exception as e:
-                st.error(f"❌ Error al generar descripción: {str(e)}")
+                st.error(f"❌ Error en la extracción combinada: {str(e)}")
+
+    if btn_descripcion and imagen_asistente:
+        try:
+            marcador_descripcion = st.empty()
+            with marcador_descripcion.container():
+                st.subheader("📝 Descripción generada")
+                descripcion = st.write_stream(describir_imagen_stream(
+                    imagen_asistente,
+                    API_KEY,
+                    nivel_detalle
+                ))
+            marcador_descripcion.empty()
+            st.session_state.descripcion_imagen = descripcion
+            
+            imagen_asistente.seek(0)
+            guardar_imagen(
+                usuario_id=st.session_state.usuario_id,
+                imagen_bytes=imagen_asistente.getvalue(),
+                texto_original=f"DESCRIPCIÓN ({nivel_detalle}):\n{descripcion}",
+                tipo="descripcion"
+            )
+            
+            st.success("✅ Descripción generada y guardada")
+        except Exception as e:
+            st.error(f"❌ Error al generar descripción: {str(e)}")
     
     if st.session_state.descripcion_imagen:
         st.subheader("📝 Descripción generada")
@@ -664,25 +1053,29 @@ with tab_asistente:
             st.caption(f"📊 {palabras_desc} palabras | {len(st.session_state.descripcion_imagen)} caracteres")
     
     if btn_analisis and imagen_asistente:
-        with st.spinner("🔬 Realizando análisis avanzado..."):
-            try:
-                analisis = analizar_imagen_avanzado(
+        try:
+            marcador_analisis = st.empty()
+            with marcador_analisis.container():
+                st.subheader(f"🔬 Análisis {tipo_analisis.capitalize()}")
+                analisis = st.write_stream(analizar_imagen_avanzado_stream(
                     imagen_asistente,
                     API_KEY,
                     tipo_analisis
-                )
-                st.session_state.analisis_avanzado = analisis
-                
-                imagen_asistente.seek(0)
-                guardar_imagen(
-                    usuario_id=st.session_state.usuario_id,
-                    imagen_bytes=imagen_asistente.getvalue(),
-                    texto_original=f"ANÁLISIS ({tipo_analisis}):\n{analisis}"
-                )
-                
-                st.success("✅ Análisis avanzado generado y guardado")
-            except Exception as e:
-                st.error(f"❌ Error al generar análisis: {str(e)}")
+                ))
+            marcador_analisis.empty()
+            st.session_state.analisis_avanzado = analisis
+            
+            imagen_asistente.seek(0)
+            guardar_imagen(
+                usuario_id=st.session_state.usuario_id,
+                imagen_bytes=imagen_asistente.getvalue(),
+                texto_original=f"ANÁLISIS ({tipo_analisis}):\n{analisis}",
+                tipo="analisis"
+            )
+            
+            st.success("✅ Análisis avanzado generado y guardado")
+        except Exception as e:
+            st.error(f"❌ Error al generar análisis: {str(e)}")
     
     if st.session_state.analisis_avanzado:
         st.subheader(f"🔬 Análisis {tipo_analisis.capitalize()}")
@@ -707,6 +1100,10 @@ with tab_asistente:
 # TAB PERFIL (sin cambios)
 # ======================================================
 with tab_perfil:
+    import plotly.express as px
+    from utils.stats import obtener_estadisticas_usuario, analizar_idiomas_usuario
+    from utils.exportacion import escribir_exportacion
+
     st.title("👤 Mi Perfil")
     
     datos_usuario = obtener_datos_usuario(st.session_state.usuario_id)
@@ -822,6 +1219,11 @@ with tab_perfil:
             )
             fig.update_layout(height=300)
             st.plotly_chart(fig, use_container_width=True)
+            st.caption(" · ".join(
+                f"{d['idioma']}: {d['latencia_media_ms'] / 1000:.1f} s de media, "
+                f"{d['tasa_memoria']:.0%} desde memoria"
+                for d in idiomas_data
+            ))
         else:
             st.info("Aún no hay datos suficientes sobre los idiomas usados")
     
@@ -829,33 +1231,45 @@ with tab_perfil:
     
     with st.container():
         st.markdown("""
-        Puedes exportar todos tus datos en formato JSON. Esto incluye:
+        Puedes exportar todos tus datos en formato NDJSON (un registro JSON por línea). Esto incluye:
         - Información de tu perfil
         - Todas las imágenes procesadas
-        - Textos extraídos
+        - Textos extraídos y traducciones guardadas
         - Estadísticas de uso
+        
+        El formato ZIP añade además las imágenes originales.
         """)
         
         col_exp1, col_exp2 = st.columns([3, 1])
         
         with col_exp1:
-            st.info("Los datos se exportarán en formato JSON listos para descargar")
+            formato_exportacion = st.radio(
+                "Formato",
+                ["ndjson", "zip"],
+                format_func=lambda f: {"ndjson": "NDJSON (solo datos)", "zip": "ZIP con imágenes originales"}[f],
+                horizontal=True,
+                key="formato_exportacion"
+            )
         
         with col_exp2:
-            if st.button("📥 Exportar datos JSON", type="primary", use_container_width=True):
+            if st.button("📥 Exportar datos", type="primary", use_container_width=True):
                 try:
-                    datos_exportar = exportar_datos_usuario(st.session_state.usuario_id)
-                    
-                    json_str = json.dumps(datos_exportar, indent=2, ensure_ascii=False)
+                    # Se genera por trozos en un archivo temporal, pero
+                    # st.download_button guarda los bytes en memoria para
+                    # servirlos: la descarga sí ocupa el archivo entero
+                    with tempfile.TemporaryFile() as archivo_temporal:
+                        escribir_exportacion(st.session_state.usuario_id, archivo_temporal, formato_exportacion)
+                        archivo_temporal.seek(0)
+                        archivo_exportacion = archivo_temporal.read()
                     
                     fecha_actual = datetime.now().strftime("%Y%m%d_%H%M%S")
-                    nombre_archivo = f"datos_usuario_{st.session_state.usuario_id}_{fecha_actual}.json"
+                    nombre_archivo = f"datos_usuario_{st.session_state.usuario_id}_{fecha_actual}.{formato_exportacion}"
                     
                     st.download_button(
-                        label="⬇️ Descargar archivo JSON",
-                        data=json_str,
+                        label=f"⬇️ Descargar archivo {formato_exportacion.upper()}",
+                        data=archivo_exportacion,
                         file_name=nombre_archivo,
-                        mime="application/json",
+                        mime="application/zip" if formato_exportacion == "zip" else "application/x-ndjson",
                         use_container_width=True
                     )
                     
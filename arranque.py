@@ -0,0 +1,109 @@
+"""
+Arranque de la aplicación: lo que solo hace falta una vez por proceso
+(configuración, esquema de la base de datos, pool de bcrypt y cliente de
+Gemini) y la comprobación de que todo está listo.
+
+app.py lo llama desde una función con st.cache_resource, así que cada
+rerun de Streamlit solo paga el trabajo que pide el usuario.
+"""
+import os
+import threading
+import time
+
+from dotenv import load_dotenv
+
+from utils import blob_store
+from utils.hash_contrasenas import iniciar_servicio_hash, servicio_hash_listo
+from utils.migraciones import VERSION_ESQUEMA, aplicar_migraciones, version_esquema
+
+DB_NAME = "users.db"
+
+
+# =========================
+# CONFIGURACIÓN
+# =========================
+def cargar_configuracion(secretos: dict = None) -> dict:
+    """
+    Lee el .env y resuelve la configuración. La API Key sale de los
+    secretos de Streamlit si está ahí y, si no, del entorno.
+    """
+    load_dotenv()
+    secretos = secretos or {}
+    return {
+        "api_key": secretos.get("GEMINI_API_KEY") or os.getenv("GEMINI_API_KEY"),
+        "db": DB_NAME,
+    }
+
+
+# =========================
+# PREPARACIÓN
+# =========================
+def comprobar_preparacion(api_key: str) -> dict:
+    """
+    Comprobación de que la aplicación puede atender peticiones.
+
+    :return: {"listo": bool, "comprobaciones": {nombre: bool}}
+    """
+    try:
+        esquema_al_dia = version_esquema(DB_NAME) == VERSION_ESQUEMA
+    except Exception:
+        esquema_al_dia = False
+
+    try:
+        os.makedirs(blob_store.BLOB_DIR, exist_ok=True)
+        blobs_escribibles = os.access(blob_store.BLOB_DIR, os.W_OK)
+    except OSError:
+        blobs_escribibles = False
+
+    comprobaciones = {
+        "api_key": bool(api_key),
+        "base_de_datos": esquema_al_dia,
+        "blob_store": blobs_escribibles,
+        "servicio_hash": servicio_hash_listo(),
+    }
+    return {"listo": all(comprobaciones.values()), "comprobaciones": comprobaciones}
+
+
+# =========================
+# ARRANQUE
+# =========================
+def precalentar_cliente(api_key: str):
+    """Importa el SDK de Gemini (lo más lento de importar) y crea el cliente compartido."""
+    from utils.gemini_client import obtener_cliente
+
+    obtener_cliente(api_key)
+
+
+def iniciar_aplicacion(secretos: dict = None, en_segundo_plano: bool = True) -> dict:
+    """
+    Carga la configuración, aplica las migraciones pendientes, arranca el
+    pool de bcrypt y crea el cliente de Gemini. Pensado para llamarse una
+    vez por proceso (st.cache_resource en app.py).
+
+    :param secretos: st.secrets o un dict equivalente
+    :param en_segundo_plano: El cliente de Gemini se crea en otro hilo
+                             mientras se muestra la pantalla de login
+    :return: {"api_key", "migraciones_aplicadas", "segundos", "listo", "comprobaciones"}
+    """
+    inicio = time.perf_counter()
+    configuracion = cargar_configuracion(secretos)
+
+    aplicadas = aplicar_migraciones(DB_NAME)
+    iniciar_servicio_hash()
+    if configuracion["api_key"]:
+        if en_segundo_plano:
+            threading.Thread(
+                target=precalentar_cliente,
+                args=(configuracion["api_key"],),
+                name="precalentar-gemini",
+                daemon=True,
+            ).start()
+        else:
+            precalentar_cliente(configuracion["api_key"])
+
+    return {
+        "api_key": configuracion["api_key"],
+        "migraciones_aplicadas": aplicadas,
+        "segundos": time.perf_counter() - inicio,
+        **comprobar_preparacion(configuracion["api_key"]),
+    }
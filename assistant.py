@@ -1,9 +1,71 @@
-import base64
-import io
-from google import genai
-from PIL import Image
 
-MAX_IMAGE_SIZE_MB = 5
+from utils.gemini_client import generar_contenido, generar_en_stream
+from utils.cache_resultados import clave_cache, obtener_resultado, guardar_resultado
+from utils.procesado_imagen import leer_imagen, preparar_imagen, parte_imagen
+
+MODELO_ASISTENTE = "gemini-2.5-flash"
+
+# =========================
+# Prompts según nivel de detalle
+# =========================
+PROMPTS_DESCRIPCION = {
+    "breve": (
+        "Describe esta imagen brevemente en 2-3 frases. "
+        "Menciona solo los elementos más importantes."
+    ),
+    "normal": (
+        "Describe esta imagen de manera clara y completa. "
+        "Incluye: escenario principal, elementos visibles, colores, "
+        "personas u objetos relevantes, y el contexto general."
+    ),
+    "detallado": (
+        "Describe esta imagen con gran detalle. "
+        "Incluye: composición, colores, iluminación, "
+        "texturas, objetos específicos, personas (descripción si hay), "
+        "expresiones, entorno, atmósfera, y posibles significados o contexto."
+    )
+}
+
+# =========================
+# Prompts según tipo de análisis
+# =========================
+PROMPTS_ANALISIS = {
+    "general": (
+        "Analiza esta imagen completamente. Incluye: "
+        "1. Descripción general de la escena\n"
+        "2. Elementos principales y secundarios\n"
+        "3. Colores y composición\n"
+        "4. Posible contexto o significado\n"
+        "5. Calidad técnica de la imagen"
+    ),
+    "tecnico": (
+        "Haz un análisis técnico de esta imagen. Incluye: "
+        "1. Composición y regla de tercios\n"
+        "2. Iluminación y sombras\n"
+        "3. Enfoque y profundidad de campo\n"
+        "4. Colores y balance de blancos\n"
+        "5. Posibles ajustes de cámara usados\n"
+        "6. Calidad técnica general"
+    ),
+    "artistico": (
+        "Haz un análisis artístico de esta imagen. Incluye: "
+        "1. Estilo artístico\n"
+        "2. Uso del color y contraste\n"
+        "3. Composición y simetría\n"
+        "4. Emociones transmitidas\n"
+        "5. Influencias artísticas posibles\n"
+        "6. Valor estético general"
+    ),
+    "emocional": (
+        "Analiza el contenido emocional de esta imagen. Incluye: "
+        "1. Emociones principales transmitidas\n"
+        "2. Elementos que generan esas emociones\n"
+        "3. Colores y su impacto emocional\n"
+        "4. Composición y su efecto en el espectador\n"
+        "5. Mensaje emocional general\n"
+        "6. Cómo podría afectar a diferentes personas"
+    )
+}
 
 
 def describir_imagen(imagen_subida, api_key: str, nivel_detalle: str = "normal") -> str:
@@ -19,75 +81,41 @@ def describir_imagen(imagen_subida, api_key: str, nivel_detalle: str = "normal")
     # =========================
     # Validar tamaño de imagen
     # =========================
-    imagen_subida.seek(0, io.SEEK_END)
-    size_mb = imagen_subida.tell() / (1024 * 1024)
-    imagen_subida.seek(0)
+    original_bytes = leer_imagen(imagen_subida)
 
-    if size_mb > MAX_IMAGE_SIZE_MB:
-        raise ValueError(
-            f"❌ La imagen pesa {size_mb:.2f} MB. "
-            f"El máximo permitido es {MAX_IMAGE_SIZE_MB} MB."
-        )
+    prompt = PROMPTS_DESCRIPCION.get(nivel_detalle, PROMPTS_DESCRIPCION["normal"])
 
     # =========================
-    # Abrir imagen
+    # Consultar caché
     # =========================
-    image = Image.open(imagen_subida)
-
-    buffer = io.BytesIO()
-    image.save(buffer, format="PNG")
-    image_bytes = buffer.getvalue()
+    clave = clave_cache(original_bytes, "descripcion", prompt, MODELO_ASISTENTE)
+    descripcion_cacheada = obtener_resultado(clave)
+    if descripcion_cacheada is not None:
+        return descripcion_cacheada
 
     # =========================
-    # Base64
+    # Preparar imagen
     # =========================
-    image_base64 = base64.b64encode(image_bytes).decode("utf-8")
+    preparada = preparar_imagen(original_bytes, "descripcion")
 
     # =========================
-    # Definir prompts según nivel de detalle
+    # Bytes directos, sin base64
     # =========================
-    prompts = {
-        "breve": (
-            "Describe esta imagen brevemente en 2-3 frases. "
-            "Menciona solo los elementos más importantes."
-        ),
-        "normal": (
-            "Describe esta imagen de manera clara y completa. "
-            "Incluye: escenario principal, elementos visibles, colores, "
-            "personas u objetos relevantes, y el contexto general."
-        ),
-        "detallado": (
-            "Describe esta imagen con gran detalle. "
-            "Incluye: composición, colores, iluminación, "
-            "texturas, objetos específicos, personas (descripción si hay), "
-            "expresiones, entorno, atmósfera, y posibles significados o contexto."
-        )
-    }
-    
-    prompt = prompts.get(nivel_detalle, prompts["normal"])
+    imagen_parte = parte_imagen(preparada)
 
     # =========================
-    # Cliente Gemini
+    # Llamada a Gemini
     # =========================
-    client = genai.Client(api_key=api_key)
-
-    response = client.models.generate_content(
-        model="gemini-2.5-flash",
-        contents=[
-            {
-                "parts": [
-                    {
-                        "inline_data": {
-                            "mime_type": "image/png",
-                            "data": image_base64,
-                        }
-                    },
-                    {"text": prompt},
-                ]
-            }
+    response = generar_contenido(
+        api_key,
+        MODELO_ASISTENTE,
+        [
+            imagen_parte,
+            prompt,
         ],
     )
 
+    guardar_resultado(clave, "descripcion", response.text)
     return response.text
 
 
@@ -102,82 +130,76 @@ def analizar_imagen_avanzado(imagen_subida, api_key: str, tipo_analisis: str = "
     """
     
     # Validar tamaño (reutilizando código)
-    imagen_subida.seek(0, io.SEEK_END)
-    size_mb = imagen_subida.tell() / (1024 * 1024)
-    imagen_subida.seek(0)
-
-    if size_mb > MAX_IMAGE_SIZE_MB:
-        raise ValueError(
-            f"❌ La imagen pesa {size_mb:.2f} MB. "
-            f"El máximo permitido es {MAX_IMAGE_SIZE_MB} MB."
-        )
-
-    # Abrir imagen
-    image = Image.open(imagen_subida)
-    buffer = io.BytesIO()
-    image.save(buffer, format="PNG")
-    image_bytes = buffer.getvalue()
-    image_base64 = base64.b64encode(image_bytes).decode("utf-8")
-
-    # Definir prompts según tipo de análisis
-    prompts = {
-        "general": (
-            "Analiza esta imagen completamente. Incluye: "
-            "1. Descripción general de la escena\n"
-            "2. Elementos principales y secundarios\n"
-            "3. Colores y composición\n"
-            "4. Posible contexto o significado\n"
-            "5. Calidad técnica de la imagen"
-        ),
-        "tecnico": (
-            "Haz un análisis técnico de esta imagen. Incluye: "
-            "1. Composición y regla de tercios\n"
-            "2. Iluminación y sombras\n"
-            "3. Enfoque y profundidad de campo\n"
-            "4. Colores y balance de blancos\n"
-            "5. Posibles ajustes de cámara usados\n"
-            "6. Calidad técnica general"
-        ),
-        "artistico": (
-            "Haz un análisis artístico de esta imagen. Incluye: "
-            "1. Estilo artístico\n"
-            "2. Uso del color y contraste\n"
-            "3. Composición y simetría\n"
-            "4. Emociones transmitidas\n"
-            "5. Influencias artísticas posibles\n"
-            "6. Valor estético general"
-        ),
-        "emocional": (
-            "Analiza el contenido emocional de esta imagen. Incluye: "
-            "1. Emociones principales transmitidas\n"
-            "2. Elementos que generan esas emociones\n"
-            "3. Colores y su impacto emocional\n"
-            "4. Composición y su efecto en el espectador\n"
-            "5. Mensaje emocional general\n"
-            "6. Cómo podría afectar a diferentes personas"
-        )
-    }
-    
-    prompt = prompts.get(tipo_analisis, prompts["general"])
-    
-    # Cliente Gemini
-    client = genai.Client(api_key=api_key)
-    
-    response = client.models.generate_content(
-        model="gemini-2.5-flash",
-        contents=[
-            {
-                "parts": [
-                    {
-                        "inline_data": {
-                            "mime_type": "image/png",
-                            "data": image_base64,
-                        }
-                    },
-                    {"text": prompt},
-                ]
-            }
+    original_bytes = leer_imagen(imagen_subida)
+
+    prompt = PROMPTS_ANALISIS.get(tipo_analisis, PROMPTS_ANALISIS["general"])
+
+    # Consultar caché antes de tocar la imagen
+    clave = clave_cache(original_bytes, "analisis", prompt, MODELO_ASISTENTE)
+    analisis_cacheado = obtener_resultado(clave)
+    if analisis_cacheado is not None:
+        return analisis_cacheado
+
+    # Preparar imagen
+    preparada = preparar_imagen(original_bytes, "analisis")
+    imagen_parte = parte_imagen(preparada)
+
+    # Llamada a Gemini
+    response = generar_contenido(
+        api_key,
+        MODELO_ASISTENTE,
+        [
+            imagen_parte,
+            prompt,
         ],
     )
 
-    return response.text
\ No newline at end of file
+    guardar_resultado(clave, "analisis", response.text)
+    return response.text
+
+
+# =========================
+# VARIANTES EN STREAMING
+# =========================
+def describir_imagen_stream(imagen_subida, api_key: str, nivel_detalle: str = "normal"):
+    """
+    Como describir_imagen(), pero devuelve un generador con la descripción
+    por fragmentos según llega. El texto completo se guarda en la caché
+    al terminar.
+    """
+    original_bytes = leer_imagen(imagen_subida)
+    prompt = PROMPTS_DESCRIPCION.get(nivel_detalle, PROMPTS_DESCRIPCION["normal"])
+
+    clave = clave_cache(original_bytes, "descripcion", prompt, MODELO_ASISTENTE)
+    descripcion_cacheada = obtener_resultado(clave)
+    if descripcion_cacheada is not None:
+        return iter([descripcion_cacheada])
+
+    imagen_parte = parte_imagen(preparar_imagen(original_bytes, "descripcion"))
+
+    return generar_en_stream(
+        api_key,
+        MODELO_ASISTENTE,
+        [imagen_parte, prompt],
+        al_terminar=lambda texto: guardar_resultado(clave, "descripcion", texto),
+    )
+
+
+def analizar_imagen_avanzado_stream(imagen_subida, api_key: str, tipo_analisis: str = "general"):
+    """Como analizar_imagen_avanzado(), pero en streaming."""
+    original_bytes = leer_imagen(imagen_subida)
+    prompt = PROMPTS_ANALISIS.get(tipo_analisis, PROMPTS_ANALISIS["general"])
+
+    clave = clave_cache(original_bytes, "analisis", prompt, MODELO_ASISTENTE)
+    analisis_cacheado = obtener_resultado(clave)
+    if analisis_cacheado is not None:
+        return iter([analisis_cacheado])
+
+    imagen_parte = parte_imagen(preparar_imagen(original_bytes, "analisis"))
+
+    return generar_en_stream(
+        api_key,
+        MODELO_ASISTENTE,
+        [imagen_parte, prompt],
+        al_terminar=lambda texto: guardar_resultado(clave, "analisis", texto),
+    )
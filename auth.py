@@ -1,40 +1,25 @@
 import sqlite3
-import bcrypt
 import re
 import json
 from datetime import datetime
 
-# En auth.py y gallery.py, cambia:
-DB_NAME = "users.db"
-
-# Por algo como:
-import tempfile
-import os
+from utils.conexion_db import conexion, transaccion
+from utils.migraciones import aplicar_migraciones
+from utils.hash_contrasenas import (
+    hashear_contrasena,
+    verificar_contrasena,
+    necesita_rehash,
+    registrar_rehash,
+)
 
-# Usar directorio temporal en Streamlit Cloud
-if "STREAMLIT_CLOUD" in os.environ:
-    DB_PATH = os.path.join(tempfile.gettempdir(), "users.db")
-else:
-    DB_PATH = "users.db"
+DB_NAME = "users.db"
 
 # =========================
 # DB INIT
 # =========================
 def init_db():
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
-
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS usuarios (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            email TEXT UNIQUE NOT NULL,
-            password_hash TEXT NOT NULL,
-            fecha_registro TEXT NOT NULL
-        )
-    """)
-
-    conn.commit()
-    conn.close()
+    """Crea o actualiza el esquema (ver utils.migraciones)."""
+    aplicar_migraciones(DB_NAME)
 
 
 # =========================
@@ -59,74 +44,72 @@ def registrar_usuario(email: str, password: str):
     if not password_segura(password):
         raise ValueError("❌ La contraseña debe tener al menos 6 caracteres")
 
-    password_hash = bcrypt.hashpw(
-        password.encode("utf-8"),
-        bcrypt.gensalt()
-    ).decode("utf-8")
-
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
+    # bcrypt en el pool de procesos (ver utils.hash_contrasenas)
+    password_hash = hashear_contrasena(password)
 
     try:
-        cursor.execute(
-            """
-            INSERT INTO usuarios (email, password_hash, fecha_registro)
-            VALUES (?, ?, ?)
-            """,
-            (email, password_hash, datetime.now().isoformat())
-        )
-        conn.commit()
+        with transaccion(DB_NAME) as conn:
+            conn.execute(
+                """
+                INSERT INTO usuarios (email, password_hash, fecha_registro)
+                VALUES (?, ?, ?)
+                """,
+                (email, password_hash, datetime.now().isoformat())
+            )
     except sqlite3.IntegrityError:
         raise ValueError("❌ El email ya está registrado")
-    finally:
-        conn.close()
 
 
 # =========================
 # LOGIN
 # =========================
 def login_usuario(email: str, password: str) -> bool:
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
-
-    cursor.execute(
-        """
-        SELECT id, password_hash FROM usuarios WHERE email = ?
-        """,
-        (email,)
-    )
-    row = cursor.fetchone()
-    conn.close()
+    with conexion(DB_NAME) as conn:
+        row = conn.execute(
+            """
+            SELECT id, password_hash FROM usuarios WHERE email = ?
+            """,
+            (email,)
+        ).fetchone()
 
     if not row:
         return None
 
     usuario_id, password_hash = row
-    password_hash = password_hash.encode("utf-8")
-    
-    if bcrypt.checkpw(password.encode("utf-8"), password_hash):
-        return usuario_id
-    
-    return None
+
+    if not verificar_contrasena(password, password_hash):
+        return None
+
+    # Hash con un coste distinto del configurado: se rehace ahora que
+    # tenemos la contraseña en claro. Solo si nadie la ha cambiado entre
+    # medias.
+    if necesita_rehash(password_hash):
+        # El hash, fuera del bloqueo de escritura
+        nuevo_password_hash = hashear_contrasena(password)
+        with transaccion(DB_NAME) as conn:
+            actualizadas = conn.execute(
+                "UPDATE usuarios SET password_hash = ? WHERE id = ? AND password_hash = ?",
+                (nuevo_password_hash, usuario_id, password_hash)
+            ).rowcount
+        if actualizadas:
+            registrar_rehash()
+
+    return usuario_id
 
 
 # =========================
 # OBTENER DATOS DE USUARIO
 # =========================
 def obtener_datos_usuario(usuario_id: int):
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
-
-    cursor.execute(
-        """
-        SELECT id, email, fecha_registro
-        FROM usuarios
-        WHERE id = ?
-        """,
-        (usuario_id,)
-    )
-    row = cursor.fetchone()
-    conn.close()
+    with conexion(DB_NAME) as conn:
+        row = conn.execute(
+            """
+            SELECT id, email, fecha_registro
+            FROM usuarios
+            WHERE id = ?
+            """,
+            (usuario_id,)
+        ).fetchone()
 
     if row:
         return {
@@ -144,39 +127,27 @@ def cambiar_contraseña(usuario_id: int, password_actual: str, nueva_password: s
     if not password_segura(nueva_password):
         raise ValueError("❌ La nueva contraseña debe tener al menos 6 caracteres")
 
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
-
     # Verificar contraseña actual
-    cursor.execute(
-        "SELECT password_hash FROM usuarios WHERE id = ?",
-        (usuario_id,)
-    )
-    row = cursor.fetchone()
+    with conexion(DB_NAME) as conn:
+        row = conn.execute(
+            "SELECT password_hash FROM usuarios WHERE id = ?",
+            (usuario_id,)
+        ).fetchone()
     
     if not row:
-        conn.close()
         return False
 
-    password_hash_actual = row[0].encode("utf-8")
-    
-    if not bcrypt.checkpw(password_actual.encode("utf-8"), password_hash_actual):
-        conn.close()
+    if not verificar_contrasena(password_actual, row[0]):
         raise ValueError("❌ Contraseña actual incorrecta")
 
     # Generar nuevo hash
-    nuevo_password_hash = bcrypt.hashpw(
-        nueva_password.encode("utf-8"),
-        bcrypt.gensalt()
-    ).decode("utf-8")
+    nuevo_password_hash = hashear_contrasena(nueva_password)
 
     # Actualizar en la base de datos
-    cursor.execute(
-        "UPDATE usuarios SET password_hash = ? WHERE id = ?",
-        (nuevo_password_hash, usuario_id)
-    )
-    
-    conn.commit()
-    conn.close()
+    with transaccion(DB_NAME) as conn:
+        conn.execute(
+            "UPDATE usuarios SET password_hash = ? WHERE id = ?",
+            (nuevo_password_hash, usuario_id)
+        )
 
     return True
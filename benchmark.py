@@ -0,0 +1,383 @@
+"""
+Mediciones de rendimiento contra la API real de Gemini.
+
+    python -m utils.benchmark streaming ejemplo.png --repeticiones 3
+
+Lee GEMINI_API_KEY del .env. La caché de resultados se desactiva para
+medir siempre la latencia del modelo.
+
+Y de la instantánea en Parquet, los logins y el arranque en frío
+(locales, sin API):
+
+    python -m utils.benchmark parquet --filas 1000000
+    python -m utils.benchmark bcrypt --logins 200 --concurrencia 32
+    python -m utils.benchmark importacion
+"""
+import argparse
+import ast
+import io
+import os
+import sqlite3
+import statistics
+import subprocess
+import sys
+import time
+
+# Presupuesto de importación de la pantalla de login (sin contar
+# streamlit) y dependencias que no deben cargarse antes del login
+PRESUPUESTO_IMPORTACION_MS = float(os.getenv("PRESUPUESTO_IMPORTACION_MS", "400"))
+MODULOS_PESADOS = ("google.genai", "plotly", "PIL", "pandas", "pyarrow", "numpy")
+
+
+# =========================
+# MEDICIONES
+# =========================
+def medir_stream(fragmentos) -> dict:
+    """
+    Consume un generador de fragmentos de texto y mide el tiempo hasta el
+    primer fragmento (TTFT) por separado del tiempo total.
+
+    El cronómetro empieza al pedir el primer fragmento: si la función que
+    crea el generador hace trabajo previo (leer la imagen, consultar la
+    caché...), hay que medirlo con medir_stream(lambda: funcion(...)).
+
+    :param fragmentos: Generador, o función sin argumentos que lo devuelve
+    :return: {"ttft_s", "total_s", "fragmentos", "caracteres"}
+    """
+    inicio = time.perf_counter()
+    if callable(fragmentos):
+        fragmentos = fragmentos()
+
+    ttft = None
+    cantidad = caracteres = 0
+    for fragmento in fragmentos:
+        if ttft is None:
+            ttft = time.perf_counter() - inicio
+        cantidad += 1
+        caracteres += len(fragmento)
+
+    total = time.perf_counter() - inicio
+    return {
+        "ttft_s": ttft if ttft is not None else total,
+        "total_s": total,
+        "fragmentos": cantidad,
+        "caracteres": caracteres,
+    }
+
+
+def medir_llamada(funcion) -> dict:
+    """Tiempo total de una llamada sin streaming (el primer token llega al final)."""
+    inicio = time.perf_counter()
+    resultado = funcion()
+    total = time.perf_counter() - inicio
+    return {
+        "ttft_s": total,
+        "total_s": total,
+        "fragmentos": 1,
+        "caracteres": len(resultado or ""),
+    }
+
+
+def _resumen(nombre: str, medidas: list) -> dict:
+    return {
+        "prueba": nombre,
+        "ttft_mediana_s": statistics.median(m["ttft_s"] for m in medidas),
+        "total_mediana_s": statistics.median(m["total_s"] for m in medidas),
+        "fragmentos": statistics.median(m["fragmentos"] for m in medidas),
+    }
+
+
+# =========================
+# BENCHMARK DE STREAMING
+# =========================
+def benchmark_streaming(ruta_imagen: str, api_key: str, repeticiones: int = 3) -> list:
+    """
+    Compara cada tarea con y sin streaming: TTFT y latencia total
+    (medianas de `repeticiones` ejecuciones).
+    """
+    from utils import cache_resultados
+    from utils.gemini_vision import extraer_texto_imagen, extraer_texto_imagen_stream
+    from utils.assistant import (
+        describir_imagen,
+        describir_imagen_stream,
+        analizar_imagen_avanzado,
+        analizar_imagen_avanzado_stream,
+    )
+    from utils.translator import traducir_texto, traducir_texto_stream
+
+    cache_resultados.CACHE_ACTIVA = False
+
+    with open(ruta_imagen, "rb") as archivo:
+        imagen = archivo.read()
+
+    texto = extraer_texto_imagen(io.BytesIO(imagen), api_key) or "Hola, mundo."
+
+    pruebas = {
+        "ocr": (
+            lambda: extraer_texto_imagen(io.BytesIO(imagen), api_key),
+            lambda: extraer_texto_imagen_stream(io.BytesIO(imagen), api_key),
+        ),
+        "descripcion (detallado)": (
+            lambda: describir_imagen(io.BytesIO(imagen), api_key, "detallado"),
+            lambda: describir_imagen_stream(io.BytesIO(imagen), api_key, "detallado"),
+        ),
+        "analisis (tecnico)": (
+            lambda: analizar_imagen_avanzado(io.BytesIO(imagen), api_key, "tecnico"),
+            lambda: analizar_imagen_avanzado_stream(io.BytesIO(imagen), api_key, "tecnico"),
+        ),
+        "traduccion (inglés)": (
+            lambda: traducir_texto(texto, "inglés", api_key),
+            lambda: traducir_texto_stream(texto, "inglés", api_key),
+        ),
+    }
+
+    filas = []
+    for nombre, (completa, stream) in pruebas.items():
+        filas.append(_resumen(f"{nombre} - completa", [medir_llamada(completa) for _ in range(repeticiones)]))
+        filas.append(_resumen(f"{nombre} - stream", [medir_stream(stream) for _ in range(repeticiones)]))
+    return filas
+
+
+# =========================
+# BENCHMARK DE LA INSTANTÁNEA PARQUET
+# =========================
+def benchmark_parquet(filas: int = 1_000_000, usuarios: int = 100) -> dict:
+    """
+    Crea una base de datos temporal con `filas` imágenes sintéticas (sin
+    blobs) y compara la instantánea en Parquet con volcar esas mismas
+    filas a NDJSON: segundos y tamaño en disco.
+    """
+    import json
+    import tempfile
+
+    from utils import exportacion_columnar
+    from utils.conexion_db import cerrar_conexiones
+    from utils.migraciones import aplicar_migraciones
+
+    with tempfile.TemporaryDirectory() as carpeta:
+        db = os.path.join(carpeta, "benchmark.db")
+        aplicar_migraciones(db)
+
+        conn = sqlite3.connect(db)
+        conn.executemany(
+            """
+            INSERT INTO imagenes (usuario_id, imagen_hash, texto_original, fecha_subida, tipo, fecha_epoch, dia)
+            VALUES (?, ?, ?, ?, 'ocr', ?, ?)
+            """,
+            (
+                (
+                    i % usuarios + 1,
+                    f"{i:064x}",
+                    f"Ticket {i}: TOTAL {i % 997},50 €",
+                    f"2025-{i % 12 + 1:02d}-{i % 28 + 1:02d}T12:00:00",
+                    1735732800 + i,
+                    f"2025-{i % 12 + 1:02d}-{i % 28 + 1:02d}",
+                )
+                for i in range(filas)
+            ),
+        )
+        conn.commit()
+
+        inicio = time.perf_counter()
+        ruta_json = os.path.join(carpeta, "imagenes.ndjson")
+        cursor = conn.execute(exportacion_columnar.TABLAS["imagenes"][0])
+        nombres = exportacion_columnar.TABLAS["imagenes"][1].names
+        with open(ruta_json, "w", encoding="utf-8") as archivo:
+            for fila in cursor:
+                archivo.write(json.dumps(dict(zip(nombres, fila)), ensure_ascii=False) + "\n")
+        segundos_json = time.perf_counter() - inicio
+        conn.close()
+
+        exportacion_columnar.DB_NAME = db
+        resultado = exportacion_columnar.exportar_parquet(os.path.join(carpeta, "parquet"), tablas=["imagenes"])
+        cerrar_conexiones()
+
+        return {
+            "filas": filas,
+            "parquet_s": resultado["segundos"],
+            "parquet_bytes": resultado["imagenes"]["bytes"],
+            "ndjson_s": segundos_json,
+            "ndjson_bytes": os.path.getsize(ruta_json),
+        }
+
+
+# =========================
+# BENCHMARK DE LOGINS (BCRYPT)
+# =========================
+def benchmark_bcrypt(logins: int = 200, concurrencia: int = 32, coste: int = None, procesos: int = None) -> dict:
+    """
+    Lanza `logins` verificaciones de contraseña desde `concurrencia` hilos a
+    la vez (como sesiones de Streamlit) contra el servicio de hash y mide
+    el rendimiento y la latencia de cada login, cola incluida.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    from utils import hash_contrasenas
+
+    if coste is not None:
+        hash_contrasenas.BCRYPT_COSTE = coste
+    if procesos is not None:
+        hash_contrasenas.BCRYPT_PROCESOS = procesos
+    # Sin rechazos: aquí se mide la cola, no el límite
+    hash_contrasenas.MAX_PENDIENTES_HASH = max(hash_contrasenas.MAX_PENDIENTES_HASH, concurrencia)
+    hash_contrasenas.MAX_ESPERA_HASH_SEGUNDOS = float("inf")
+
+    hash_contrasenas.cerrar_servicio_hash()
+    for futuro in hash_contrasenas.iniciar_servicio_hash():
+        futuro.result()
+    password_hash = hash_contrasenas.hashear_contrasena("contraseña de prueba")
+
+    def login(_):
+        inicio = time.perf_counter()
+        hash_contrasenas.verificar_contrasena("contraseña de prueba", password_hash)
+        return time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrencia) as ejecutor:
+        latencias = sorted(ejecutor.map(login, range(logins)))
+    total = time.perf_counter() - inicio
+    hash_contrasenas.cerrar_servicio_hash()
+
+    nucleos = max(hash_contrasenas.BCRYPT_PROCESOS, 1)
+    return {
+        "coste": hash_contrasenas.BCRYPT_COSTE,
+        "procesos": hash_contrasenas.BCRYPT_PROCESOS,
+        "logins_por_segundo": logins / total,
+        "logins_por_segundo_y_nucleo": logins / total / nucleos,
+        "p50_ms": statistics.median(latencias) * 1000,
+        "p99_ms": latencias[min(int(len(latencias) * 0.99), len(latencias) - 1)] * 1000,
+    }
+
+
+# =========================
+# BENCHMARK DE IMPORTACIÓN (ARRANQUE EN FRÍO)
+# =========================
+def modulos_pantalla_login(ruta_app: str = None) -> list:
+    """
+    Módulos que app.py importa antes de mostrar el login: los imports de
+    nivel superior anteriores al bloque `if not st.session_state.autenticado`.
+    streamlit no se cuenta (lo carga el propio servidor).
+    """
+    ruta_app = ruta_app or os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+    with open(ruta_app, encoding="utf-8") as archivo:
+        codigo = archivo.read()
+
+    # Solo se analiza hasta el login (el resto puede usar sintaxis de una
+    # versión de Python más nueva que la del intérprete que mide)
+    fin = codigo.find("\nif not st.session_state.autenticado")
+    arbol = ast.parse(codigo if fin < 0 else codigo[:fin])
+
+    modulos = []
+    for nodo in arbol.body:
+        if isinstance(nodo, ast.Import):
+            modulos += [alias.name for alias in nodo.names]
+        elif isinstance(nodo, ast.ImportFrom) and nodo.module:
+            modulos.append(nodo.module)
+
+    return [m for m in dict.fromkeys(modulos) if m.split(".")[0] != "streamlit"]
+
+
+def medir_importacion(modulos: list) -> dict:
+    """
+    Importa los módulos en un intérprete nuevo con `python -X importtime`.
+
+    :return: {"total_ms": tiempo acumulado de importar esos módulos,
+              "modulos": {módulo: ms acumulados} de todo lo que se ha cargado}
+    """
+    entorno = dict(os.environ, PYTHONPATH=os.pathsep.join(p for p in sys.path if p))
+    proceso = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "; ".join(f"import {m}" for m in modulos) or "pass"],
+        capture_output=True,
+        text=True,
+        env=entorno,
+        check=True,
+    )
+
+    # Los módulos y sus paquetes padre ("utils" por "utils.auth")
+    pedidos = {".".join(m.split(".")[:i + 1]) for m in modulos for i in range(m.count(".") + 1)}
+    cargados = {}
+    total_us = 0
+    for linea in proceso.stderr.splitlines():
+        if not linea.startswith("import time:") or "cumulative" in linea:
+            continue
+        _, acumulado, nombre = linea[len("import time:"):].split("|")
+        nombre = nombre.rstrip()[1:]  # Quitar el espacio tras "|"
+        cargados[nombre.strip()] = int(acumulado) / 1000
+        # Imports de primer nivel (sin sangría) pedidos; lo que carga el
+        # propio intérprete al arrancar (site...) no cuenta
+        if nombre.lstrip() == nombre and nombre.strip() in pedidos:
+            total_us += int(acumulado)
+
+    return {"total_ms": total_us / 1000, "modulos": cargados}
+
+
+def modulos_pesados_cargados(cargados) -> list:
+    return sorted(
+        m for m in cargados
+        if any(m == pesado or m.startswith(pesado + ".") for pesado in MODULOS_PESADOS)
+    )
+
+
+def imprimir_tabla(filas: list):
+    print(f"{'prueba':<40} {'TTFT (s)':>10} {'total (s)':>10} {'fragmentos':>11}")
+    for fila in filas:
+        print(
+            f"{fila['prueba']:<40} {fila['ttft_mediana_s']:>10.2f} "
+            f"{fila['total_mediana_s']:>10.2f} {fila['fragmentos']:>11.0f}"
+        )
+
+
+def main():
+    from dotenv import load_dotenv
+
+    parser = argparse.ArgumentParser(description="Benchmarks de AI Content Studio")
+    subparsers = parser.add_subparsers(dest="prueba", required=True)
+
+    streaming = subparsers.add_parser("streaming", help="TTFT y latencia total con y sin streaming")
+    streaming.add_argument("imagen", help="Ruta de la imagen de prueba")
+    streaming.add_argument("--repeticiones", type=int, default=3)
+
+    parquet = subparsers.add_parser("parquet", help="Instantánea Parquet frente a NDJSON (sin API)")
+    parquet.add_argument("--filas", type=int, default=1_000_000)
+
+    logins = subparsers.add_parser("bcrypt", help="Logins por segundo y núcleo y latencia p99 (sin API)")
+    logins.add_argument("--logins", type=int, default=200)
+    logins.add_argument("--concurrencia", type=int, default=32)
+    logins.add_argument("--coste", type=int, default=None, help="Por defecto BCRYPT_COSTE")
+    logins.add_argument("--procesos", type=int, default=None, help="Por defecto BCRYPT_PROCESOS")
+
+    importacion = subparsers.add_parser("importacion", help="Tiempo de importación de la pantalla de login (sin API)")
+    importacion.add_argument("--modulos", nargs="*", default=None, help="Por defecto, los de app.py antes del login")
+
+    args = parser.parse_args()
+
+    if args.prueba == "streaming":
+        load_dotenv()
+        api_key = os.getenv("GEMINI_API_KEY")
+        if not api_key:
+            raise SystemExit("❌ No se ha encontrado la variable GEMINI_API_KEY en el .env")
+        imprimir_tabla(benchmark_streaming(args.imagen, api_key, args.repeticiones))
+    elif args.prueba == "parquet":
+        r = benchmark_parquet(args.filas)
+        print(f"{r['filas']} filas de imagenes")
+        print(f"  Parquet: {r['parquet_s']:>6.2f} s {r['parquet_bytes'] / 1024 / 1024:>8.1f} MiB")
+        print(f"  NDJSON:  {r['ndjson_s']:>6.2f} s {r['ndjson_bytes'] / 1024 / 1024:>8.1f} MiB")
+    elif args.prueba == "bcrypt":
+        r = benchmark_bcrypt(args.logins, args.concurrencia, args.coste, args.procesos)
+        print(f"bcrypt coste {r['coste']}, {r['procesos']} procesos")
+        print(f"  {r['logins_por_segundo']:.1f} logins/s ({r['logins_por_segundo_y_nucleo']:.1f} por núcleo)")
+        print(f"  latencia p50 {r['p50_ms']:.0f} ms, p99 {r['p99_ms']:.0f} ms")
+    elif args.prueba == "importacion":
+        modulos = args.modulos if args.modulos is not None else modulos_pantalla_login()
+        r = medir_importacion(modulos)
+        print(f"{', '.join(modulos)}")
+        print(f"  {r['total_ms']:.0f} ms (presupuesto {PRESUPUESTO_IMPORTACION_MS:.0f} ms)")
+        for nombre, ms in sorted(r["modulos"].items(), key=lambda m: -m[1])[:10]:
+            print(f"  {ms:>8.1f} ms  {nombre}")
+        pesados = modulos_pesados_cargados(r["modulos"])
+        if pesados:
+            print(f"  ⚠️ Dependencias pesadas cargadas: {', '.join(pesados)}")
+
+
+if __name__ == "__main__":
+    main()
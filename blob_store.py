@@ -0,0 +1,226 @@
+import hashlib
+import os
+import tempfile
+import time
+from datetime import datetime
+
+BLOB_DIR = os.getenv("BLOB_DIR", "blobs")
+# Archivos sin fila en la tabla más recientes que esto no se barren: pueden
+# ser de una transacción que todavía no ha hecho commit
+BLOB_GRACIA_SEGUNDOS = float(os.getenv("BLOB_GRACIA_SEGUNDOS", "3600"))
+
+_SUFIJO_BORRAR = ".borrar"
+
+
+# =========================
+# CREAR TABLA DE BLOBS
+# =========================
+def init_blob_store(cursor):
+    """
+    Crea la tabla de referencias. Cada fila es un archivo en BLOB_DIR,
+    identificado por el SHA-256 de su contenido.
+    """
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS blobs (
+            hash TEXT PRIMARY KEY,
+            tamano INTEGER NOT NULL,
+            referencias INTEGER NOT NULL DEFAULT 0,
+            fecha_creacion TEXT NOT NULL
+        )
+    """)
+
+
+def ruta_blob(blob_hash: str) -> str:
+    """Ruta del archivo: blobs/ab/cd/abcd... (dos niveles de subcarpetas)."""
+    return os.path.join(BLOB_DIR, blob_hash[:2], blob_hash[2:4], blob_hash)
+
+
+# =========================
+# GUARDAR BLOB
+# =========================
+def escribir_blob(datos) -> str:
+    """
+    Escribe el archivo (si no existía ya) sin tocar la base de datos.
+    Se llama antes de abrir la transacción: si luego se deshace, el
+    archivo queda sin fila y lo barre recolectar_basura().
+
+    :param datos: bytes o memoryview de la imagen
+    :return: Hash SHA-256 del contenido
+    """
+    blob_hash = hashlib.sha256(datos).hexdigest()
+    ruta = ruta_blob(blob_hash)
+    if not os.path.exists(ruta):
+        _escribir_atomico(ruta, datos)
+    return blob_hash
+
+
+def guardar_blob(cursor, datos) -> str:
+    """
+    Suma una referencia al contenido, dentro de la transacción de quien
+    crea la referencia.
+
+    El archivo ya debería estar escrito (ver escribir_blob). Solo se
+    vuelve a escribir si la recolección de basura lo retiró entre tanto:
+    con el bloqueo de escritura tomado ya no puede volver a hacerlo.
+
+    :param cursor: Cursor de la conexión (sin commit todavía)
+    :param datos: bytes o memoryview de la imagen
+    :return: Hash SHA-256 del contenido
+    """
+    blob_hash = hashlib.sha256(datos).hexdigest()
+
+    cursor.execute(
+        """
+        INSERT INTO blobs (hash, tamano, referencias, fecha_creacion)
+        VALUES (?, ?, 1, ?)
+        ON CONFLICT(hash) DO UPDATE SET referencias = referencias + 1
+        """,
+        (blob_hash, len(datos), datetime.now().isoformat())
+    )
+
+    ruta = ruta_blob(blob_hash)
+    if not os.path.exists(ruta):
+        _escribir_atomico(ruta, datos)
+
+    return blob_hash
+
+
+def _escribir_atomico(ruta: str, datos):
+    carpeta = os.path.dirname(ruta)
+    os.makedirs(carpeta, exist_ok=True)
+
+    fd, temporal = tempfile.mkstemp(dir=carpeta, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as archivo:
+            archivo.write(datos)
+        os.replace(temporal, ruta)
+    except BaseException:
+        if os.path.exists(temporal):
+            os.remove(temporal)
+        raise
+
+
+# =========================
+# LEER BLOB
+# =========================
+def leer_blob(blob_hash: str) -> bytes:
+    """Devuelve el contenido del blob o None si no existe."""
+    try:
+        with open(ruta_blob(blob_hash), "rb") as archivo:
+            return archivo.read()
+    except FileNotFoundError:
+        return None
+
+
+# =========================
+# LIBERAR REFERENCIAS
+# =========================
+def liberar_blobs(cursor, hashes: list):
+    """
+    Resta una referencia por cada hash (puede repetirse). Los archivos no
+    se borran aquí: ver recolectar_basura().
+    """
+    for blob_hash in hashes:
+        if blob_hash:
+            cursor.execute(
+                "UPDATE blobs SET referencias = referencias - 1 WHERE hash = ?",
+                (blob_hash,)
+            )
+
+
+def recolectar_basura(conn, hashes: list = None) -> int:
+    """
+    Elimina los blobs sin referencias (fila y archivo). Sin hashes barre
+    además los archivos de BLOB_DIR que no tienen fila (p. ej. de una
+    transacción deshecha) y que superan BLOB_GRACIA_SEGUNDOS.
+
+    Dentro de la transacción los archivos solo se renombran; se borran
+    después del commit, o recuperan su nombre si se deshace.
+
+    :param conn: Conexión a la base de datos
+    :param hashes: Limitar la búsqueda a estos hashes (None = todos)
+    :return: Número de blobs eliminados
+    """
+    cursor = conn.cursor()
+    cursor.execute("BEGIN IMMEDIATE")
+    retirados = []
+    restos = []
+
+    try:
+        if hashes is None:
+            cursor.execute("SELECT hash FROM blobs WHERE referencias <= 0")
+        else:
+            hashes = list({h for h in hashes if h})
+            if not hashes:
+                conn.rollback()
+                return 0
+            placeholders = ','.join(['?'] * len(hashes))
+            cursor.execute(
+                f"SELECT hash FROM blobs WHERE referencias <= 0 AND hash IN ({placeholders})",
+                hashes
+            )
+        huerfanos = [fila[0] for fila in cursor.fetchall()]
+
+        # Antes de borrar filas: lo que se retire aquí no cuenta como resto
+        sin_fila = []
+        if hashes is None:
+            sin_fila, restos = _archivos_sin_fila(cursor)
+
+        for blob_hash in huerfanos:
+            cursor.execute("DELETE FROM blobs WHERE hash = ?", (blob_hash,))
+            _retirar(ruta_blob(blob_hash), retirados)
+        for ruta in sin_fila:
+            _retirar(ruta, retirados)
+
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        for ruta in retirados:
+            os.replace(ruta + _SUFIJO_BORRAR, ruta)
+        raise
+
+    for ruta in [r + _SUFIJO_BORRAR for r in retirados] + restos:
+        try:
+            os.remove(ruta)
+        except FileNotFoundError:
+            pass
+
+    return len(huerfanos) + len(sin_fila)
+
+
+def _retirar(ruta: str, retirados: list):
+    # Un guardar_blob que espere al bloqueo ya no encuentra el archivo y
+    # lo vuelve a escribir
+    try:
+        os.replace(ruta, ruta + _SUFIJO_BORRAR)
+        retirados.append(ruta)
+    except FileNotFoundError:
+        pass
+
+
+def _archivos_sin_fila(cursor):
+    # Devuelve (archivos de blob sin fila, temporales abandonados), todos
+    # más antiguos que BLOB_GRACIA_SEGUNDOS
+    if not os.path.isdir(BLOB_DIR):
+        return [], []
+
+    cursor.execute("SELECT hash FROM blobs")
+    conocidos = {fila[0] for fila in cursor.fetchall()}
+    limite = time.time() - BLOB_GRACIA_SEGUNDOS
+
+    sin_fila, restos = [], []
+    for carpeta, _, nombres in os.walk(BLOB_DIR):
+        for nombre in nombres:
+            ruta = os.path.join(carpeta, nombre)
+            try:
+                if os.path.getmtime(ruta) > limite:
+                    continue
+            except FileNotFoundError:
+                continue
+
+            if nombre.endswith((".tmp", _SUFIJO_BORRAR)):
+                restos.append(ruta)
+            elif nombre not in conocidos:
+                sin_fila.append(ruta)
+
+    return sin_fila, restos
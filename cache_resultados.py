@@ -0,0 +1,309 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from utils.conexion_db import conexion, transaccion
+
+# =========================
+# Configuración de la caché
+# =========================
+CACHE_DB = os.getenv("GEMINI_CACHE_DB", "cache_gemini.db")
+CACHE_MAX_MB = float(os.getenv("GEMINI_CACHE_MAX_MB", "200"))
+CACHE_MAX_DIAS = float(os.getenv("GEMINI_CACHE_MAX_DIAS", "30"))
+# "0" desactiva la caché (p. ej. para medir latencias reales del modelo)
+CACHE_ACTIVA = os.getenv("GEMINI_CACHE_ACTIVA", "1") != "0"
+
+# Aciertos, fallos y últimos accesos se acumulan en memoria y se escriben
+# juntos (cada N operaciones, cada X segundos o con el siguiente guardado):
+# un acierto es solo una lectura y no toma el bloqueo de escritura
+CACHE_VOLCADO_OPERACIONES = int(os.getenv("GEMINI_CACHE_VOLCADO_OPERACIONES", "100"))
+CACHE_VOLCADO_SEGUNDOS = float(os.getenv("GEMINI_CACHE_VOLCADO_SEGUNDOS", "30"))
+
+_lock = threading.Lock()
+_preparadas = set()
+_pendientes = {}
+
+
+def _preparar(db: str):
+    # El esquema se crea una vez por base de datos y proceso. "bytes" en
+    # contadores es el tamaño total, mantenido por triggers: la expulsión
+    # no tiene que sumar la tabla en cada guardado.
+    with _lock:
+        if db in _preparadas:
+            return
+
+    with transaccion(db) as conn:
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS resultados (
+                clave TEXT PRIMARY KEY,
+                tarea TEXT NOT NULL,
+                valor TEXT NOT NULL,
+                tamano INTEGER NOT NULL,
+                creado REAL NOT NULL,
+                ultimo_acceso REAL NOT NULL
+            )
+        """)
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_resultados_acceso ON resultados(ultimo_acceso)"
+        )
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS contadores (
+                nombre TEXT PRIMARY KEY,
+                valor INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+        # Cachés creadas antes de los triggers: se parte de la suma actual
+        conn.execute("""
+            INSERT OR IGNORE INTO contadores (nombre, valor)
+            SELECT 'bytes', COALESCE(SUM(tamano), 0) FROM resultados
+        """)
+        conn.execute("""
+            CREATE TRIGGER IF NOT EXISTS trg_resultados_insertar
+            AFTER INSERT ON resultados
+            BEGIN
+                INSERT INTO contadores (nombre, valor) VALUES ('bytes', NEW.tamano)
+                ON CONFLICT(nombre) DO UPDATE SET valor = valor + excluded.valor;
+            END
+        """)
+        conn.execute("""
+            CREATE TRIGGER IF NOT EXISTS trg_resultados_actualizar
+            AFTER UPDATE OF tamano ON resultados
+            BEGIN
+                UPDATE contadores SET valor = valor + NEW.tamano - OLD.tamano WHERE nombre = 'bytes';
+            END
+        """)
+        conn.execute("""
+            CREATE TRIGGER IF NOT EXISTS trg_resultados_borrar
+            AFTER DELETE ON resultados
+            BEGIN
+                UPDATE contadores SET valor = valor - OLD.tamano WHERE nombre = 'bytes';
+            END
+        """)
+
+    with _lock:
+        _preparadas.add(db)
+
+
+def _incrementar(conn, nombre: str, cantidad: int = 1):
+    conn.execute(
+        """
+        INSERT INTO contadores (nombre, valor) VALUES (?, ?)
+        ON CONFLICT(nombre) DO UPDATE SET valor = valor + excluded.valor
+        """,
+        (nombre, cantidad)
+    )
+
+
+# =========================
+# ACCESOS PENDIENTES
+# =========================
+def _anotar(db: str, nombre: str, clave: str = None, ahora: float = None):
+    # Cuenta un acierto o un fallo (y el acceso a la clave) en memoria y
+    # lo escribe si ya toca
+    with _lock:
+        pendiente = _pendientes.setdefault(
+            db, {"aciertos": 0, "fallos": 0, "accesos": {}, "desde": time.monotonic()}
+        )
+        pendiente[nombre] += 1
+        if clave:
+            pendiente["accesos"][clave] = ahora
+
+        operaciones = pendiente["aciertos"] + pendiente["fallos"]
+        if (
+            operaciones < CACHE_VOLCADO_OPERACIONES
+            and time.monotonic() - pendiente["desde"] < CACHE_VOLCADO_SEGUNDOS
+        ):
+            return
+
+    try:
+        with transaccion(db) as conn:
+            _volcar(conn, db)
+    except sqlite3.Error:
+        # Solo son estadísticas y orden de expulsión: se reintenta luego
+        pass
+
+
+def _volcar(conn, db: str):
+    # Escribe lo pendiente en la transacción de conn
+    with _lock:
+        pendiente = _pendientes.pop(db, None)
+    if not pendiente:
+        return
+
+    try:
+        conn.executemany(
+            "UPDATE resultados SET ultimo_acceso = MAX(ultimo_acceso, ?) WHERE clave = ?",
+            [(ahora, clave) for clave, ahora in pendiente["accesos"].items()]
+        )
+        for nombre in ("aciertos", "fallos"):
+            if pendiente[nombre]:
+                _incrementar(conn, nombre, pendiente[nombre])
+    except sqlite3.Error:
+        _devolver_pendiente(db, pendiente)
+        raise
+
+
+def _devolver_pendiente(db: str, pendiente: dict):
+    with _lock:
+        actual = _pendientes.setdefault(
+            db, {"aciertos": 0, "fallos": 0, "accesos": {}, "desde": pendiente["desde"]}
+        )
+        actual["aciertos"] += pendiente["aciertos"]
+        actual["fallos"] += pendiente["fallos"]
+        for clave, ahora in pendiente["accesos"].items():
+            actual["accesos"][clave] = max(ahora, actual["accesos"].get(clave, ahora))
+
+
+# =========================
+# CLAVE DE CACHÉ
+# =========================
+def clave_cache(imagen_bytes: bytes, tarea: str, variante: str, modelo: str, config: dict = None) -> str:
+    """
+    Calcula la clave de un resultado a partir del contenido de la imagen
+    y de todo lo que influye en la respuesta del modelo.
+
+    :param imagen_bytes: Bytes originales de la imagen subida
+    :param tarea: "ocr", "descripcion", "analisis", "social"...
+    :param variante: Prompt (o variante de prompt) enviado al modelo
+    :param modelo: Nombre del modelo de Gemini
+    :param config: Configuración de generación (temperature, max_output_tokens...)
+    :return: Hash SHA-256 en hexadecimal
+    """
+    h = hashlib.sha256()
+    h.update(hashlib.sha256(imagen_bytes).digest())
+    for parte in (tarea, variante, modelo, json.dumps(config or {}, sort_keys=True)):
+        h.update(b"\x00")
+        h.update(parte.encode("utf-8"))
+    return h.hexdigest()
+
+
+# =========================
+# LEER / GUARDAR RESULTADOS
+# =========================
+def obtener_resultado(clave: str):
+    """
+    Devuelve el resultado guardado para la clave o None si no existe
+    o ha caducado. Solo lee: el acceso se anota en memoria (ver _anotar).
+    """
+    if not CACHE_ACTIVA:
+        return None
+
+    db = CACHE_DB
+    _preparar(db)
+    with conexion(db) as conn:
+        fila = conn.execute(
+            "SELECT valor, creado FROM resultados WHERE clave = ?",
+            (clave,)
+        ).fetchone()
+
+    ahora = time.time()
+    # Las caducadas las borra _expulsar en el siguiente guardado
+    if fila and ahora - fila[1] <= CACHE_MAX_DIAS * 86400:
+        _anotar(db, "aciertos", clave, ahora)
+        return json.loads(fila[0])
+
+    _anotar(db, "fallos")
+    return None
+
+
+def guardar_resultado(clave: str, tarea: str, valor):
+    """
+    Guarda un resultado (texto o diccionario) y aplica la política de
+    expulsión por antigüedad y por tamaño total. Escribe también los
+    accesos pendientes, en la misma transacción.
+    """
+    if not CACHE_ACTIVA:
+        return
+
+    valor_json = json.dumps(valor, ensure_ascii=False)
+    ahora = time.time()
+
+    db = CACHE_DB
+    _preparar(db)
+    with transaccion(db) as conn:
+        conn.execute(
+            """
+            INSERT INTO resultados (clave, tarea, valor, tamano, creado, ultimo_acceso)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT(clave) DO UPDATE SET
+                tarea = excluded.tarea,
+                valor = excluded.valor,
+                tamano = excluded.tamano,
+                creado = excluded.creado,
+                ultimo_acceso = excluded.ultimo_acceso
+            """,
+            (clave, tarea, valor_json, len(valor_json.encode("utf-8")), ahora, ahora)
+        )
+        _volcar(conn, db)
+        _expulsar(conn, ahora)
+
+
+def _expulsar(conn, ahora: float):
+    # 1. Por antigüedad
+    cursor = conn.execute(
+        "DELETE FROM resultados WHERE creado < ?",
+        (ahora - CACHE_MAX_DIAS * 86400,)
+    )
+    expulsados = cursor.rowcount
+
+    # 2. Por tamaño (los menos usados recientemente primero). El total
+    # sale del contador, no de sumar la tabla.
+    total = conn.execute("SELECT valor FROM contadores WHERE nombre = 'bytes'").fetchone()[0]
+    limite = CACHE_MAX_MB * 1024 * 1024
+
+    if total > limite:
+        filas = conn.execute(
+            "SELECT clave, tamano FROM resultados ORDER BY ultimo_acceso ASC"
+        ).fetchall()
+        for clave, tamano in filas:
+            if total <= limite:
+                break
+            conn.execute("DELETE FROM resultados WHERE clave = ?", (clave,))
+            total -= tamano
+            expulsados += 1
+
+    if expulsados:
+        _incrementar(conn, "expulsiones", expulsados)
+
+
+# =========================
+# ESTADÍSTICAS
+# =========================
+def estadisticas_cache() -> dict:
+    """
+    Devuelve aciertos, fallos, expulsiones, tasa de aciertos y ocupación.
+    """
+    db = CACHE_DB
+    _preparar(db)
+    with transaccion(db) as conn:
+        _volcar(conn, db)
+        contadores = dict(conn.execute("SELECT nombre, valor FROM contadores").fetchall())
+        entradas = conn.execute("SELECT COUNT(*) FROM resultados").fetchone()[0]
+
+    aciertos = contadores.get("aciertos", 0)
+    fallos = contadores.get("fallos", 0)
+    total = aciertos + fallos
+
+    return {
+        "aciertos": aciertos,
+        "fallos": fallos,
+        "expulsiones": contadores.get("expulsiones", 0),
+        "tasa_aciertos": aciertos / total if total else 0.0,
+        "entradas": entradas,
+        "tamano_bytes": contadores.get("bytes", 0),
+    }
+
+
+def limpiar_cache():
+    """Elimina todos los resultados y reinicia los contadores."""
+    db = CACHE_DB
+    _preparar(db)
+    with _lock:
+        _pendientes.pop(db, None)
+    with transaccion(db) as conn:
+        # Los triggers dejan "bytes" a 0
+        conn.execute("DELETE FROM resultados")
+        conn.execute("DELETE FROM contadores WHERE nombre != 'bytes'")
@@ -0,0 +1,207 @@
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+# =========================
+# Configuración de SQLite
+# =========================
+SQLITE_TIMEOUT_SEGUNDOS = float(os.getenv("SQLITE_TIMEOUT_SEGUNDOS", "15"))
+SQLITE_CACHE_KIB = int(os.getenv("SQLITE_CACHE_KIB", "16384"))
+SQLITE_MMAP_MB = int(os.getenv("SQLITE_MMAP_MB", "128"))
+SQLITE_POOL_MAX = int(os.getenv("SQLITE_POOL_MAX", "16"))
+SQLITE_VIDA_MAXIMA_SEGUNDOS = float(os.getenv("SQLITE_VIDA_MAXIMA_SEGUNDOS", "900"))
+
+# Una espera por el bloqueo de escritura por encima de esto se cuenta aparte
+ESPERA_LARGA_MS = 100
+
+_libres = {}
+_lock = threading.Lock()
+_contadores = {
+    "conexiones_creadas": 0,
+    "conexiones_reutilizadas": 0,
+    "conexiones_cerradas": 0,
+    "conexiones_en_uso": 0,
+    "segundos_vida_cerradas": 0.0,
+    "transacciones": 0,
+    "ms_espera_escritura": 0.0,
+    "max_ms_espera_escritura": 0.0,
+    "esperas_largas": 0,
+    "bloqueos_agotados": 0,
+}
+
+
+class _Conexion:
+    __slots__ = ("conn", "creada", "usos")
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.creada = time.monotonic()
+        self.usos = 0
+
+
+def _abrir(db_name: str) -> _Conexion:
+    # check_same_thread=False: la conexión pasa de un hilo a otro a través
+    # del pool, pero nunca la usan dos a la vez
+    conn = sqlite3.connect(
+        db_name, timeout=SQLITE_TIMEOUT_SEGUNDOS, check_same_thread=False
+    )
+    # WAL: los lectores no esperan al escritor (y viceversa). Con WAL,
+    # synchronous=NORMAL sigue siendo seguro ante caídas del proceso.
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("PRAGMA synchronous = NORMAL")
+    conn.execute(f"PRAGMA cache_size = -{SQLITE_CACHE_KIB}")
+    conn.execute(f"PRAGMA mmap_size = {SQLITE_MMAP_MB * 1024 * 1024}")
+    conn.execute("PRAGMA temp_store = MEMORY")
+    return _Conexion(conn)
+
+
+def _cerrar(conexion: _Conexion):
+    try:
+        conexion.conn.close()
+    finally:
+        with _lock:
+            _contadores["conexiones_cerradas"] += 1
+            _contadores["segundos_vida_cerradas"] += time.monotonic() - conexion.creada
+
+
+def _obtener(db_name: str) -> _Conexion:
+    caducadas = []
+    conexion = None
+
+    with _lock:
+        libres = _libres.setdefault(db_name, [])
+        while libres:
+            candidata = libres.pop()
+            if time.monotonic() - candidata.creada > SQLITE_VIDA_MAXIMA_SEGUNDOS:
+                caducadas.append(candidata)
+            else:
+                conexion = candidata
+                _contadores["conexiones_reutilizadas"] += 1
+                break
+        _contadores["conexiones_en_uso"] += 1
+
+    for caducada in caducadas:
+        _cerrar(caducada)
+
+    if conexion is None:
+        try:
+            conexion = _abrir(db_name)
+        except BaseException:
+            with _lock:
+                _contadores["conexiones_en_uso"] -= 1
+            raise
+        with _lock:
+            _contadores["conexiones_creadas"] += 1
+
+    conexion.usos += 1
+    return conexion
+
+
+def _devolver(db_name: str, conexion: _Conexion):
+    with _lock:
+        _contadores["conexiones_en_uso"] -= 1
+
+    # Lo que no se confirmó se descarta, igual que al cerrar la conexión
+    try:
+        if conexion.conn.in_transaction:
+            conexion.conn.rollback()
+    except sqlite3.Error:
+        _cerrar(conexion)
+        return
+
+    with _lock:
+        libres = _libres.setdefault(db_name, [])
+        if len(libres) < SQLITE_POOL_MAX:
+            libres.append(conexion)
+            return
+
+    _cerrar(conexion)
+
+
+# =========================
+# USAR UNA CONEXIÓN
+# =========================
+@contextmanager
+def conexion(db_name: str):
+    """
+    Presta una conexión del pool de esa base de datos y la devuelve al
+    salir. Las conexiones se abren una vez (WAL, synchronous=NORMAL, caché
+    y mmap) y se reutilizan entre peticiones y sesiones de Streamlit.
+
+    No se debe cerrar la conexión: al devolverla se deshace cualquier
+    transacción sin confirmar.
+    """
+    prestada = _obtener(db_name)
+    try:
+        yield prestada.conn
+    finally:
+        _devolver(db_name, prestada)
+
+
+@contextmanager
+def transaccion(db_name: str):
+    """
+    Conexión con el bloqueo de escritura ya tomado (BEGIN IMMEDIATE).
+    Confirma al salir o deshace si hay una excepción. Mide cuánto se ha
+    esperado por el bloqueo.
+    """
+    with conexion(db_name) as conn:
+        inicio = time.perf_counter()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+        except sqlite3.OperationalError:
+            with _lock:
+                _contadores["bloqueos_agotados"] += 1
+            raise
+        _registrar_espera((time.perf_counter() - inicio) * 1000)
+
+        try:
+            yield conn
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+
+
+def _registrar_espera(ms: float):
+    with _lock:
+        _contadores["transacciones"] += 1
+        _contadores["ms_espera_escritura"] += ms
+        _contadores["max_ms_espera_escritura"] = max(_contadores["max_ms_espera_escritura"], ms)
+        if ms >= ESPERA_LARGA_MS:
+            _contadores["esperas_largas"] += 1
+
+
+# =========================
+# ESTADÍSTICAS Y CIERRE
+# =========================
+def estadisticas_conexiones_db() -> dict:
+    """
+    Contadores del pool: conexiones creadas, reutilizadas, cerradas y en
+    uso, vida media de las cerradas y esperas por el bloqueo de escritura.
+    """
+    with _lock:
+        datos = dict(_contadores)
+        datos["conexiones_libres"] = sum(len(libres) for libres in _libres.values())
+
+    datos["vida_media_segundos"] = (
+        datos["segundos_vida_cerradas"] / datos["conexiones_cerradas"]
+        if datos["conexiones_cerradas"] else 0.0
+    )
+    datos["ms_espera_media"] = (
+        datos["ms_espera_escritura"] / datos["transacciones"]
+        if datos["transacciones"] else 0.0
+    )
+    return datos
+
+
+def cerrar_conexiones():
+    """Cierra las conexiones libres del pool (útil en tests o al apagar)."""
+    with _lock:
+        pendientes = [c for libres in _libres.values() for c in libres]
+        _libres.clear()
+
+    for pendiente in pendientes:
+        _cerrar(pendiente)
@@ -0,0 +1,23 @@
+"""
+Usuario de la petición en curso, compartido por el planificador (reparto
+justo de la cola) y el registro de eventos. Módulo aparte y sin
+dependencias para que importarlo no cargue el SDK de Gemini.
+"""
+import contextvars
+from contextlib import contextmanager
+
+usuario_actual = contextvars.ContextVar("usuario_actual", default=None)
+
+
+def establecer_usuario(usuario_id):
+    """Asocia las peticiones siguientes de este hilo/contexto al usuario."""
+    usuario_actual.set(usuario_id)
+
+
+@contextmanager
+def como_usuario(usuario_id):
+    token = usuario_actual.set(usuario_id)
+    try:
+        yield
+    finally:
+        usuario_actual.reset(token)
@@ -0,0 +1,141 @@
+"""
+Registro de traducciones: un evento compacto por traducción (usuario,
+idioma destino, longitud del original, latencia y si salió entera de la
+memoria de traducción) y un resumen por usuario e idioma mantenido por
+trigger, que es lo que leen las estadísticas del perfil.
+"""
+import sqlite3
+import time
+
+from utils.conexion_db import conexion, transaccion
+from utils.contexto_usuario import usuario_actual
+
+DB_NAME = "users.db"
+
+
+# =========================
+# ESQUEMA
+# =========================
+def crear_eventos_traduccion(conn):
+    """Crea la tabla de eventos, su resumen y el trigger (migración 9)."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS eventos_traduccion (
+            id INTEGER PRIMARY KEY,
+            usuario_id INTEGER,
+            idioma TEXT NOT NULL,
+            caracteres INTEGER NOT NULL,
+            milisegundos INTEGER NOT NULL,
+            desde_memoria INTEGER NOT NULL DEFAULT 0,
+            fecha_epoch REAL NOT NULL
+        )
+    """)
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_eventos_traduccion_usuario_fecha
+        ON eventos_traduccion (usuario_id, fecha_epoch)
+    """)
+
+    # usuario_id 0: traducciones hechas sin usuario asociado (scripts, tests)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS uso_idiomas (
+            usuario_id INTEGER NOT NULL,
+            idioma TEXT NOT NULL,
+            traducciones INTEGER NOT NULL DEFAULT 0,
+            caracteres INTEGER NOT NULL DEFAULT 0,
+            milisegundos INTEGER NOT NULL DEFAULT 0,
+            max_milisegundos INTEGER NOT NULL DEFAULT 0,
+            desde_memoria INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (usuario_id, idioma)
+        ) WITHOUT ROWID
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_eventos_traduccion_insertar
+        AFTER INSERT ON eventos_traduccion
+        BEGIN
+            INSERT INTO uso_idiomas
+                (usuario_id, idioma, traducciones, caracteres, milisegundos, max_milisegundos, desde_memoria)
+            VALUES
+                (COALESCE(NEW.usuario_id, 0), NEW.idioma, 1, NEW.caracteres,
+                 NEW.milisegundos, NEW.milisegundos, NEW.desde_memoria)
+            ON CONFLICT(usuario_id, idioma) DO UPDATE SET
+                traducciones = traducciones + 1,
+                caracteres = caracteres + excluded.caracteres,
+                milisegundos = milisegundos + excluded.milisegundos,
+                max_milisegundos = MAX(max_milisegundos, excluded.max_milisegundos),
+                desde_memoria = desde_memoria + excluded.desde_memoria;
+        END
+    """)
+
+
+# =========================
+# REGISTRAR
+# =========================
+def registrar_traduccion(codigos_idioma, caracteres: int, segundos: float, desde_memoria: bool = False):
+    """
+    Registra una traducción (o una por idioma si se traduce a varios a la
+    vez) para el usuario del contexto actual (contexto_usuario.usuario_actual).
+
+    Un INSERT por idioma en una sola transacción; el resumen lo actualiza
+    el trigger. Un fallo al registrar no hace fallar la traducción.
+
+    :param codigos_idioma: Código del idioma destino o lista de códigos
+    :param caracteres: Longitud del texto original
+    :param segundos: Latencia de la traducción completa
+    :param desde_memoria: True si no ha hecho falta llamar al modelo
+    """
+    if isinstance(codigos_idioma, str):
+        codigos_idioma = [codigos_idioma]
+
+    usuario_id = usuario_actual.get()
+    ahora = time.time()
+    try:
+        with transaccion(DB_NAME) as conn:
+            conn.executemany(
+                """
+                INSERT INTO eventos_traduccion
+                    (usuario_id, idioma, caracteres, milisegundos, desde_memoria, fecha_epoch)
+                VALUES (?, ?, ?, ?, ?, ?)
+                """,
+                [
+                    (usuario_id, codigo, caracteres, round(segundos * 1000), int(desde_memoria), ahora)
+                    for codigo in codigos_idioma
+                ]
+            )
+    except sqlite3.Error:
+        pass
+
+
+# =========================
+# CONSULTAR
+# =========================
+def idiomas_usuario(usuario_id: int) -> list:
+    """
+    Uso de cada idioma destino por el usuario, de más a menos usado.
+    Lee solo el resumen (una fila por idioma), nunca los eventos.
+
+    :return: dicts {"codigo", "traducciones", "caracteres",
+             "latencia_media_ms", "latencia_max_ms", "tasa_memoria"}
+    """
+    with conexion(DB_NAME) as conn:
+        filas = conn.execute(
+            """
+            SELECT idioma, traducciones, caracteres, milisegundos, max_milisegundos, desde_memoria
+            FROM uso_idiomas
+            WHERE usuario_id = ?
+            """,
+            (usuario_id,)
+        ).fetchall()
+
+    return sorted(
+        (
+            {
+                "codigo": codigo,
+                "traducciones": traducciones,
+                "caracteres": caracteres,
+                "latencia_media_ms": milisegundos / traducciones,
+                "latencia_max_ms": max_milisegundos,
+                "tasa_memoria": desde_memoria / traducciones,
+            }
+            for codigo, traducciones, caracteres, milisegundos, max_milisegundos, desde_memoria in filas
+        ),
+        key=lambda d: (-d["traducciones"], d["codigo"])
+    )
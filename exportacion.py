@@ -0,0 +1,247 @@
+"""
+Exportación de los datos de un usuario por streaming: NDJSON (un objeto
+JSON por línea) o un ZIP con ese NDJSON y las imágenes originales.
+
+Las filas se leen del cursor de una en una y cada blob se copia al ZIP
+por trozos, así que la memoria no crece con el tamaño de la galería y el
+primer trozo sale en cuanto se lee el perfil.
+"""
+import io
+import json
+import zipfile
+from datetime import datetime
+
+from utils.blob_store import ruta_blob
+from utils.conexion_db import conexion
+
+DB_NAME = "users.db"
+
+# Trozo de lectura de cada blob al copiarlo al ZIP
+TAMANO_TROZO = 64 * 1024
+
+# Extensión de la imagen a partir de sus primeros bytes
+_FIRMAS = (
+    (b"\x89PNG", "png"),
+    (b"\xff\xd8", "jpg"),
+    (b"GIF8", "gif"),
+    (b"RIFF", "webp"),
+    (b"BM", "bmp"),
+)
+
+FORMATOS_EXPORTACION = ("ndjson", "zip")
+
+
+# =========================
+# REGISTROS
+# =========================
+def _archivo_imagen(imagen_id: int, imagen_hash: str):
+    """Nombre de la imagen dentro del ZIP, o None si el blob no existe."""
+    try:
+        with open(ruta_blob(imagen_hash), "rb") as archivo:
+            cabecera = archivo.read(4)
+    except (FileNotFoundError, TypeError):
+        return None
+
+    extension = next((ext for firma, ext in _FIRMAS if cabecera.startswith(firma)), "bin")
+    return f"imagenes/{imagen_id}.{extension}"
+
+
+def _registros(conn, usuario_id: int, con_archivos: bool = False):
+    # Generador de dicts: perfil, estadísticas, una línea por imagen y una
+    # por traducción guardada. Iterar el cursor no carga todas las filas.
+    perfil = conn.execute(
+        "SELECT id, email, fecha_registro FROM usuarios WHERE id = ?",
+        (usuario_id,)
+    ).fetchone()
+    if not perfil:
+        raise ValueError(f"❌ El usuario {usuario_id} no existe")
+
+    yield {
+        "registro": "perfil",
+        "id": perfil[0],
+        "email": perfil[1],
+        "fecha_registro": perfil[2],
+        "fecha_exportacion": datetime.now().isoformat(),
+    }
+
+    resumen = conn.execute(
+        """
+        SELECT total_imagenes, primera_actividad, ultima_actividad, caracteres_texto
+        FROM uso_usuario
+        WHERE usuario_id = ?
+        """,
+        (usuario_id,)
+    ).fetchone() or (0, None, None, 0)
+    yield {
+        "registro": "estadisticas",
+        "total_imagenes": resumen[0],
+        "primera_imagen": resumen[1],
+        "ultima_imagen": resumen[2],
+        "total_texto_procesado": resumen[3],
+    }
+
+    for img_id, imagen_hash, tipo, texto, fecha in conn.execute(
+        """
+        SELECT id, imagen_hash, tipo, texto_original, fecha_subida
+        FROM imagenes
+        WHERE usuario_id = ?
+        ORDER BY fecha_subida DESC, id DESC
+        """,
+        (usuario_id,)
+    ):
+        registro = {
+            "registro": "imagen",
+            "id": img_id,
+            "tipo": tipo,
+            "texto_extraido": texto,
+            "fecha_procesamiento": fecha,
+            "longitud_texto": len(texto) if texto else 0,
+            "imagen_hash": imagen_hash,
+        }
+        if con_archivos:
+            registro["archivo"] = _archivo_imagen(img_id, imagen_hash)
+        yield registro
+
+    for imagen_id, idioma, texto, fecha in conn.execute(
+        """
+        SELECT t.imagen_id, t.idioma, t.texto, t.fecha
+        FROM traducciones t
+        JOIN imagenes i ON i.id = t.imagen_id
+        WHERE i.usuario_id = ?
+        ORDER BY t.imagen_id, t.idioma
+        """,
+        (usuario_id,)
+    ):
+        yield {
+            "registro": "traduccion",
+            "imagen_id": imagen_id,
+            "idioma": idioma,
+            "texto": texto,
+            "fecha": fecha,
+        }
+
+
+def _linea(registro: dict) -> bytes:
+    return (json.dumps(registro, ensure_ascii=False) + "\n").encode("utf-8")
+
+
+# =========================
+# NDJSON
+# =========================
+def exportar_ndjson(usuario_id: int):
+    """
+    Generador con la exportación en NDJSON (bytes UTF-8, una línea por
+    registro). Cada línea lleva "registro": perfil, estadisticas, imagen
+    o traduccion.
+
+    Todo se lee en una misma transacción de lectura: la exportación es
+    coherente aunque el usuario siga subiendo o borrando imágenes.
+    """
+    with conexion(DB_NAME) as conn:
+        conn.execute("BEGIN")
+        try:
+            for registro in _registros(conn, usuario_id):
+                yield _linea(registro)
+        finally:
+            conn.rollback()
+
+
+# =========================
+# ZIP CON IMÁGENES
+# =========================
+class _Salida(io.RawIOBase):
+    """
+    Archivo de solo escritura y sin seek: zipfile escribe en él y el
+    generador recoge lo escrito después de cada paso.
+    """
+
+    def __init__(self):
+        self._trozos = []
+        self._posicion = 0
+
+    def writable(self):
+        return True
+
+    def write(self, datos):
+        self._trozos.append(bytes(datos))
+        self._posicion += len(datos)
+        return len(datos)
+
+    def tell(self):
+        return self._posicion
+
+    def recoger(self) -> bytes:
+        datos = b"".join(self._trozos)
+        self._trozos.clear()
+        return datos
+
+
+def _entrada(nombre: str, compresion: int) -> zipfile.ZipInfo:
+    entrada = zipfile.ZipInfo(nombre, datetime.now().timetuple()[:6])
+    entrada.compress_type = compresion
+    entrada.external_attr = 0o644 << 16
+    return entrada
+
+
+def exportar_zip(usuario_id: int):
+    """
+    Generador con un ZIP (bytes) que contiene datos.ndjson (los mismos
+    registros que exportar_ndjson, con la ruta de cada imagen en
+    "archivo") y la carpeta imagenes/ con los originales.
+
+    El ZIP se escribe en streaming (descriptores de datos tras cada
+    entrada); las imágenes van sin recomprimir y el NDJSON comprimido.
+    """
+    salida = _Salida()
+
+    with conexion(DB_NAME) as conn:
+        conn.execute("BEGIN")
+        try:
+            with zipfile.ZipFile(salida, "w") as archivo_zip:
+                with archivo_zip.open(_entrada("datos.ndjson", zipfile.ZIP_DEFLATED), "w", force_zip64=True) as destino:
+                    for registro in _registros(conn, usuario_id, con_archivos=True):
+                        destino.write(_linea(registro))
+                        yield salida.recoger()
+
+                for img_id, imagen_hash in conn.execute(
+                    """
+                    SELECT id, imagen_hash FROM imagenes
+                    WHERE usuario_id = ?
+                    ORDER BY fecha_subida DESC, id DESC
+                    """,
+                    (usuario_id,)
+                ):
+                    nombre = _archivo_imagen(img_id, imagen_hash)
+                    if not nombre:
+                        continue
+                    with open(ruta_blob(imagen_hash), "rb") as origen, \
+                            archivo_zip.open(_entrada(nombre, zipfile.ZIP_STORED), "w") as destino:
+                        while trozo := origen.read(TAMANO_TROZO):
+                            destino.write(trozo)
+                            yield salida.recoger()
+                    yield salida.recoger()
+
+            # Directorio central
+            yield salida.recoger()
+        finally:
+            conn.rollback()
+
+
+def escribir_exportacion(usuario_id: int, destino, formato: str = "ndjson") -> int:
+    """
+    Escribe la exportación en un archivo binario abierto (por ejemplo un
+    archivo temporal) sin tenerla entera en memoria.
+
+    :param formato: 'ndjson' o 'zip'
+    :return: Bytes escritos
+    """
+    if formato not in FORMATOS_EXPORTACION:
+        raise ValueError(f"❌ Formato de exportación no válido: {formato}")
+
+    generador = exportar_zip if formato == "zip" else exportar_ndjson
+    escritos = 0
+    for trozo in generador(usuario_id):
+        if trozo:
+            destino.write(trozo)
+            escritos += len(trozo)
+    return escritos
@@ -0,0 +1,200 @@
+"""
+Instantánea analítica en Parquet: metadatos de `imagenes` (sin blobs),
+eventos de traducción y tablas de resumen, de un usuario o de toda la
+instancia. Un archivo .parquet por tabla, escrito por lotes de Arrow
+leídos directamente del cursor de SQLite.
+
+    python -m utils.exportacion_columnar instantanea/ [--usuario 3] [--db users.db]
+"""
+import argparse
+import os
+import time
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from utils.conexion_db import conexion
+from utils.resumenes_uso import TIPOS_RESUMEN
+
+DB_NAME = "users.db"
+
+# Filas por lote de Arrow (y por grupo de filas del Parquet)
+FILAS_POR_LOTE = int(os.getenv("PARQUET_FILAS_POR_LOTE", "65536"))
+COMPRESION_PARQUET = os.getenv("PARQUET_COMPRESION", "zstd")
+
+# Parquet no tiene marcas de tiempo en segundos: todas en milisegundos
+_FECHA_UTC = pa.timestamp("ms", tz="UTC")
+
+# Tabla -> (SELECT sin WHERE, esquema de Arrow). Los tipos se fijan aquí:
+# SQLite no los garantiza y un lote con todo NULL no debe cambiar el
+# esquema del archivo.
+TABLAS = {
+    "imagenes": (
+        """
+        SELECT id, usuario_id, tipo, fecha_subida, fecha_epoch * 1000, dia,
+               imagen_hash, miniatura_hash, length(texto_original), texto_original
+        FROM imagenes
+        """,
+        pa.schema([
+            ("id", pa.int64()),
+            ("usuario_id", pa.int64()),
+            ("tipo", pa.string()),
+            ("fecha_subida", pa.string()),
+            ("fecha_utc", _FECHA_UTC),
+            ("dia", pa.string()),
+            ("imagen_hash", pa.string()),
+            ("miniatura_hash", pa.string()),
+            ("longitud_texto", pa.int64()),
+            ("texto_original", pa.string()),
+        ]),
+    ),
+    "eventos_traduccion": (
+        """
+        SELECT id, usuario_id, idioma, caracteres, milisegundos, desde_memoria,
+               CAST(fecha_epoch * 1000 AS INTEGER)
+        FROM eventos_traduccion
+        """,
+        pa.schema([
+            ("id", pa.int64()),
+            ("usuario_id", pa.int64()),
+            ("idioma", pa.string()),
+            ("caracteres", pa.int64()),
+            ("milisegundos", pa.int64()),
+            ("desde_memoria", pa.bool_()),
+            ("fecha_utc", _FECHA_UTC),
+        ]),
+    ),
+    "uso_usuario": (
+        f"""
+        SELECT usuario_id, total_imagenes, caracteres_texto,
+               {", ".join(f"n_{tipo}" for tipo in TIPOS_RESUMEN)},
+               primera_actividad, ultima_actividad
+        FROM uso_usuario
+        """,
+        pa.schema(
+            [("usuario_id", pa.int64()), ("total_imagenes", pa.int64()), ("caracteres_texto", pa.int64())]
+            + [(f"n_{tipo}", pa.int64()) for tipo in TIPOS_RESUMEN]
+            + [("primera_actividad", pa.string()), ("ultima_actividad", pa.string())]
+        ),
+    ),
+    "uso_usuario_dia": (
+        f"""
+        SELECT usuario_id, dia, total_imagenes, caracteres_texto,
+               {", ".join(f"n_{tipo}" for tipo in TIPOS_RESUMEN)}
+        FROM uso_usuario_dia
+        """,
+        pa.schema(
+            [("usuario_id", pa.int64()), ("dia", pa.string()),
+             ("total_imagenes", pa.int64()), ("caracteres_texto", pa.int64())]
+            + [(f"n_{tipo}", pa.int64()) for tipo in TIPOS_RESUMEN]
+        ),
+    ),
+    "uso_idiomas": (
+        """
+        SELECT usuario_id, idioma, traducciones, caracteres, milisegundos,
+               max_milisegundos, desde_memoria
+        FROM uso_idiomas
+        """,
+        pa.schema([
+            ("usuario_id", pa.int64()),
+            ("idioma", pa.string()),
+            ("traducciones", pa.int64()),
+            ("caracteres", pa.int64()),
+            ("milisegundos", pa.int64()),
+            ("max_milisegundos", pa.int64()),
+            ("desde_memoria", pa.int64()),
+        ]),
+    ),
+}
+
+
+# =========================
+# LOTES DE ARROW
+# =========================
+def lotes_arrow(conn, tabla: str, usuario_id: int = None, filas_por_lote: int = FILAS_POR_LOTE):
+    """
+    Generador de pa.RecordBatch con las filas de la tabla (todas o solo
+    las del usuario). Nunca hay más de un lote en memoria.
+    """
+    consulta, esquema = TABLAS[tabla]
+    parametros = ()
+    if usuario_id is not None:
+        consulta += " WHERE usuario_id = ?"
+        parametros = (usuario_id,)
+
+    cursor = conn.execute(consulta, parametros)
+    while filas := cursor.fetchmany(filas_por_lote):
+        columnas = zip(*filas)
+        yield pa.RecordBatch.from_arrays(
+            [_columna(valores, campo.type) for valores, campo in zip(columnas, esquema)],
+            schema=esquema,
+        )
+
+
+def _columna(valores, tipo) -> pa.Array:
+    # SQLite guarda los booleanos como 0/1
+    if pa.types.is_boolean(tipo):
+        return pa.array(valores, type=pa.int8()).cast(tipo)
+    return pa.array(valores, type=tipo)
+
+
+# =========================
+# INSTANTÁNEA
+# =========================
+def exportar_parquet(carpeta: str, usuario_id: int = None, tablas: list = None) -> dict:
+    """
+    Escribe un archivo <tabla>.parquet por tabla en la carpeta. Todas se
+    leen en la misma transacción de lectura: la instantánea es coherente
+    aunque la aplicación siga escribiendo.
+
+    :param usuario_id: Solo las filas de ese usuario (None = toda la instancia)
+    :param tablas: Subconjunto de TABLAS (None = todas)
+    :return: {tabla: {"filas", "bytes", "ruta"}} y "segundos" con el total
+    """
+    tablas = tablas or list(TABLAS)
+    desconocidas = set(tablas) - set(TABLAS)
+    if desconocidas:
+        raise ValueError(f"❌ Tablas no exportables: {', '.join(sorted(desconocidas))}")
+
+    os.makedirs(carpeta, exist_ok=True)
+    inicio = time.perf_counter()
+    resultado = {}
+
+    with conexion(DB_NAME) as conn:
+        conn.execute("BEGIN")
+        try:
+            for tabla in tablas:
+                ruta = os.path.join(carpeta, f"{tabla}.parquet")
+                filas = 0
+                with pq.ParquetWriter(ruta, TABLAS[tabla][1], compression=COMPRESION_PARQUET) as escritor:
+                    for lote in lotes_arrow(conn, tabla, usuario_id):
+                        escritor.write_batch(lote)
+                        filas += lote.num_rows
+                resultado[tabla] = {"filas": filas, "bytes": os.path.getsize(ruta), "ruta": ruta}
+        finally:
+            conn.rollback()
+
+    resultado["segundos"] = time.perf_counter() - inicio
+    return resultado
+
+
+def main():
+    global DB_NAME
+
+    parser = argparse.ArgumentParser(description="Instantánea en Parquet de AI Content Studio")
+    parser.add_argument("carpeta", help="Carpeta de destino de los .parquet")
+    parser.add_argument("--usuario", type=int, default=None, help="Solo los datos de este usuario")
+    parser.add_argument("--db", default=DB_NAME, help="Ruta de la base de datos")
+    args = parser.parse_args()
+
+    DB_NAME = args.db
+    resultado = exportar_parquet(args.carpeta, args.usuario)
+
+    segundos = resultado.pop("segundos")
+    for tabla, datos in resultado.items():
+        print(f"{tabla:<20} {datos['filas']:>10} filas {datos['bytes'] / 1024:>10.1f} KiB")
+    print(f"✅ Instantánea escrita en {args.carpeta} en {segundos:.2f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+import json
+
+from utils.gemini_client import generar_contenido
+from utils.cache_resultados import clave_cache, obtener_resultado, guardar_resultado
+from utils.procesado_imagen import leer_imagen, preparar_imagen, parte_imagen
+from utils.gemini_vision import PROMPT_OCR
+from utils.assistant import MODELO_ASISTENTE, PROMPTS_DESCRIPCION
+from utils.social_content import ESTILOS_SOCIAL, PLATAFORMAS_SOCIAL
+
+MODELO_COMBINADO = MODELO_ASISTENTE
+
+# =========================
+# Esquema de respuesta
+# =========================
+ESQUEMA_SOCIAL = {
+    "type": "OBJECT",
+    "properties": {
+        "titulo": {"type": "STRING"},
+        "descripcion_corta": {"type": "STRING"},
+        "contenido_post": {"type": "STRING"},
+        "hashtags": {"type": "ARRAY", "items": {"type": "STRING"}},
+        "emoji_recomendados": {"type": "ARRAY", "items": {"type": "STRING"}},
+        "consejos_publicacion": {"type": "STRING"},
+        "hora_optima": {"type": "STRING"},
+        "palabras_clave": {"type": "ARRAY", "items": {"type": "STRING"}},
+    },
+    "required": ["titulo", "contenido_post", "hashtags"],
+}
+
+ESQUEMA_COMBINADO = {
+    "type": "OBJECT",
+    "properties": {
+        "texto": {"type": "STRING"},
+        "descripcion": {"type": "STRING"},
+        "social": ESQUEMA_SOCIAL,
+    },
+    "required": ["texto", "descripcion", "social"],
+    "property_ordering": ["texto", "descripcion", "social"],
+}
+
+CONFIG_COMBINADO = {
+    "response_mime_type": "application/json",
+    "response_schema": ESQUEMA_COMBINADO,
+}
+
+
+def prompt_combinado(nivel_detalle: str, estilo: str, plataforma: str) -> str:
+    """Prompt con las tres tareas, reutilizando las instrucciones de cada una."""
+    descripcion = PROMPTS_DESCRIPCION.get(nivel_detalle, PROMPTS_DESCRIPCION["normal"])
+    config = PLATAFORMAS_SOCIAL.get(plataforma, PLATAFORMAS_SOCIAL["instagram"])
+
+    return f"""
+    Analiza esta imagen y rellena los tres campos de la respuesta.
+
+    "texto": {PROMPT_OCR} Si no hay texto, devuelve una cadena vacía.
+
+    "descripcion": {descripcion}
+
+    "social": contenido para redes sociales sobre la imagen.
+    1. Estilo: {ESTILOS_SOCIAL.get(estilo, "profesional")}
+    2. Plataforma: {plataforma.upper()}
+    3. Límite caracteres: {config['max_caracteres']}
+    4. {config['hashtags_recomendados']} hashtags relevantes
+    5. {'Incluye emojis apropiados' if config['emoji_frecuentes'] else 'No uses emojis'}
+    """
+
+
+# =========================
+# EXTRACCIÓN COMBINADA
+# =========================
+def extraer_todo(
+    imagen_subida,
+    api_key: str,
+    nivel_detalle: str = "normal",
+    estilo: str = "profesional",
+    plataforma: str = "instagram",
+) -> dict:
+    """
+    Texto, descripción y contenido para redes en una sola llamada: la
+    imagen se sube una vez y la respuesta sigue ESQUEMA_COMBINADO.
+
+    La imagen se prepara con el perfil de OCR (el más exigente de los
+    tres), para que el texto pequeño siga siendo legible.
+
+    :return: {"texto": str, "descripcion": str, "social": dict}
+    """
+    original_bytes = leer_imagen(imagen_subida)
+    prompt = prompt_combinado(nivel_detalle, estilo, plataforma)
+
+    # =========================
+    # Consultar caché
+    # =========================
+    clave = clave_cache(original_bytes, "combinado", prompt, MODELO_COMBINADO, CONFIG_COMBINADO)
+    resultado_cacheado = obtener_resultado(clave)
+    if resultado_cacheado is not None:
+        return resultado_cacheado
+
+    preparada = preparar_imagen(original_bytes, "ocr")
+    imagen_parte = parte_imagen(preparada)
+
+    response = generar_contenido(
+        api_key,
+        MODELO_COMBINADO,
+        [
+            imagen_parte,
+            prompt,
+        ],
+        config=CONFIG_COMBINADO,
+    )
+
+    # Un JSON cortado o mal formado se rechaza antes de llegar a la caché
+    if respuesta_truncada(response):
+        raise RuntimeError("❌ La respuesta del modelo se cortó por el límite de tokens")
+
+    resultado = separar_respuesta(response.text)
+    guardar_resultado(clave, "combinado", resultado)
+    return resultado
+
+
+def respuesta_truncada(response) -> bool:
+    """True si el modelo dejó de generar por el límite de tokens."""
+    candidatos = getattr(response, "candidates", None) or []
+    return any(
+        getattr(candidato, "finish_reason", None) == "MAX_TOKENS"
+        for candidato in candidatos
+    )
+
+
+def separar_respuesta(texto_respuesta: str) -> dict:
+    """
+    Convierte la respuesta JSON en los tres resultados, con los mismos
+    campos mínimos que generar_contenido_redes() garantiza en "social".
+
+    :raises ValueError: Si la respuesta no es un objeto JSON
+    """
+    try:
+        datos = json.loads(texto_respuesta or "")
+    except json.JSONDecodeError as e:
+        raise ValueError("❌ La respuesta del modelo no es JSON válido") from e
+    if not isinstance(datos, dict):
+        raise ValueError("❌ La respuesta del modelo no es un objeto JSON")
+
+    social = datos.get("social") or {}
+    for campo in ["titulo", "contenido_post", "hashtags"]:
+        if campo not in social:
+            social[campo] = ""
+
+    return {
+        "texto": datos.get("texto") or "",
+        "descripcion": datos.get("descripcion") or "",
+        "social": social,
+    }
@@ -1,98 +1,278 @@
-import sqlite3
-from datetime import datetime
+from datetime import date, datetime, timedelta
+
+from utils.blob_store import (
+    escribir_blob,
+    guardar_blob,
+    leer_blob,
+    liberar_blobs,
+    recolectar_basura,
+)
+from utils.conexion_db import conexion, transaccion
+from utils.migraciones import aplicar_migraciones
+from utils.procesado_imagen import crear_miniatura
 
 DB_NAME = "users.db"
 
+# Tipo de resultado guardado con cada imagen
+TIPOS_RESULTADO = {
+    "ocr": "📄 OCR",
+    "descripcion": "📝 Descripción",
+    "analisis": "🔬 Análisis",
+    "social": "📱 Redes sociales",
+}
+
+LONGITUD_VISTA_PREVIA = 200
+
 
 # =========================
 # CREAR TABLA IMÁGENES
 # =========================
 def init_gallery_db():
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
-
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS imagenes (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            usuario_id INTEGER NOT NULL,
-            imagen_blob BLOB NOT NULL,
-            texto_original TEXT,
-            fecha_subida TEXT NOT NULL,
-            FOREIGN KEY (usuario_id) REFERENCES usuarios(id)
-        )
-    """)
-
-    conn.commit()
-    conn.close()
+    """Crea o actualiza el esquema (ver utils.migraciones)."""
+    aplicar_migraciones(DB_NAME)
 
 
 # =========================
 # GUARDAR IMAGEN
 # =========================
-def guardar_imagen(usuario_id: int, imagen_bytes: bytes, texto_original: str):
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
-
-    cursor.execute(
-        """
-        INSERT INTO imagenes (usuario_id, imagen_blob, texto_original, fecha_subida)
-        VALUES (?, ?, ?, ?)
-        """,
-        (
-            usuario_id,
-            imagen_bytes,
-            texto_original,
-            datetime.now().isoformat()
+def guardar_imagen(usuario_id: int, imagen_bytes: bytes, texto_original: str, tipo: str = "ocr"):
+    guardar_imagenes(usuario_id, [
+        {"imagen_bytes": imagen_bytes, "texto_original": texto_original, "tipo": tipo}
+    ])
+
+
+# =========================
+# GUARDAR VARIAS IMÁGENES
+# =========================
+def guardar_imagenes(usuario_id: int, elementos: list) -> int:
+    """
+    Guarda varias imágenes con un único bloqueo de escritura y un único
+    commit (p. ej. el resultado de un lote de OCR).
+
+    :param elementos: dicts con "imagen_bytes", "texto_original", "tipo"
+                      (por defecto "ocr") y, opcionalmente, "miniatura" ya
+                      calculada (None = sin miniatura)
+    :return: Número de imágenes guardadas
+    """
+    for elemento in elementos:
+        tipo = elemento.get("tipo", "ocr")
+        if tipo not in TIPOS_RESULTADO:
+            raise ValueError(f"❌ Tipo de resultado no válido: {tipo}")
+
+    # Las miniaturas se calculan antes de tomar el bloqueo de escritura
+    miniaturas = [
+        elemento["miniatura"] if "miniatura" in elemento
+        else crear_miniatura(elemento["imagen_bytes"])
+        for elemento in elementos
+    ]
+    ahora = datetime.now()
+
+    # Los archivos se escriben fuera de la transacción; si se deshace, la
+    # recolección de basura barre los que se queden sin fila
+    for elemento, miniatura in zip(elementos, miniaturas):
+        escribir_blob(elemento["imagen_bytes"])
+        if miniatura:
+            escribir_blob(miniatura)
+
+    with transaccion(DB_NAME) as conn:
+        cursor = conn.cursor()
+
+        filas = []
+        for elemento, miniatura in zip(elementos, miniaturas):
+            imagen_hash = guardar_blob(cursor, elemento["imagen_bytes"])
+            miniatura_hash = guardar_blob(cursor, miniatura) if miniatura else None
+            filas.append((
+                usuario_id,
+                imagen_hash,
+                miniatura_hash,
+                elemento.get("tipo", "ocr"),
+                elemento["texto_original"],
+                ahora.isoformat(),
+                int(ahora.timestamp()),
+                ahora.date().isoformat()
+            ))
+
+        cursor.executemany(
+            """
+            INSERT INTO imagenes
+                (usuario_id, imagen_hash, miniatura_hash, tipo, texto_original,
+                 fecha_subida, fecha_epoch, dia)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            filas
         )
-    )
 
-    conn.commit()
-    conn.close()
+    return len(filas)
 
 
 # =========================
-# OBTENER IMÁGENES DE USUARIO
+# LISTADO PAGINADO (SOLO METADATOS)
 # =========================
-def obtener_imagenes_usuario(usuario_id: int):
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
+def listar_imagenes_usuario(
+    usuario_id: int,
+    limite: int = 12,
+    cursor_pagina: tuple = None,
+    desde: date = None,
+    hasta: date = None,
+    tipo: str = None,
+) -> dict:
+    """
+    Lista una página de imágenes del usuario sin cargar blobs ni textos
+    completos. La paginación es por clave (fecha_subida, id): el coste de
+    cada página no depende de cuántas imágenes haya antes.
 
-    cursor.execute(
-        """
-        SELECT id, imagen_blob, texto_original, fecha_subida
-        FROM imagenes
-        WHERE usuario_id = ?
-        ORDER BY fecha_subida DESC
-        """,
-        (usuario_id,)
-    )
+    :param limite: Imágenes por página
+    :param cursor_pagina: "siguiente_cursor" de la página anterior (None = primera)
+    :param desde: Fecha mínima (incluida)
+    :param hasta: Fecha máxima (incluida)
+    :param tipo: Filtrar por tipo de resultado ("ocr", "descripcion"...)
+    :return: {"imagenes": [dict, ...], "siguiente_cursor": tupla o None}
+    """
+    condiciones = ["i.usuario_id = ?"]
+    parametros = [usuario_id]
 
-    filas = cursor.fetchall()
-    conn.close()
+    if desde:
+        condiciones.append("i.fecha_subida >= ?")
+        parametros.append(desde.isoformat())
 
-    return filas
+    if hasta:
+        condiciones.append("i.fecha_subida < ?")
+        parametros.append((hasta + timedelta(days=1)).isoformat())
+
+    if tipo:
+        condiciones.append("i.tipo = ?")
+        parametros.append(tipo)
+
+    if cursor_pagina:
+        fecha_cursor, id_cursor = cursor_pagina
+        # Comparación de filas: el índice (usuario_id, fecha_subida) salta
+        # directamente al punto de corte
+        condiciones.append("(i.fecha_subida, i.id) < (?, ?)")
+        parametros.extend([fecha_cursor, id_cursor])
+
+    # Se pide una fila de más para saber si hay página siguiente
+    with conexion(DB_NAME) as conn:
+        filas = conn.execute(
+            f"""
+            SELECT i.id, i.fecha_subida, i.tipo, i.imagen_hash, i.miniatura_hash,
+                   substr(i.texto_original, 1, ?), length(i.texto_original),
+                   b.tamano
+            FROM imagenes i
+            LEFT JOIN blobs b ON b.hash = i.imagen_hash
+            WHERE {" AND ".join(condiciones)}
+            ORDER BY i.fecha_subida DESC, i.id DESC
+            LIMIT ?
+            """,
+            (LONGITUD_VISTA_PREVIA, *parametros, limite + 1)
+        ).fetchall()
+
+    imagenes = [
+        {
+            "id": img_id,
+            "fecha": fecha,
+            "tipo": tipo_fila,
+            "imagen_hash": imagen_hash,
+            "miniatura_hash": miniatura_hash,
+            "vista_previa": vista_previa or "",
+            "longitud_texto": longitud or 0,
+            "tamano": tamano or 0,
+        }
+        for img_id, fecha, tipo_fila, imagen_hash, miniatura_hash, vista_previa, longitud, tamano
+        in filas[:limite]
+    ]
+
+    siguiente = None
+    if len(filas) > limite:
+        siguiente = (imagenes[-1]["fecha"], imagenes[-1]["id"])
+
+    return {"imagenes": imagenes, "siguiente_cursor": siguiente}
+
+
+def obtener_miniatura(imagen: dict):
+    """Miniatura de una imagen del listado (la genera si no existe)."""
+    return _leer_miniatura(imagen["id"], imagen["imagen_hash"], imagen["miniatura_hash"])
+
+
+# =========================
+# MINIATURAS (GENERACIÓN PEREZOSA)
+# =========================
+def _leer_miniatura(imagen_id: int, imagen_hash: str, miniatura_hash: str):
+    if miniatura_hash:
+        miniatura = leer_blob(miniatura_hash)
+        if miniatura is not None:
+            return miniatura
+
+    return generar_miniatura(imagen_id, imagen_hash)
+
+
+def generar_miniatura(imagen_id: int, imagen_hash: str):
+    """
+    Crea y guarda la miniatura de una imagen antigua que no la tiene.
+    Si la imagen original no se puede abrir, devuelve la original.
+    """
+    original = leer_blob(imagen_hash)
+    if original is None:
+        return None
+
+    miniatura = crear_miniatura(original)
+    if miniatura is None:
+        return original
+
+    escribir_blob(miniatura)
+    with transaccion(DB_NAME) as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            "SELECT miniatura_hash FROM imagenes WHERE id = ?",
+            (imagen_id,)
+        )
+        fila = cursor.fetchone()
+
+        # Otra sesión pudo generarla entre tanto, o la imagen se borró
+        if fila is not None and fila[0] is None:
+            miniatura_hash = guardar_blob(cursor, miniatura)
+            cursor.execute(
+                "UPDATE imagenes SET miniatura_hash = ? WHERE id = ?",
+                (miniatura_hash, imagen_id)
+            )
+
+    return miniatura
 
 
 # =========================
 # OBTENER UNA IMAGEN POR ID
 # =========================
-def obtener_imagen_por_id(imagen_id: int):
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
+def obtener_imagen_por_id(imagen_id: int, usuario_id: int = None, incluir_imagen: bool = True):
+    """
+    Devuelve (imagen, texto_original) de una imagen, o None si no existe.
 
-    cursor.execute(
-        """
-        SELECT imagen_blob, texto_original
-        FROM imagenes
-        WHERE id = ?
-        """,
-        (imagen_id,)
-    )
+    :param usuario_id: Si se indica, solo se devuelve si pertenece al usuario
+    :param incluir_imagen: False para leer solo el texto (imagen = None)
+    """
+    with conexion(DB_NAME) as conn:
+        if usuario_id is None:
+            fila = conn.execute(
+                """
+                SELECT imagen_hash, texto_original
+                FROM imagenes
+                WHERE id = ?
+                """,
+                (imagen_id,)
+            ).fetchone()
+        else:
+            fila = conn.execute(
+                """
+                SELECT imagen_hash, texto_original
+                FROM imagenes
+                WHERE id = ? AND usuario_id = ?
+                """,
+                (imagen_id, usuario_id)
+            ).fetchone()
 
-    fila = cursor.fetchone()
-    conn.close()
+    if not fila:
+        return None
 
-    return fila
+    imagen = leer_blob(fila[0]) if incluir_imagen else None
+    return (imagen, fila[1])
 
 
 # =========================
@@ -102,23 +282,7 @@ def eliminar_imagen(imagen_id: int, usuario_id: int):
     """
     Elimina una imagen específica solo si pertenece al usuario
     """
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
-    
-    # Verificar que la imagen pertenece al usuario antes de eliminar
-    cursor.execute(
-        """
-        DELETE FROM imagenes 
-        WHERE id = ? AND usuario_id = ?
-        """,
-        (imagen_id, usuario_id)
-    )
-    
-    eliminadas = cursor.rowcount
-    conn.commit()
-    conn.close()
-    
-    return eliminadas > 0
+    return eliminar_imagenes([imagen_id], usuario_id) > 0
 
 
 # =========================
@@ -131,22 +295,105 @@ def eliminar_imagenes(imagenes_ids: list, usuario_id: int):
     if not imagenes_ids:
         return 0
     
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
-    
     # Crear placeholders para la consulta SQL
     placeholders = ','.join(['?'] * len(imagenes_ids))
+
+    # Bloqueo de escritura desde el principio: nadie puede borrar las
+    # mismas filas entre la lectura de los hashes y el DELETE
+    with transaccion(DB_NAME) as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            f"""
+            SELECT imagen_hash, miniatura_hash FROM imagenes
+            WHERE id IN ({placeholders}) AND usuario_id = ?
+            """,
+            (*imagenes_ids, usuario_id)
+        )
+        hashes = [h for fila in cursor.fetchall() for h in fila if h]
+
+        cursor.execute(
+            f"""
+            DELETE FROM traducciones
+            WHERE imagen_id IN (
+                SELECT id FROM imagenes WHERE id IN ({placeholders}) AND usuario_id = ?
+            )
+            """,
+            (*imagenes_ids, usuario_id)
+        )
+
+        cursor.execute(
+            f"""
+            DELETE FROM imagenes 
+            WHERE id IN ({placeholders}) AND usuario_id = ?
+            """,
+            (*imagenes_ids, usuario_id)
+        )
+        
+        eliminadas = cursor.rowcount
+        liberar_blobs(cursor, hashes)
+
+    # Borrar los archivos que se han quedado sin referencias
+    with conexion(DB_NAME) as conn:
+        recolectar_basura(conn, hashes)
     
-    cursor.execute(
-        f"""
-        DELETE FROM imagenes 
-        WHERE id IN ({placeholders}) AND usuario_id = ?
-        """,
-        (*imagenes_ids, usuario_id)
-    )
-    
-    eliminadas = cursor.rowcount
-    conn.commit()
-    conn.close()
-    
-    return eliminadas
\ No newline at end of file
+    return eliminadas
+
+# =========================
+# TRADUCCIONES DE LAS IMÁGENES
+# =========================
+def obtener_textos_imagenes(imagenes_ids: list, usuario_id: int) -> dict:
+    """
+    Textos originales de varias imágenes del usuario (las que no tienen
+    texto se omiten).
+
+    :return: {imagen_id: texto_original}
+    """
+    if not imagenes_ids:
+        return {}
+
+    placeholders = ",".join("?" * len(imagenes_ids))
+    with conexion(DB_NAME) as conn:
+        return dict(conn.execute(
+            f"""
+            SELECT id, texto_original FROM imagenes
+            WHERE id IN ({placeholders}) AND usuario_id = ?
+              AND texto_original IS NOT NULL AND trim(texto_original) != ''
+            """,
+            (*imagenes_ids, usuario_id)
+        ).fetchall())
+
+
+def guardar_traducciones_imagen(imagen_id: int, traducciones: dict):
+    """
+    Guarda (o sustituye) las traducciones de una imagen.
+
+    :param traducciones: {codigo_idioma: texto}
+    """
+    ahora = datetime.now().isoformat()
+
+    with transaccion(DB_NAME) as conn:
+        conn.executemany(
+            """
+            INSERT INTO traducciones (imagen_id, idioma, texto, fecha)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT(imagen_id, idioma) DO UPDATE SET
+                texto = excluded.texto,
+                fecha = excluded.fecha
+            """,
+            [(imagen_id, codigo, texto, ahora) for codigo, texto in traducciones.items()]
+        )
+
+
+def obtener_traducciones_imagen(imagen_id: int, usuario_id: int) -> dict:
+    """Traducciones guardadas de una imagen del usuario: {codigo_idioma: texto}."""
+    with conexion(DB_NAME) as conn:
+        return dict(conn.execute(
+            """
+            SELECT t.idioma, t.texto
+            FROM traducciones t
+            JOIN imagenes i ON i.id = t.imagen_id
+            WHERE t.imagen_id = ? AND i.usuario_id = ?
+            ORDER BY t.idioma
+            """,
+            (imagen_id, usuario_id)
+        ).fetchall())
@@ -0,0 +1,190 @@
+import hashlib
+import os
+import threading
+
+import httpx
+from google import genai
+from google.genai import types
+
+from utils.planificador import obtener_planificador, estimar_tokens
+
+# =========================
+# Configuración del pool HTTP
+# =========================
+POOL_MAX_CONEXIONES = int(os.getenv("GEMINI_POOL_MAX_CONEXIONES", "20"))
+POOL_MAX_KEEPALIVE = int(os.getenv("GEMINI_POOL_MAX_KEEPALIVE", "10"))
+KEEPALIVE_SEGUNDOS = float(os.getenv("GEMINI_KEEPALIVE_SEGUNDOS", "60"))
+TIMEOUT_CONEXION_SEGUNDOS = float(os.getenv("GEMINI_TIMEOUT_CONEXION_SEGUNDOS", "10"))
+TIMEOUT_SEGUNDOS = float(os.getenv("GEMINI_TIMEOUT_SEGUNDOS", "120"))
+
+_clientes = {}
+_pools = {}
+_lock = threading.Lock()
+_contadores = {
+    "clientes_creados": 0,
+    "clientes_reutilizados": 0,
+    "peticiones": 0,
+    "conexiones_nuevas": 0,
+}
+
+
+def _sumar(nombre: str):
+    with _lock:
+        _contadores[nombre] += 1
+
+
+def _traza(evento: str, info: dict):
+    # httpcore solo abre TCP cuando no hay conexión libre en el pool
+    if evento == "connection.connect_tcp.complete":
+        _sumar("conexiones_nuevas")
+
+
+def _instrumentar(request: httpx.Request):
+    _sumar("peticiones")
+    request.extensions["trace"] = _traza
+
+
+def _crear_httpx_client() -> httpx.Client:
+    return httpx.Client(
+        limits=httpx.Limits(
+            max_connections=POOL_MAX_CONEXIONES,
+            max_keepalive_connections=POOL_MAX_KEEPALIVE,
+            keepalive_expiry=KEEPALIVE_SEGUNDOS,
+        ),
+        timeout=httpx.Timeout(TIMEOUT_SEGUNDOS, connect=TIMEOUT_CONEXION_SEGUNDOS),
+        event_hooks={"request": [_instrumentar]},
+    )
+
+
+# =========================
+# OBTENER CLIENTE COMPARTIDO
+# =========================
+def obtener_cliente(api_key: str) -> genai.Client:
+    """
+    Devuelve el cliente de Gemini compartido para esa API Key.
+
+    El cliente (y su pool de conexiones HTTP persistentes) se crea una
+    sola vez por proceso y se reutiliza desde todos los hilos de Streamlit,
+    manteniendo las sesiones TLS y el keep-alive entre peticiones.
+
+    :param api_key: API Key de Gemini
+    :return: Instancia de genai.Client
+    """
+    if not api_key:
+        raise ValueError("❌ Falta la API Key de Gemini")
+
+    clave = hashlib.sha256(api_key.encode("utf-8")).hexdigest()
+
+    with _lock:
+        cliente = _clientes.get(clave)
+        if cliente is not None:
+            _contadores["clientes_reutilizados"] += 1
+            return cliente
+
+        pool = _crear_httpx_client()
+        cliente = genai.Client(
+            api_key=api_key,
+            http_options=types.HttpOptions(
+                httpx_client=pool,
+                timeout=int(TIMEOUT_SEGUNDOS * 1000),
+            ),
+        )
+        _clientes[clave] = cliente
+        _pools[clave] = pool
+        _contadores["clientes_creados"] += 1
+        return cliente
+
+
+# =========================
+# GENERACIÓN (A TRAVÉS DEL PLANIFICADOR)
+# =========================
+def generar_contenido(api_key: str, modelo: str, contenidos, config=None, intentos: int = None):
+    """
+    generate_content() pasando por el planificador de la API Key: espera
+    turno y cuota (RPM/TPM) y reintenta ante 429 y errores 5xx.
+    Todas las llamadas al modelo deben hacerse con esta función o con
+    generar_en_stream().
+
+    :param intentos: Máximo de intentos (por defecto, los del planificador)
+    :return: Respuesta de Gemini (response.text, usage_metadata...)
+    """
+    client = obtener_cliente(api_key)
+
+    return obtener_planificador(api_key).ejecutar(
+        lambda: client.models.generate_content(
+            model=modelo,
+            contents=contenidos,
+            config=config,
+        ),
+        estimar_tokens(contenidos, config),
+        intentos,
+    )
+
+
+def generar_en_stream(api_key: str, modelo: str, contenidos, config=None, al_terminar=None):
+    """
+    Generador con los fragmentos de texto de la respuesta según llegan
+    (generate_content_stream), también a través del planificador.
+
+    :param al_terminar: Función que recibe el texto completo cuando el
+                        stream termina bien (p. ej. para guardarlo en la
+                        caché). No se llama si se corta a medias.
+    """
+    client = obtener_cliente(api_key)
+
+    fragmentos = obtener_planificador(api_key).ejecutar_stream(
+        lambda: client.models.generate_content_stream(
+            model=modelo,
+            contents=contenidos,
+            config=config,
+        ),
+        estimar_tokens(contenidos, config),
+    )
+
+    partes = []
+    try:
+        for fragmento in fragmentos:
+            texto = fragmento.text
+            if texto:
+                partes.append(texto)
+                yield texto
+    finally:
+        # Si se corta el stream, libera ya su plaza en el planificador
+        fragmentos.close()
+
+    if al_terminar:
+        al_terminar("".join(partes))
+
+
+# =========================
+# ESTADÍSTICAS Y CIERRE
+# =========================
+def estadisticas_conexiones() -> dict:
+    """
+    Devuelve contadores de clientes y de conexiones HTTP.
+    "conexiones_reutilizadas" son peticiones servidas por una conexión
+    ya abierta del pool.
+    """
+    with _lock:
+        datos = dict(_contadores)
+        datos["clientes_activos"] = len(_clientes)
+
+    datos["conexiones_reutilizadas"] = max(
+        datos["peticiones"] - datos["conexiones_nuevas"], 0
+    )
+    datos["tasa_reutilizacion"] = (
+        datos["conexiones_reutilizadas"] / datos["peticiones"]
+        if datos["peticiones"] else 0.0
+    )
+    return datos
+
+
+def cerrar_clientes():
+    """Cierra todos los pools HTTP (útil en tests o al apagar el proceso)."""
+    with _lock:
+        pools = list(_pools.values())
+        _pools.clear()
+        _clientes.clear()
+
+    for pool in pools:
+        pool.close()
@@ -1,24 +1,17 @@
-import base64
-from google import genai
-from PIL import Image
-import io
+from utils.gemini_client import generar_contenido
+from utils.procesado_imagen import leer_imagen, preparar_imagen, parte_imagen
 
 def entender_imagen(imagen_file, api_key: str):
-    # convierte la imagen a base64
-    image_bytes = imagen_file.read()
-    base64_str = base64.b64encode(image_bytes).decode("utf-8")
+    # prepara la imagen (tamaño y formato) y la envía como bytes
+    preparada = preparar_imagen(leer_imagen(imagen_file), "descripcion")
 
-    # cliente de Gemini
-    client = genai.Client(api_key=api_key)
-
-    # petición al modelo con imagen
-    response = client.models.generate_content(
-        model="gemini-2.5-flash",
-        contents=[{
-            "parts": [
-                {"inline_data": {"mime_type": "image/jpeg", "data": base64_str}},
-                {"text": "Describe esta imagen y tradúcela al español"}
-            ]
-        }],
+    # petición al modelo con imagen (a través del planificador)
+    response = generar_contenido(
+        api_key,
+        "gemini-2.5-flash",
+        [
+            parte_imagen(preparada),
+            "Describe esta imagen y tradúcela al español"
+        ],
     )
     return response.text
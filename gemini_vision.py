@@ -1,70 +1,141 @@
-import base64
-import io
-from google import genai
-from PIL import Image
 
-MAX_IMAGE_SIZE_MB = 5
+import contextvars
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from utils.gemini_client import generar_contenido, generar_en_stream
+from utils.cache_resultados import clave_cache, obtener_resultado, guardar_resultado
+from utils.procesado_imagen import leer_imagen, preparar_imagen, parte_imagen, crear_miniatura
+
+MODELO_OCR = "gemini-2.5-flash"
+PROMPT_OCR = (
+    "Extrae TODO el texto que aparezca en esta imagen. "
+    "No lo resumas. No lo interpretes. "
+    "Devuelve únicamente el texto."
+)
+
+# Hilos por lote (la cuota y el límite de peticiones los pone el planificador)
+MAX_TRABAJADORES_LOTE = int(os.getenv("GEMINI_LOTE_TRABAJADORES", "8"))
 
 
 def extraer_texto_imagen(imagen_subida, api_key: str) -> str:
     """
     Extrae TODO el texto de una imagen usando Gemini Vision.
     Valida tamaño máximo y formato.
+    Los resultados se guardan en la caché compartida: repetir la misma
+    imagen no vuelve a llamar al modelo.
     """
 
     # =========================
     # Validar tamaño de imagen
     # =========================
-    imagen_subida.seek(0, io.SEEK_END)
-    size_mb = imagen_subida.tell() / (1024 * 1024)
-    imagen_subida.seek(0)
-
-    if size_mb > MAX_IMAGE_SIZE_MB:
-        raise ValueError(
-            f"❌ La imagen pesa {size_mb:.2f} MB. "
-            f"El máximo permitido es {MAX_IMAGE_SIZE_MB} MB."
-        )
+    original_bytes = leer_imagen(imagen_subida)
 
     # =========================
-    # Abrir imagen
+    # Consultar caché
     # =========================
-    image = Image.open(imagen_subida)
-
-    buffer = io.BytesIO()
-    image.save(buffer, format="PNG")
-    image_bytes = buffer.getvalue()
+    clave = clave_cache(original_bytes, "ocr", PROMPT_OCR, MODELO_OCR)
+    texto_cacheado = obtener_resultado(clave)
+    if texto_cacheado is not None:
+        return texto_cacheado
 
     # =========================
-    # Base64
+    # Preparar imagen (perfil OCR: conserva resolución)
     # =========================
-    image_base64 = base64.b64encode(image_bytes).decode("utf-8")
+    preparada = preparar_imagen(original_bytes, "ocr")
 
     # =========================
-    # Cliente Gemini
+    # Bytes directos, sin base64
     # =========================
-    client = genai.Client(api_key=api_key)
-
-    prompt = (
-        "Extrae TODO el texto que aparezca en esta imagen. "
-        "No lo resumas. No lo interpretes. "
-        "Devuelve únicamente el texto."
-    )
+    imagen_parte = parte_imagen(preparada)
 
-    response = client.models.generate_content(
-        model="gemini-2.5-flash",
-        contents=[
-            {
-                "parts": [
-                    {
-                        "inline_data": {
-                            "mime_type": "image/png",
-                            "data": image_base64,
-                        }
-                    },
-                    {"text": prompt},
-                ]
-            }
+    # =========================
+    # Llamada a Gemini (planificador compartido)
+    # =========================
+    response = generar_contenido(
+        api_key,
+        MODELO_OCR,
+        [
+            imagen_parte,
+            PROMPT_OCR,
         ],
     )
 
+    guardar_resultado(clave, "ocr", response.text)
     return response.text
+
+
+def extraer_texto_imagen_stream(imagen_subida, api_key: str):
+    """
+    Como extraer_texto_imagen(), pero devuelve un generador con el texto
+    por fragmentos según llega. Las validaciones se hacen antes de
+    devolverlo; el texto completo se guarda en la caché al terminar.
+    """
+    original_bytes = leer_imagen(imagen_subida)
+
+    clave = clave_cache(original_bytes, "ocr", PROMPT_OCR, MODELO_OCR)
+    texto_cacheado = obtener_resultado(clave)
+    if texto_cacheado is not None:
+        return iter([texto_cacheado])
+
+    imagen_parte = parte_imagen(preparar_imagen(original_bytes, "ocr"))
+
+    return generar_en_stream(
+        api_key,
+        MODELO_OCR,
+        [imagen_parte, PROMPT_OCR],
+        al_terminar=lambda texto: guardar_resultado(clave, "ocr", texto),
+    )
+
+
+# =========================
+# OCR POR LOTES
+# =========================
+def extraer_texto_lote(archivos: list, api_key: str, max_trabajadores: int = MAX_TRABAJADORES_LOTE):
+    """
+    Extrae el texto de varias imágenes en paralelo y devuelve cada
+    resultado en cuanto termina (generador), no en el orden de entrada.
+
+    Las peticiones a la vez están acotadas por los hilos del lote; la
+    cuota y el turno frente a otros usuarios los decide el planificador
+    de la API Key. Un archivo que falla no detiene
+    el resto: su resultado lleva el error. Cada hilo prepara también la
+    miniatura, para poder guardar después todo el lote de una vez con
+    guardar_imagenes().
+
+    :param archivos: Archivos subidos (UploadedFile o similares)
+    :return: dicts {"indice", "nombre", "texto", "miniatura", "error", "segundos"}
+    """
+    def procesar(indice, archivo):
+        inicio = time.perf_counter()
+        resultado = {
+            "indice": indice,
+            "nombre": getattr(archivo, "name", f"imagen_{indice + 1}"),
+            "texto": None,
+            "miniatura": None,
+            "error": None,
+        }
+        try:
+            resultado["texto"] = extraer_texto_imagen(archivo, api_key)
+            resultado["miniatura"] = crear_miniatura(leer_imagen(archivo))
+        except Exception as e:
+            resultado["error"] = str(e)
+
+        resultado["segundos"] = time.perf_counter() - inicio
+        return resultado
+
+    with ThreadPoolExecutor(max_workers=max(max_trabajadores, 1)) as ejecutor:
+        # Cada hilo con una copia del contexto, para que el planificador
+        # sepa de qué usuario es cada petición
+        futuros = [
+            ejecutor.submit(contextvars.copy_context().run, procesar, i, archivo)
+            for i, archivo in enumerate(archivos)
+        ]
+        try:
+            for futuro in as_completed(futuros):
+                yield futuro.result()
+        finally:
+            # Si se deja de consumir el generador, no empezar los pendientes
+            for futuro in futuros:
+                futuro.cancel()
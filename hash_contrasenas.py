@@ -0,0 +1,202 @@
+"""
+Servicio de hash de contraseñas: bcrypt en un pool de procesos, fuera de
+los hilos de Streamlit, con un coste configurable y una cola acotada para
+que la latencia del login no crezca sin límite en los picos.
+"""
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import bcrypt
+
+# =========================
+# Configuración
+# =========================
+# Factor de trabajo de bcrypt (2^coste rondas). Los hashes con otro coste
+# se rehacen en el siguiente login correcto.
+BCRYPT_COSTE = int(os.getenv("BCRYPT_COSTE", "12"))
+
+# Procesos del pool (0 = calcular en el hilo que llama, sin pool)
+BCRYPT_PROCESOS = int(os.getenv("BCRYPT_PROCESOS", str(os.cpu_count() or 1)))
+
+# Operaciones admitidas a la vez (en curso + en cola) y espera máxima por
+# un hueco antes de rechazar el login
+MAX_PENDIENTES_HASH = int(os.getenv("BCRYPT_MAX_PENDIENTES", str(max(BCRYPT_PROCESOS, 1) * 4)))
+MAX_ESPERA_HASH_SEGUNDOS = float(os.getenv("BCRYPT_MAX_ESPERA_SEGUNDOS", "10"))
+
+# Hash fijo (coste 4) para arrancar los procesos sin gastar CPU
+_HASH_CALENTAMIENTO = bcrypt.hashpw(b"", bcrypt.gensalt(rounds=4))
+
+_pool = None
+_huecos = None
+_lock = threading.Lock()
+_contadores = {
+    "hashes": 0,
+    "verificaciones": 0,
+    "rehashes": 0,
+    "rechazadas": 0,
+    "pools_reiniciados": 0,
+    "ms_total": 0.0,
+    "max_ms": 0.0,
+}
+
+
+class HashSaturadoError(RuntimeError):
+    """No ha habido hueco en el pool en MAX_ESPERA_HASH_SEGUNDOS."""
+
+
+# =========================
+# TRABAJO EN LOS PROCESOS
+# =========================
+# Funciones de módulo: el pool las envía por nombre a los procesos
+def _hashear(password: bytes, coste: int) -> bytes:
+    return bcrypt.hashpw(password, bcrypt.gensalt(rounds=coste))
+
+
+def _verificar(password: bytes, password_hash: bytes) -> bool:
+    return bcrypt.checkpw(password, password_hash)
+
+
+# =========================
+# POOL
+# =========================
+def _obtener_pool():
+    global _pool, _huecos
+    with _lock:
+        if _huecos is None:
+            _huecos = threading.BoundedSemaphore(MAX_PENDIENTES_HASH)
+        if _pool is None and BCRYPT_PROCESOS > 0:
+            # spawn: los procesos no heredan los hilos ni los sockets de
+            # Streamlit (fork con hilos vivos puede bloquearse)
+            _pool = ProcessPoolExecutor(
+                max_workers=BCRYPT_PROCESOS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _pool, _huecos
+
+
+def iniciar_servicio_hash() -> list:
+    """
+    Arranca los procesos del pool ya, para que el primer login no pague el
+    arranque. No espera a que estén listos: devuelve los futuros.
+    """
+    pool, _ = _obtener_pool()
+    if pool is None:
+        return []
+    return [pool.submit(_verificar, b"", _HASH_CALENTAMIENTO) for _ in range(BCRYPT_PROCESOS)]
+
+
+def servicio_hash_listo() -> bool:
+    """True si el pool está arrancado y sano (o si se calcula sin pool)."""
+    if BCRYPT_PROCESOS <= 0:
+        return True
+    with _lock:
+        return _pool is not None and not getattr(_pool, "_broken", False)
+
+
+def cerrar_servicio_hash():
+    """Cierra el pool (tests, benchmark o al apagar)."""
+    global _pool
+    with _lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=True)
+
+
+def _descartar_pool(roto):
+    # Un pool roto no se recupera: se quita para que _obtener_pool cree otro
+    global _pool
+    with _lock:
+        if _pool is roto:
+            _pool = None
+            _contadores["pools_reiniciados"] += 1
+    roto.shutdown(wait=False, cancel_futures=True)
+
+
+def _en_pool(pool, funcion, *args):
+    # Si un proceso muere (p. ej. lo mata el OOM killer) el pool queda roto
+    # para siempre: se crea uno nuevo y se repite una vez. Si también se
+    # rompe, se calcula en este hilo antes que dejar a nadie sin entrar.
+    try:
+        return pool.submit(funcion, *args).result()
+    except BrokenProcessPool:
+        _descartar_pool(pool)
+
+    nuevo, _ = _obtener_pool()
+    if nuevo is None:
+        return funcion(*args)
+    try:
+        return nuevo.submit(funcion, *args).result()
+    except BrokenProcessPool:
+        _descartar_pool(nuevo)
+        return funcion(*args)
+
+
+def _ejecutar(funcion, *args):
+    pool, huecos = _obtener_pool()
+
+    if not huecos.acquire(timeout=MAX_ESPERA_HASH_SEGUNDOS):
+        with _lock:
+            _contadores["rechazadas"] += 1
+        raise HashSaturadoError("❌ Hay demasiados inicios de sesión a la vez. Inténtalo en unos segundos")
+
+    inicio = time.perf_counter()
+    try:
+        if pool is None:
+            return funcion(*args)
+        return _en_pool(pool, funcion, *args)
+    finally:
+        huecos.release()
+        ms = (time.perf_counter() - inicio) * 1000
+        with _lock:
+            _contadores["ms_total"] += ms
+            _contadores["max_ms"] = max(_contadores["max_ms"], ms)
+
+
+# =========================
+# API
+# =========================
+def hashear_contrasena(password: str, coste: int = None) -> str:
+    """Hash bcrypt de la contraseña con el coste indicado (por defecto BCRYPT_COSTE)."""
+    password_hash = _ejecutar(_hashear, password.encode("utf-8"), coste or BCRYPT_COSTE)
+    with _lock:
+        _contadores["hashes"] += 1
+    return password_hash.decode("utf-8")
+
+
+def verificar_contrasena(password: str, password_hash: str) -> bool:
+    """Comprueba la contraseña contra un hash bcrypt guardado."""
+    correcta = _ejecutar(_verificar, password.encode("utf-8"), password_hash.encode("utf-8"))
+    with _lock:
+        _contadores["verificaciones"] += 1
+    return correcta
+
+
+def coste_hash(password_hash: str) -> int:
+    """Coste de un hash bcrypt ('$2b$12$...' -> 12)."""
+    return int(password_hash.split("$")[2])
+
+
+def necesita_rehash(password_hash: str) -> bool:
+    return coste_hash(password_hash) != BCRYPT_COSTE
+
+
+def registrar_rehash():
+    with _lock:
+        _contadores["rehashes"] += 1
+
+
+def estadisticas_hash() -> dict:
+    """Operaciones hechas, rechazos por saturación y latencia (ms) incluida la cola."""
+    with _lock:
+        datos = dict(_contadores)
+
+    operaciones = datos["hashes"] + datos["verificaciones"]
+    datos["ms_medio"] = datos.pop("ms_total") / operaciones if operaciones else 0.0
+    datos["coste"] = BCRYPT_COSTE
+    datos["procesos"] = BCRYPT_PROCESOS
+    return datos
+
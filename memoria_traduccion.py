@@ -0,0 +1,128 @@
+import hashlib
+import re
+import time
+import unicodedata
+
+from utils.conexion_db import conexion, transaccion
+
+DB_NAME = "users.db"
+
+# Máximo de parámetros por consulta IN (...) en SQLite
+_LOTE_CONSULTA = 500
+
+_ESPACIOS = re.compile(r"\s+")
+
+
+# =========================
+# CLAVE DE SEGMENTO
+# =========================
+def normalizar_segmento(segmento: str) -> str:
+    """
+    Forma normalizada de un segmento para buscarlo en la memoria: Unicode
+    NFC y espacios colapsados. Dos segmentos que solo difieren en
+    espacios o saltos de línea comparten traducción.
+    """
+    return _ESPACIOS.sub(" ", unicodedata.normalize("NFC", segmento)).strip()
+
+
+def hash_segmento(segmento: str) -> str:
+    return hashlib.sha256(normalizar_segmento(segmento).encode("utf-8")).hexdigest()
+
+
+def _incrementar(conn, nombre: str, cantidad: int):
+    if cantidad:
+        conn.execute(
+            """
+            INSERT INTO contadores (nombre, valor) VALUES (?, ?)
+            ON CONFLICT(nombre) DO UPDATE SET valor = valor + excluded.valor
+            """,
+            (nombre, cantidad)
+        )
+
+
+# =========================
+# BUSCAR / GUARDAR
+# =========================
+def buscar_traducciones(segmentos: list, codigo_idioma: str) -> dict:
+    """
+    Traducciones guardadas de los segmentos en ese idioma.
+
+    :param segmentos: Segmentos de texto (se normalizan al buscar)
+    :param codigo_idioma: Código del idioma destino ('es', 'en'...)
+    :return: {segmento_hash: traduccion} solo de los que están en memoria
+    """
+    hashes = list(dict.fromkeys(hash_segmento(s) for s in segmentos))
+    encontradas = {}
+
+    with conexion(DB_NAME) as conn:
+        for i in range(0, len(hashes), _LOTE_CONSULTA):
+            lote = hashes[i:i + _LOTE_CONSULTA]
+            marcadores = ",".join("?" * len(lote))
+            encontradas.update(conn.execute(
+                f"""
+                SELECT segmento_hash, traduccion FROM memoria_traduccion
+                WHERE idioma = ? AND segmento_hash IN ({marcadores})
+                """,
+                [codigo_idioma, *lote]
+            ).fetchall())
+
+    return encontradas
+
+
+def guardar_traducciones(pares: list, codigo_idioma: str, modelo: str, aciertos: int = 0, fallos: int = 0):
+    """
+    Guarda traducciones nuevas y actualiza los contadores de la memoria
+    en una sola transacción.
+
+    :param pares: Lista de (segmento, traduccion)
+    :param aciertos: Segmentos servidos desde la memoria
+    :param fallos: Segmentos que han tenido que ir al modelo
+    """
+    ahora = time.time()
+
+    with transaccion(DB_NAME) as conn:
+        conn.executemany(
+            """
+            INSERT INTO memoria_traduccion
+                (idioma, segmento_hash, segmento, traduccion, modelo, creado, ultimo_uso)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(idioma, segmento_hash) DO UPDATE SET
+                traduccion = excluded.traduccion,
+                modelo = excluded.modelo,
+                ultimo_uso = excluded.ultimo_uso
+            """,
+            [
+                (codigo_idioma, hash_segmento(segmento), normalizar_segmento(segmento),
+                 traduccion, modelo, ahora, ahora)
+                for segmento, traduccion in pares
+            ]
+        )
+        _incrementar(conn, "memoria_traduccion_aciertos", aciertos)
+        _incrementar(conn, "memoria_traduccion_fallos", fallos)
+
+
+# =========================
+# ESTADÍSTICAS
+# =========================
+def estadisticas_memoria_traduccion() -> dict:
+    """Aciertos, fallos y tasa de aciertos por segmento, y tamaño de la memoria."""
+    with conexion(DB_NAME) as conn:
+        contadores = dict(conn.execute(
+            "SELECT nombre, valor FROM contadores WHERE nombre LIKE 'memoria_traduccion_%'"
+        ).fetchall())
+        segmentos = conn.execute("SELECT COUNT(*) FROM memoria_traduccion").fetchone()[0]
+        idiomas = dict(conn.execute(
+            "SELECT idioma, COUNT(*) FROM memoria_traduccion GROUP BY idioma"
+        ).fetchall())
+
+    aciertos = contadores.get("memoria_traduccion_aciertos", 0)
+    fallos = contadores.get("memoria_traduccion_fallos", 0)
+    total = aciertos + fallos
+
+    return {
+        "aciertos": aciertos,
+        "fallos": fallos,
+        "tasa_aciertos": aciertos / total if total else 0.0,
+        "segmentos": segmentos,
+        "segmentos_por_idioma": idiomas,
+    }
@@ -0,0 +1,270 @@
+import sqlite3
+
+from utils.blob_store import init_blob_store, guardar_blob
+from utils.resumenes_uso import crear_resumenes
+from utils.eventos_traduccion import crear_eventos_traduccion
+
+DB_NAME = "users.db"
+
+
+# =========================
+# UTILIDADES
+# =========================
+def _columnas(conn, tabla: str) -> list:
+    return [fila[1] for fila in conn.execute(f"PRAGMA table_info({tabla})")]
+
+
+def _asegurar_columna(conn, tabla: str, columna: str, definicion: str) -> bool:
+    """Añade la columna si no existe. Devuelve True si se ha añadido."""
+    if columna in _columnas(conn, tabla):
+        return False
+    conn.execute(f"ALTER TABLE {tabla} ADD COLUMN {columna} {definicion}")
+    return True
+
+
+# =========================
+# MIGRACIONES
+# =========================
+# Cada migración recibe la conexión dentro de una transacción abierta
+# (BEGIN IMMEDIATE) y no hace commit. Deben tolerar bases de datos que ya
+# tengan parte de los cambios: las creadas antes del control de versiones
+# parten de user_version = 0 en cualquier estado intermedio.
+
+def _m001_esquema_base(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS usuarios (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            email TEXT UNIQUE NOT NULL,
+            password_hash TEXT NOT NULL,
+            fecha_registro TEXT NOT NULL
+        )
+    """)
+
+    # La imagen se guarda en el blob store; aquí solo su hash
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS imagenes (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            usuario_id INTEGER NOT NULL,
+            imagen_hash TEXT NOT NULL,
+            texto_original TEXT,
+            fecha_subida TEXT NOT NULL,
+            FOREIGN KEY (usuario_id) REFERENCES usuarios(id)
+        )
+    """)
+    init_blob_store(conn.cursor())
+
+    migrar_imagenes_a_blob_store(conn)
+
+
+def migrar_imagenes_a_blob_store(conn) -> int:
+    """
+    Mueve las imágenes guardadas en imagenes.imagen_blob (esquema antiguo)
+    al blob store y reconstruye la tabla con la columna imagen_hash.
+    Las imágenes repetidas se guardan una sola vez.
+
+    :return: Número de filas migradas (0 si ya estaba migrada)
+    """
+    if "imagen_blob" not in _columnas(conn, "imagenes"):
+        return 0
+
+    cursor = conn.cursor()
+    cursor.execute("""
+        CREATE TABLE imagenes_nueva (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            usuario_id INTEGER NOT NULL,
+            imagen_hash TEXT NOT NULL,
+            texto_original TEXT,
+            fecha_subida TEXT NOT NULL,
+            FOREIGN KEY (usuario_id) REFERENCES usuarios(id)
+        )
+    """)
+
+    # Fila a fila: nunca se cargan todos los blobs a la vez
+    lector = conn.execute(
+        """
+        SELECT id, usuario_id, imagen_blob, texto_original, fecha_subida
+        FROM imagenes
+        ORDER BY id
+        """
+    )
+
+    migradas = 0
+    for img_id, usuario_id, imagen_blob, texto, fecha in lector:
+        imagen_hash = guardar_blob(cursor, imagen_blob)
+        cursor.execute(
+            """
+            INSERT INTO imagenes_nueva
+                (id, usuario_id, imagen_hash, texto_original, fecha_subida)
+            VALUES (?, ?, ?, ?, ?)
+            """,
+            (img_id, usuario_id, imagen_hash, texto, fecha)
+        )
+        migradas += 1
+
+    cursor.execute("DROP TABLE imagenes")
+    cursor.execute("ALTER TABLE imagenes_nueva RENAME TO imagenes")
+    return migradas
+
+
+def _m002_miniaturas(conn):
+    _asegurar_columna(conn, "imagenes", "miniatura_hash", "TEXT")
+
+
+def _m003_tipo_resultado(conn):
+    # En filas antiguas el tipo se deduce del prefijo con el que la app
+    # guardaba el texto
+    if _asegurar_columna(conn, "imagenes", "tipo", "TEXT NOT NULL DEFAULT 'ocr'"):
+        conn.execute("""
+            UPDATE imagenes SET tipo = CASE
+                WHEN texto_original LIKE 'DESCRIPCIÓN (%' THEN 'descripcion'
+                WHEN texto_original LIKE 'ANÁLISIS (%' THEN 'analisis'
+                WHEN texto_original LIKE 'CONTENIDO SOCIAL (%' THEN 'social'
+                ELSE 'ocr'
+            END
+        """)
+
+
+def _m004_indice_usuario_fecha(conn):
+    # Galería (listado por usuario ordenado por fecha), total de imágenes
+    # y última actividad
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_imagenes_usuario_fecha
+        ON imagenes (usuario_id, fecha_subida)
+    """)
+
+
+def _m005_fechas_tipadas(conn):
+    # fecha_epoch: segundos UTC. dia: 'YYYY-MM-DD' en hora local, igual
+    # que DATE(fecha_subida). Las escribe guardar_imagen(); aquí solo se
+    # rellenan las filas existentes.
+    _asegurar_columna(conn, "imagenes", "fecha_epoch", "INTEGER")
+    _asegurar_columna(conn, "imagenes", "dia", "TEXT")
+
+    conn.execute("""
+        UPDATE imagenes SET
+            fecha_epoch = CAST(strftime('%s', fecha_subida, 'utc') AS INTEGER),
+            dia = substr(fecha_subida, 1, 10)
+        WHERE fecha_epoch IS NULL OR dia IS NULL
+    """)
+
+    # Actividad por día de las estadísticas (índice cubriente)
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_imagenes_usuario_dia
+        ON imagenes (usuario_id, dia)
+    """)
+
+
+def _m006_memoria_traduccion(conn):
+    # Traducciones por segmento (frase o línea normalizada) e idioma
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS memoria_traduccion (
+            idioma TEXT NOT NULL,
+            segmento_hash TEXT NOT NULL,
+            segmento TEXT NOT NULL,
+            traduccion TEXT NOT NULL,
+            modelo TEXT NOT NULL,
+            creado REAL NOT NULL,
+            ultimo_uso REAL NOT NULL,
+            PRIMARY KEY (idioma, segmento_hash)
+        ) WITHOUT ROWID
+    """)
+
+    # Contadores globales (aciertos y fallos de la memoria...)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS contadores (
+            nombre TEXT PRIMARY KEY,
+            valor INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+
+
+def _m007_traducciones(conn):
+    # Traducciones guardadas de cada imagen de la galería (una por idioma)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS traducciones (
+            imagen_id INTEGER NOT NULL,
+            idioma TEXT NOT NULL,
+            texto TEXT NOT NULL,
+            fecha TEXT NOT NULL,
+            PRIMARY KEY (imagen_id, idioma),
+            FOREIGN KEY (imagen_id) REFERENCES imagenes(id)
+        ) WITHOUT ROWID
+    """)
+
+
+def _m008_resumenes_uso(conn):
+    # Resúmenes por usuario y por usuario y día, mantenidos por triggers
+    # (ver utils.resumenes_uso); se rellenan con las filas existentes
+    crear_resumenes(conn)
+
+
+def _m009_eventos_traduccion(conn):
+    # Un evento por traducción y su resumen por usuario e idioma
+    # (ver utils.eventos_traduccion)
+    crear_eventos_traduccion(conn)
+
+
+MIGRACIONES = [
+    (1, "Esquema base: usuarios, imágenes y blob store", _m001_esquema_base),
+    (2, "Miniaturas de la galería", _m002_miniaturas),
+    (3, "Tipo de resultado de cada imagen", _m003_tipo_resultado),
+    (4, "Índice (usuario_id, fecha_subida)", _m004_indice_usuario_fecha),
+    (5, "Columnas fecha_epoch y dia", _m005_fechas_tipadas),
+    (6, "Memoria de traducción por segmentos", _m006_memoria_traduccion),
+    (7, "Traducciones de las imágenes de la galería", _m007_traducciones),
+    (8, "Resúmenes de uso por usuario y día", _m008_resumenes_uso),
+    (9, "Eventos de traducción y uso por idioma", _m009_eventos_traduccion),
+]
+
+VERSION_ESQUEMA = MIGRACIONES[-1][0]
+
+
+# =========================
+# APLICAR MIGRACIONES
+# =========================
+def version_esquema(db_name: str = DB_NAME) -> int:
+    """Versión actual del esquema (PRAGMA user_version)."""
+    conn = sqlite3.connect(db_name)
+    try:
+        return conn.execute("PRAGMA user_version").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def aplicar_migraciones(db_name: str = DB_NAME) -> int:
+    """
+    Aplica en orden las migraciones pendientes. Cada una va en su propia
+    transacción junto con el cambio de user_version, así que una migración
+    a medias nunca queda registrada. Si varios procesos arrancan a la vez,
+    el bloqueo de escritura hace que solo uno aplique cada versión.
+
+    :return: Número de migraciones aplicadas
+    """
+    conn = sqlite3.connect(db_name, timeout=30)
+    conn.isolation_level = None  # Las transacciones se controlan aquí
+
+    aplicadas = 0
+    try:
+        for version, descripcion, migracion in MIGRACIONES:
+            if conn.execute("PRAGMA user_version").fetchone()[0] >= version:
+                continue
+
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                # Otro proceso pudo aplicarla mientras esperábamos el bloqueo
+                if conn.execute("PRAGMA user_version").fetchone()[0] >= version:
+                    conn.execute("ROLLBACK")
+                    continue
+
+                migracion(conn)
+                conn.execute(f"PRAGMA user_version = {version}")
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+
+            aplicadas += 1
+    finally:
+        conn.close()
+
+    return aplicadas
@@ -0,0 +1,378 @@
+import hashlib
+import os
+import threading
+import time
+from collections import deque
+
+import httpx
+from google.genai import errors
+from tenacity import (
+    Retrying,
+    retry_if_exception,
+    stop_after_attempt,
+    wait_random_exponential,
+)
+
+# establecer_usuario y como_usuario se siguen importando desde aquí
+from utils.contexto_usuario import usuario_actual, establecer_usuario, como_usuario
+
+# =========================
+# Configuración
+# =========================
+# Cuota de la API Key (por defecto, la del nivel gratuito de gemini-2.5-flash)
+GEMINI_RPM = float(os.getenv("GEMINI_RPM", "10"))
+GEMINI_TPM = float(os.getenv("GEMINI_TPM", "250000"))
+
+# Peticiones simultáneas por API Key, sumando todas las sesiones del proceso
+MAX_PETICIONES_POR_CLAVE = int(os.getenv("GEMINI_MAX_PETICIONES_POR_CLAVE", "8"))
+
+# Reintentos ante 429 y errores 5xx: espera exponencial con jitter
+MAX_INTENTOS = int(os.getenv("GEMINI_MAX_INTENTOS", "5"))
+ESPERA_BASE_SEGUNDOS = float(os.getenv("GEMINI_ESPERA_BASE_SEGUNDOS", "1"))
+ESPERA_MAXIMA_SEGUNDOS = float(os.getenv("GEMINI_ESPERA_MAXIMA_SEGUNDOS", "30"))
+
+# Tiempo máximo en cola antes de rechazar una petición
+MAX_ESPERA_COLA_SEGUNDOS = float(os.getenv("GEMINI_MAX_ESPERA_COLA_SEGUNDOS", "120"))
+
+# Estimación de tokens para la cubeta de TPM
+TOKENS_POR_IMAGEN = 258
+TOKENS_SALIDA_ESTIMADOS = 500
+
+CODIGOS_REINTENTABLES = {429, 500, 502, 503, 504}
+
+_planificadores = {}
+_lock = threading.Lock()
+
+
+_FIN = object()
+
+
+class ServicioSaturadoError(RuntimeError):
+    """La petición ha esperado en cola más de MAX_ESPERA_COLA_SEGUNDOS."""
+
+
+# =========================
+# CUBETA DE TOKENS
+# =========================
+class _Cubeta:
+    """Cubeta de tokens: `por_minuto` de capacidad, recarga continua."""
+
+    def __init__(self, por_minuto: float):
+        self.capacidad = por_minuto
+        self.por_segundo = por_minuto / 60.0
+        self.tokens = por_minuto
+        self.actualizada = time.monotonic()
+
+    def _recargar(self):
+        ahora = time.monotonic()
+        self.tokens = min(self.capacidad, self.tokens + (ahora - self.actualizada) * self.por_segundo)
+        self.actualizada = ahora
+
+    def espera(self, cantidad: float) -> float:
+        """Segundos hasta que haya `cantidad` tokens (0 si ya los hay)."""
+        if self.capacidad <= 0:
+            return 0.0
+        self._recargar()
+        # Una petición mayor que la capacidad pasa con la cubeta llena
+        cantidad = min(cantidad, self.capacidad)
+        if self.tokens >= cantidad:
+            return 0.0
+        return (cantidad - self.tokens) / self.por_segundo
+
+    def consumir(self, cantidad: float):
+        if self.capacidad > 0:
+            self._recargar()
+            self.tokens -= min(cantidad, self.capacidad)
+
+    def vaciar(self):
+        if self.capacidad > 0:
+            self._recargar()
+            self.tokens = min(self.tokens, 0.0)
+
+
+def estimar_tokens(contents, config=None) -> int:
+    """Estimación de tokens (entrada + salida) de una petición para la cubeta de TPM."""
+    partes = contents if isinstance(contents, (list, tuple)) else [contents]
+
+    total = 0
+    for parte in partes:
+        if isinstance(parte, str):
+            total += len(parte) // 4 + 1
+        else:
+            total += TOKENS_POR_IMAGEN
+
+    salida = None
+    if isinstance(config, dict):
+        salida = config.get("max_output_tokens")
+    return total + (salida or TOKENS_SALIDA_ESTIMADOS)
+
+
+def es_reintentable(error: Exception) -> bool:
+    if isinstance(error, errors.APIError):
+        return error.code in CODIGOS_REINTENTABLES
+    return isinstance(error, (httpx.TimeoutException, httpx.NetworkError))
+
+
+def es_cuota_agotada(error: Exception) -> bool:
+    """True si el error, o alguna de sus causas, es un 429 de la API."""
+    while error is not None:
+        if isinstance(error, errors.APIError) and error.code == 429:
+            return True
+        error = error.__cause__
+    return False
+
+
+# =========================
+# PLANIFICADOR
+# =========================
+class Planificador:
+    """
+    Cola de peticiones al modelo de una API Key.
+
+    - Cubetas de RPM y TPM: una petición solo sale si hay cuota.
+    - Reparto justo: los usuarios con peticiones pendientes se atienden
+      por turnos (una petición de cada uno por ronda), así un lote grande
+      no deja esperando a los usuarios interactivos.
+    - Reintentos con espera exponencial y jitter ante 429 y 5xx. Un 429
+      vacía la cubeta de RPM para que el resto de la cola también frene.
+    - Límite de peticiones simultáneas, dentro de la misma cola: una
+      plaza libre es parte de la admisión, así que con la concurrencia
+      como límite también se respetan los turnos.
+    """
+
+    def __init__(self, rpm: float = None, tpm: float = None, max_simultaneas: int = None):
+        self._rpm = _Cubeta(GEMINI_RPM if rpm is None else rpm)
+        self._tpm = _Cubeta(GEMINI_TPM if tpm is None else tpm)
+        self._max_simultaneas = max(MAX_PETICIONES_POR_CLAVE if max_simultaneas is None else max_simultaneas, 1)
+        self._cond = threading.Condition()
+        self._colas = {}
+        self._turnos = deque()
+        self._metricas = {
+            "peticiones": 0,
+            "completadas": 0,
+            "fallidas": 0,
+            "reintentos": 0,
+            "limites_429": 0,
+            "rechazadas_por_espera": 0,
+            "en_cola": 0,
+            "max_en_cola": 0,
+            "en_curso": 0,
+            "espera_total_s": 0.0,
+            "espera_max_s": 0.0,
+        }
+
+    # ---------- Admisión ----------
+    def _admitir(self, usuario, tokens: int):
+        ticket = object()
+        inicio = time.monotonic()
+        concedido = False
+
+        with self._cond:
+            cola = self._colas.setdefault(usuario, deque())
+            cola.append(ticket)
+            if usuario not in self._turnos:
+                self._turnos.append(usuario)
+            self._metricas["en_cola"] += 1
+            self._metricas["max_en_cola"] = max(self._metricas["max_en_cola"], self._metricas["en_cola"])
+
+            try:
+                while True:
+                    restante = MAX_ESPERA_COLA_SEGUNDOS - (time.monotonic() - inicio)
+
+                    espera = restante
+                    if (
+                        self._turnos[0] == usuario
+                        and cola[0] is ticket
+                        and self._metricas["en_curso"] < self._max_simultaneas
+                    ):
+                        espera = max(self._rpm.espera(1), self._tpm.espera(tokens))
+                        if espera <= 0:
+                            self._rpm.consumir(1)
+                            self._tpm.consumir(tokens)
+                            self._metricas["en_curso"] += 1
+                            concedido = True
+                            break
+                    # Si no es su turno o no hay plaza libre, duerme hasta
+                    # que cambie (notify_all en _admitir y _liberar)
+
+                    if restante <= 0 or espera > restante:
+                        self._metricas["rechazadas_por_espera"] += 1
+                        raise ServicioSaturadoError(
+                            "❌ Hay demasiadas peticiones en cola. Inténtalo de nuevo en unos minutos."
+                        )
+                    self._cond.wait(espera)
+            finally:
+                cola.remove(ticket)
+                if concedido:
+                    # Al final de la ronda si le quedan peticiones
+                    self._turnos.popleft()
+                    if cola:
+                        self._turnos.append(usuario)
+                elif not cola:
+                    self._turnos.remove(usuario)
+                if not cola:
+                    del self._colas[usuario]
+
+                esperado = time.monotonic() - inicio
+                self._metricas["en_cola"] -= 1
+                self._metricas["espera_total_s"] += esperado
+                self._metricas["espera_max_s"] = max(self._metricas["espera_max_s"], esperado)
+                self._cond.notify_all()
+
+    def _liberar(self):
+        # Devuelve la plaza tomada en _admitir
+        with self._cond:
+            self._metricas["en_curso"] -= 1
+            self._cond.notify_all()
+
+    def _sumar(self, nombre: str, cantidad=1):
+        with self._cond:
+            self._metricas[nombre] += cantidad
+
+    def _antes_de_reintentar(self, estado):
+        self._sumar("reintentos")
+
+    # ---------- Ejecución ----------
+    def _reintentos(self, intentos: int = None) -> Retrying:
+        return Retrying(
+            retry=retry_if_exception(es_reintentable),
+            wait=wait_random_exponential(multiplier=ESPERA_BASE_SEGUNDOS, max=ESPERA_MAXIMA_SEGUNDOS),
+            stop=stop_after_attempt(max(MAX_INTENTOS if intentos is None else intentos, 1)),
+            before_sleep=self._antes_de_reintentar,
+            reraise=True,
+        )
+
+    def _llamar(self, funcion):
+        try:
+            return funcion()
+        except errors.APIError as e:
+            if e.code == 429:
+                # Cuota agotada: frena también al resto de la cola
+                self._sumar("limites_429")
+                with self._cond:
+                    self._rpm.vaciar()
+            raise
+
+    def ejecutar(self, funcion, tokens: int = 0, intentos: int = None):
+        """
+        Ejecuta funcion() cuando le toca según la cuota y el reparto entre
+        usuarios, reintentando ante errores transitorios.
+
+        :param funcion: Llamada al modelo sin argumentos
+        :param tokens: Tokens estimados de la petición (ver estimar_tokens)
+        :param intentos: Máximo de intentos (por defecto, MAX_INTENTOS)
+        """
+        usuario = usuario_actual.get()
+        self._sumar("peticiones")
+
+        try:
+            for intento in self._reintentos(intentos):
+                with intento:
+                    self._admitir(usuario, tokens)
+                    try:
+                        resultado = self._llamar(funcion)
+                    finally:
+                        self._liberar()
+        except Exception:
+            self._sumar("fallidas")
+            raise
+
+        self._sumar("completadas")
+        self._ajustar_tokens(resultado, tokens)
+        return resultado
+
+    def ejecutar_stream(self, abrir, tokens: int = 0):
+        """
+        Como ejecutar(), para respuestas en streaming: abrir() devuelve el
+        iterador de fragmentos. Solo se reintenta hasta recibir el primer
+        fragmento; después, un error llega tal cual a quien consume.
+        """
+        usuario = usuario_actual.get()
+        self._sumar("peticiones")
+
+        def primer_fragmento():
+            iterador = iter(abrir())
+            return iterador, next(iterador, _FIN)
+
+        try:
+            for intento in self._reintentos():
+                with intento:
+                    self._admitir(usuario, tokens)
+                    try:
+                        iterador, primero = self._llamar(primer_fragmento)
+                    except BaseException:
+                        self._liberar()
+                        raise
+        except Exception:
+            self._sumar("fallidas")
+            raise
+
+        try:
+            if primero is not _FIN:
+                yield primero
+                yield from iterador
+        except Exception:
+            self._sumar("fallidas")
+            raise
+        else:
+            self._sumar("completadas")
+        finally:
+            self._liberar()
+
+    def _ajustar_tokens(self, respuesta, estimados: int):
+        # Con el uso real de la respuesta se corrige la estimación
+        uso = getattr(respuesta, "usage_metadata", None)
+        reales = getattr(uso, "total_token_count", None)
+        if isinstance(reales, int):
+            with self._cond:
+                self._tpm.consumir(reales - estimados)
+
+    # ---------- Métricas ----------
+    def estadisticas(self) -> dict:
+        with self._cond:
+            datos = dict(self._metricas)
+            datos["en_cola_por_usuario"] = {u: len(c) for u, c in self._colas.items()}
+            datos["rpm_disponible"] = self._rpm.tokens
+            datos["tpm_disponible"] = self._tpm.tokens
+
+        admitidas = datos["completadas"] + datos["fallidas"]
+        datos["espera_media_s"] = datos["espera_total_s"] / admitidas if admitidas else 0.0
+        return datos
+
+
+# =========================
+# PLANIFICADOR POR CLAVE
+# =========================
+def obtener_planificador(api_key: str) -> Planificador:
+    """Planificador compartido por todas las sesiones que usan esa API Key."""
+    clave = hashlib.sha256(api_key.encode("utf-8")).hexdigest()
+
+    with _lock:
+        planificador = _planificadores.get(clave)
+        if planificador is None:
+            planificador = Planificador()
+            _planificadores[clave] = planificador
+        return planificador
+
+
+def estadisticas_planificador() -> dict:
+    """Métricas sumadas de todas las API Keys (cola, esperas, reintentos...)."""
+    with _lock:
+        planificadores = list(_planificadores.values())
+
+    total = {}
+    for planificador in planificadores:
+        for nombre, valor in planificador.estadisticas().items():
+            if nombre == "en_cola_por_usuario":
+                destino = total.setdefault(nombre, {})
+                for usuario, cantidad in valor.items():
+                    destino[usuario] = destino.get(usuario, 0) + cantidad
+            elif nombre.endswith("_max_s") or nombre.startswith("max_"):
+                total[nombre] = max(total.get(nombre, 0), valor)
+            else:
+                total[nombre] = total.get(nombre, 0) + valor
+
+    total.setdefault("en_cola_por_usuario", {})
+    completadas = total.get("completadas", 0) + total.get("fallidas", 0)
+    total["espera_media_s"] = total.get("espera_total_s", 0.0) / completadas if completadas else 0.0
+    return total
@@ -0,0 +1,268 @@
+import io
+import threading
+import time
+import tracemalloc
+
+from google.genai import types
+from PIL import Image, ImageOps
+
+MAX_IMAGE_SIZE_MB = 5
+
+# =========================
+# Perfiles por tarea
+# =========================
+# max_lado: lado mayor permitido (px). El OCR conserva resolución para
+# que el texto pequeño siga siendo legible; el resto se reduce.
+# max_bytes_directo: por debajo de este tamaño se envía el archivo original
+# sin recodificar (si el formato y las dimensiones ya son válidos).
+PERFILES = {
+    "ocr": {"max_lado": 3072, "calidad": 92, "max_bytes_directo": 4 * 1024 * 1024},
+    "descripcion": {"max_lado": 1536, "calidad": 85, "max_bytes_directo": 1024 * 1024},
+    "analisis": {"max_lado": 2048, "calidad": 88, "max_bytes_directo": 1536 * 1024},
+    "social": {"max_lado": 1024, "calidad": 82, "max_bytes_directo": 768 * 1024},
+}
+
+LADO_MINIATURA = 320
+CALIDAD_MINIATURA = 75
+
+FORMATOS_DIRECTOS = {
+    "JPEG": "image/jpeg",
+    "PNG": "image/png",
+    "WEBP": "image/webp",
+}
+
+_lock = threading.Lock()
+_estadisticas = {
+    "imagenes": 0,
+    "directas": 0,
+    "bytes_originales": 0,
+    "bytes_enviados": 0,
+    "ms_codificacion": 0.0,
+}
+
+
+# =========================
+# LEER Y VALIDAR SUBIDA
+# =========================
+def leer_imagen(imagen_subida) -> memoryview:
+    """
+    Valida el tamaño máximo y devuelve una vista de los bytes originales.
+
+    Si la subida es un buffer en memoria (el UploadedFile de Streamlit es
+    un BytesIO) la vista apunta a sus bytes y no se copia nada. Deja el
+    puntero del archivo al principio.
+    """
+    imagen_subida.seek(0, io.SEEK_END)
+    size_mb = imagen_subida.tell() / (1024 * 1024)
+    imagen_subida.seek(0)
+
+    if size_mb > MAX_IMAGE_SIZE_MB:
+        raise ValueError(
+            f"❌ La imagen pesa {size_mb:.2f} MB. "
+            f"El máximo permitido es {MAX_IMAGE_SIZE_MB} MB."
+        )
+
+    if hasattr(imagen_subida, "getvalue"):
+        # BytesIO comparte el bytes con el que se creó mientras no se
+        # escriba en él: getvalue() lo devuelve sin copiar (getbuffer() sí
+        # forzaría la copia).
+        return memoryview(imagen_subida.getvalue())
+
+    datos = imagen_subida.read()
+    imagen_subida.seek(0)
+    return memoryview(datos)
+
+
+class _LectorMemoria(io.RawIOBase):
+    """Archivo de solo lectura sobre un memoryview, sin copiarlo entero."""
+
+    def __init__(self, vista):
+        self._vista = memoryview(vista)
+        self._pos = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def readinto(self, destino):
+        n = max(min(len(destino), len(self._vista) - self._pos), 0)
+        destino[:n] = self._vista[self._pos:self._pos + n]
+        self._pos += n
+        return n
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self._pos
+        elif whence == io.SEEK_END:
+            offset += len(self._vista)
+        self._pos = max(offset, 0)
+        return self._pos
+
+    def tell(self):
+        return self._pos
+
+
+# =========================
+# PREPARAR IMAGEN PARA GEMINI
+# =========================
+def preparar_imagen(imagen_bytes, tarea: str = "descripcion") -> dict:
+    """
+    Prepara una imagen para enviarla al modelo según el perfil de la tarea.
+
+    Corrige la orientación EXIF, reduce la resolución si supera el perfil
+    y elige la codificación: el archivo original si ya es válido, JPEG para
+    fotos o WebP si la imagen tiene transparencia.
+
+    :param imagen_bytes: Bytes (o memoryview) originales de la imagen
+    :param tarea: "ocr", "descripcion", "analisis" o "social"
+    :return: Diccionario con datos, mime_type, codificacion, dimensiones,
+             bytes_originales, bytes_enviados y ms_codificacion
+    """
+    perfil = PERFILES.get(tarea, PERFILES["descripcion"])
+    inicio = time.perf_counter()
+
+    image = Image.open(_LectorMemoria(imagen_bytes))
+    formato = image.format
+    orientacion = image.getexif().get(0x0112, 1)
+
+    directo = (
+        formato in FORMATOS_DIRECTOS
+        and orientacion == 1
+        and max(image.size) <= perfil["max_lado"]
+    )
+
+    if directo and len(imagen_bytes) <= perfil["max_bytes_directo"]:
+        resultado = _resultado(
+            imagen_bytes, FORMATOS_DIRECTOS[formato], "original", image.size,
+            len(imagen_bytes), inicio
+        )
+        _registrar(resultado)
+        return resultado
+
+    # =========================
+    # Recodificar
+    # =========================
+    image = ImageOps.exif_transpose(image)
+    image.thumbnail((perfil["max_lado"], perfil["max_lado"]), Image.Resampling.LANCZOS)
+
+    buffer = io.BytesIO()
+    if image.mode in ("RGBA", "LA") or "transparency" in image.info:
+        image.save(buffer, format="WEBP", quality=perfil["calidad"], method=4)
+        mime_type, codificacion = "image/webp", "webp"
+    else:
+        image.convert("RGB").save(
+            buffer, format="JPEG", quality=perfil["calidad"], optimize=True
+        )
+        mime_type, codificacion = "image/jpeg", "jpeg"
+    datos = buffer.getvalue()
+
+    # Si recodificar no ahorra nada, se envía el original
+    if directo and len(datos) >= len(imagen_bytes):
+        datos, mime_type, codificacion = imagen_bytes, FORMATOS_DIRECTOS[formato], "original"
+
+    resultado = _resultado(datos, mime_type, codificacion, image.size, len(imagen_bytes), inicio)
+    _registrar(resultado)
+    return resultado
+
+
+def parte_imagen(preparada: dict) -> types.Part:
+    """
+    Construye la parte de imagen para el SDK directamente con los bytes,
+    sin pasar por una cadena base64 intermedia.
+    """
+    datos = preparada["datos"]
+    if isinstance(datos, memoryview):
+        if isinstance(datos.obj, bytes) and datos.nbytes == len(datos.obj):
+            datos = datos.obj
+        else:
+            datos = bytes(datos)
+    return types.Part.from_bytes(data=datos, mime_type=preparada["mime_type"])
+
+
+# =========================
+# MINIATURAS
+# =========================
+def crear_miniatura(imagen_bytes, lado: int = LADO_MINIATURA) -> bytes:
+    """
+    Genera una miniatura WebP (lado mayor = `lado` px) para la galería y
+    las vistas previas. Con JPEG se decodifica ya reducida (draft), sin
+    cargar la imagen a resolución completa.
+
+    :return: Bytes WebP o None si la imagen no se puede abrir
+    """
+    try:
+        image = Image.open(_LectorMemoria(imagen_bytes))
+        image.draft("RGB", (lado, lado))
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((lado, lado), Image.Resampling.LANCZOS)
+
+        if image.mode not in ("RGB", "RGBA"):
+            con_alfa = image.mode in ("LA", "PA") or "transparency" in image.info
+            image = image.convert("RGBA" if con_alfa else "RGB")
+
+        buffer = io.BytesIO()
+        image.save(buffer, format="WEBP", quality=CALIDAD_MINIATURA, method=4)
+        return buffer.getvalue()
+    except (OSError, ValueError, Image.DecompressionBombError):
+        return None
+
+
+def _resultado(datos, mime_type, codificacion, dimensiones, bytes_originales, inicio) -> dict:
+    return {
+        "datos": datos,
+        "mime_type": mime_type,
+        "codificacion": codificacion,
+        "ancho": dimensiones[0],
+        "alto": dimensiones[1],
+        "bytes_originales": bytes_originales,
+        "bytes_enviados": len(datos),
+        "ms_codificacion": (time.perf_counter() - inicio) * 1000,
+    }
+
+
+def _registrar(resultado: dict):
+    with _lock:
+        _estadisticas["imagenes"] += 1
+        if resultado["codificacion"] == "original":
+            _estadisticas["directas"] += 1
+        _estadisticas["bytes_originales"] += resultado["bytes_originales"]
+        _estadisticas["bytes_enviados"] += resultado["bytes_enviados"]
+        _estadisticas["ms_codificacion"] += resultado["ms_codificacion"]
+
+
+def estadisticas_preparacion() -> dict:
+    """
+    Totales del proceso: imágenes preparadas, enviadas sin recodificar,
+    bytes antes/después y tiempo de codificación acumulado.
+    """
+    with _lock:
+        datos = dict(_estadisticas)
+
+    datos["ahorro_bytes"] = datos["bytes_originales"] - datos["bytes_enviados"]
+    return datos
+
+
+# =========================
+# MEDICIÓN DE MEMORIA
+# =========================
+def medir_memoria_pico(funcion, *args, **kwargs):
+    """
+    Ejecuta la función y devuelve (resultado, pico_bytes): el máximo de
+    memoria reservada por Python durante la llamada (tracemalloc).
+    """
+    ya_activo = tracemalloc.is_tracing()
+    if not ya_activo:
+        tracemalloc.start()
+    tracemalloc.reset_peak()
+    base = tracemalloc.get_traced_memory()[0]
+
+    try:
+        resultado = funcion(*args, **kwargs)
+        pico = tracemalloc.get_traced_memory()[1] - base
+    finally:
+        if not ya_activo:
+            tracemalloc.stop()
+
+    return resultado, pico
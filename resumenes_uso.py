@@ -0,0 +1,183 @@
+"""
+Tablas de resumen de uso por usuario y por usuario y día, mantenidas por
+triggers sobre `imagenes` (cualquier INSERT, DELETE o cambio de texto o
+tipo las actualiza en la misma transacción).
+
+Para reconstruirlas desde cero:
+
+    python -m utils.resumenes_uso reconstruir [ruta/users.db]
+"""
+import argparse
+
+from utils.conexion_db import transaccion
+
+DB_NAME = "users.db"
+
+# Tipos con contador propio (los de gallery.TIPOS_RESULTADO). Fijos aquí:
+# forman parte del esquema creado por la migración.
+TIPOS_RESUMEN = ("ocr", "descripcion", "analisis", "social")
+
+# Día de la fila: filas antiguas sin la columna dia rellena
+_DIA = "COALESCE({f}.dia, substr({f}.fecha_subida, 1, 10))"
+
+
+def _columnas_tipo() -> str:
+    return ",\n".join(f"n_{tipo} INTEGER NOT NULL DEFAULT 0" for tipo in TIPOS_RESUMEN)
+
+
+# =========================
+# SQL DE LOS TRIGGERS
+# =========================
+def _sumar(fila: str) -> str:
+    # Suma la fila (NEW) a los dos resúmenes
+    tipos = ", ".join(f"n_{t}" for t in TIPOS_RESUMEN)
+    valores_tipo = ", ".join(f"{fila}.tipo = '{t}'" for t in TIPOS_RESUMEN)
+    sumas_tipo = ", ".join(f"n_{t} = n_{t} + excluded.n_{t}" for t in TIPOS_RESUMEN)
+    return f"""
+        INSERT INTO uso_usuario
+            (usuario_id, total_imagenes, caracteres_texto, {tipos}, primera_actividad, ultima_actividad)
+        VALUES
+            ({fila}.usuario_id, 1, COALESCE(length({fila}.texto_original), 0), {valores_tipo},
+             {fila}.fecha_subida, {fila}.fecha_subida)
+        ON CONFLICT(usuario_id) DO UPDATE SET
+            total_imagenes = total_imagenes + 1,
+            caracteres_texto = caracteres_texto + excluded.caracteres_texto,
+            {sumas_tipo},
+            primera_actividad = MIN(COALESCE(primera_actividad, excluded.primera_actividad), excluded.primera_actividad),
+            ultima_actividad = MAX(COALESCE(ultima_actividad, excluded.ultima_actividad), excluded.ultima_actividad);
+
+        INSERT INTO uso_usuario_dia
+            (usuario_id, dia, total_imagenes, caracteres_texto, {tipos})
+        VALUES
+            ({fila}.usuario_id, {_DIA.format(f=fila)}, 1, COALESCE(length({fila}.texto_original), 0), {valores_tipo})
+        ON CONFLICT(usuario_id, dia) DO UPDATE SET
+            total_imagenes = total_imagenes + 1,
+            caracteres_texto = caracteres_texto + excluded.caracteres_texto,
+            {sumas_tipo};
+    """
+
+
+def _restar(fila: str) -> str:
+    # Resta la fila (OLD) de los dos resúmenes. Primera y última actividad
+    # solo se recalculan si la fila era la primera o la última: con el
+    # índice (usuario_id, fecha_subida) es una búsqueda, no un recorrido.
+    restas_tipo = ", ".join(f"n_{t} = n_{t} - ({fila}.tipo = '{t}')" for t in TIPOS_RESUMEN)
+    return f"""
+        UPDATE uso_usuario SET
+            total_imagenes = total_imagenes - 1,
+            caracteres_texto = caracteres_texto - COALESCE(length({fila}.texto_original), 0),
+            {restas_tipo},
+            primera_actividad = CASE WHEN {fila}.fecha_subida <= primera_actividad
+                THEN (SELECT MIN(fecha_subida) FROM imagenes WHERE usuario_id = {fila}.usuario_id)
+                ELSE primera_actividad END,
+            ultima_actividad = CASE WHEN {fila}.fecha_subida >= ultima_actividad
+                THEN (SELECT MAX(fecha_subida) FROM imagenes WHERE usuario_id = {fila}.usuario_id)
+                ELSE ultima_actividad END
+        WHERE usuario_id = {fila}.usuario_id;
+
+        DELETE FROM uso_usuario
+        WHERE usuario_id = {fila}.usuario_id AND total_imagenes <= 0;
+
+        UPDATE uso_usuario_dia SET
+            total_imagenes = total_imagenes - 1,
+            caracteres_texto = caracteres_texto - COALESCE(length({fila}.texto_original), 0),
+            {restas_tipo}
+        WHERE usuario_id = {fila}.usuario_id AND dia = {_DIA.format(f=fila)};
+
+        DELETE FROM uso_usuario_dia
+        WHERE usuario_id = {fila}.usuario_id AND dia = {_DIA.format(f=fila)} AND total_imagenes <= 0;
+    """
+
+
+# =========================
+# CREAR Y RECONSTRUIR
+# =========================
+def crear_resumenes(conn):
+    """Crea las tablas de resumen y sus triggers (lo usa la migración 8)."""
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS uso_usuario (
+            usuario_id INTEGER PRIMARY KEY,
+            total_imagenes INTEGER NOT NULL DEFAULT 0,
+            caracteres_texto INTEGER NOT NULL DEFAULT 0,
+            {_columnas_tipo()},
+            primera_actividad TEXT,
+            ultima_actividad TEXT
+        )
+    """)
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS uso_usuario_dia (
+            usuario_id INTEGER NOT NULL,
+            dia TEXT NOT NULL,
+            total_imagenes INTEGER NOT NULL DEFAULT 0,
+            caracteres_texto INTEGER NOT NULL DEFAULT 0,
+            {_columnas_tipo()},
+            PRIMARY KEY (usuario_id, dia)
+        ) WITHOUT ROWID
+    """)
+
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_imagenes_uso_insertar
+        AFTER INSERT ON imagenes
+        BEGIN {_sumar("NEW")} END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_imagenes_uso_eliminar
+        AFTER DELETE ON imagenes
+        BEGIN {_restar("OLD")} END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_imagenes_uso_actualizar
+        AFTER UPDATE OF usuario_id, tipo, texto_original, fecha_subida, dia ON imagenes
+        BEGIN {_restar("OLD")} {_sumar("NEW")} END
+    """)
+
+    rellenar_resumenes(conn)
+
+
+def rellenar_resumenes(conn):
+    """Vacía las tablas de resumen y las calcula de nuevo desde `imagenes`."""
+    tipos = ", ".join(f"n_{t}" for t in TIPOS_RESUMEN)
+    sumas_tipo = ", ".join(f"SUM(tipo = '{t}')" for t in TIPOS_RESUMEN)
+
+    conn.execute("DELETE FROM uso_usuario")
+    conn.execute("DELETE FROM uso_usuario_dia")
+    conn.execute(f"""
+        INSERT INTO uso_usuario
+            (usuario_id, total_imagenes, caracteres_texto, {tipos}, primera_actividad, ultima_actividad)
+        SELECT usuario_id, COUNT(*), SUM(COALESCE(length(texto_original), 0)), {sumas_tipo},
+               MIN(fecha_subida), MAX(fecha_subida)
+        FROM imagenes
+        GROUP BY usuario_id
+    """)
+    conn.execute(f"""
+        INSERT INTO uso_usuario_dia
+            (usuario_id, dia, total_imagenes, caracteres_texto, {tipos})
+        SELECT usuario_id, {_DIA.format(f="imagenes")}, COUNT(*),
+               SUM(COALESCE(length(texto_original), 0)), {sumas_tipo}
+        FROM imagenes
+        GROUP BY usuario_id, {_DIA.format(f="imagenes")}
+    """)
+
+
+def reconstruir_resumenes(db_name: str = DB_NAME):
+    """Reconstruye los resúmenes de uso en una transacción (bloquea escrituras)."""
+    with transaccion(db_name) as conn:
+        rellenar_resumenes(conn)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Resúmenes de uso de AI Content Studio")
+    subparsers = parser.add_subparsers(dest="orden", required=True)
+
+    reconstruir = subparsers.add_parser("reconstruir", help="Recalcula los resúmenes desde la tabla imagenes")
+    reconstruir.add_argument("db", nargs="?", default=DB_NAME, help="Ruta de la base de datos")
+
+    args = parser.parse_args()
+
+    if args.orden == "reconstruir":
+        reconstruir_resumenes(args.db)
+        print(f"✅ Resúmenes de uso reconstruidos en {args.db}")
+
+
+if __name__ == "__main__":
+    main()
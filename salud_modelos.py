@@ -0,0 +1,266 @@
+import contextvars
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+from google.genai import errors
+
+from utils.gemini_client import generar_contenido
+from utils.planificador import ServicioSaturadoError, es_cuota_agotada
+
+# =========================
+# Configuración de los circuitos
+# =========================
+# Fallos seguidos que abren el circuito de un modelo
+FALLOS_PARA_ABRIR = int(os.getenv("GEMINI_FALLOS_PARA_ABRIR", "3"))
+# Tiempo con el circuito abierto antes de dejar pasar una prueba
+SEGUNDOS_CIRCUITO_ABIERTO = float(os.getenv("GEMINI_SEGUNDOS_CIRCUITO_ABIERTO", "60"))
+# Un modelo que no existe (404) no va a volver en un minuto
+SEGUNDOS_MODELO_INEXISTENTE = float(os.getenv("GEMINI_SEGUNDOS_MODELO_INEXISTENTE", "21600"))
+# Tras pasar a un modelo de respaldo, se empieza por él durante este tiempo
+SEGUNDOS_ULTIMO_BUENO = float(os.getenv("GEMINI_SEGUNDOS_ULTIMO_BUENO", "60"))
+
+# Peticiones de cobertura: si el modelo tarda más que su percentil de
+# latencia, se lanza la misma petición al siguiente modelo sano y se
+# usa la primera respuesta
+COBERTURA_ACTIVA = os.getenv("GEMINI_COBERTURA_ACTIVA", "0") == "1"
+PERCENTIL_COBERTURA = float(os.getenv("GEMINI_PERCENTIL_COBERTURA", "0.95"))
+MIN_MUESTRAS_COBERTURA = 10
+# Intentos por modelo dentro de una cadena: ante un error se pasa al
+# siguiente modelo en vez de reintentar el mismo
+INTENTOS_POR_MODELO = int(os.getenv("GEMINI_INTENTOS_POR_MODELO", "1"))
+MUESTRAS_LATENCIA = 100
+
+CERRADO = "cerrado"
+ABIERTO = "abierto"
+SEMIABIERTO = "semiabierto"
+
+_modelos = {}
+_ultimo_bueno = {}
+_lock = threading.Lock()
+
+
+class _SaludModelo:
+    def __init__(self):
+        self.estado = CERRADO
+        self.fallos_seguidos = 0
+        self.abierto_hasta = 0.0
+        self.prueba_en_curso = False
+        self.exitos = 0
+        self.fallos = 0
+        self.ultimo_error = None
+        self.latencias = deque(maxlen=MUESTRAS_LATENCIA)
+
+
+def _salud(modelo: str) -> _SaludModelo:
+    # Llamar con _lock tomado
+    salud = _modelos.get(modelo)
+    if salud is None:
+        salud = _SaludModelo()
+        _modelos[modelo] = salud
+    return salud
+
+
+# =========================
+# CIRCUITOS
+# =========================
+def modelo_disponible(modelo: str) -> bool:
+    """
+    True si se puede llamar al modelo. Con el circuito abierto, pasado
+    SEGUNDOS_CIRCUITO_ABIERTO deja pasar una sola petición de prueba
+    (semiabierto); el resto sigue esperando a su resultado.
+    """
+    with _lock:
+        salud = _salud(modelo)
+        if salud.estado == CERRADO:
+            return True
+        if salud.estado == ABIERTO and time.monotonic() >= salud.abierto_hasta:
+            salud.estado = SEMIABIERTO
+        if salud.estado == SEMIABIERTO and not salud.prueba_en_curso:
+            salud.prueba_en_curso = True
+            return True
+        return False
+
+
+def registrar_exito(modelo: str, segundos: float):
+    with _lock:
+        salud = _salud(modelo)
+        salud.estado = CERRADO
+        salud.fallos_seguidos = 0
+        salud.prueba_en_curso = False
+        salud.exitos += 1
+        salud.latencias.append(segundos)
+
+
+def registrar_fallo(modelo: str, error: Exception):
+    with _lock:
+        salud = _salud(modelo)
+        salud.fallos += 1
+        salud.fallos_seguidos += 1
+        salud.ultimo_error = str(error)[:200]
+
+        inexistente = isinstance(error, errors.APIError) and error.code == 404
+        if inexistente or salud.estado == SEMIABIERTO or salud.fallos_seguidos >= FALLOS_PARA_ABRIR:
+            salud.estado = ABIERTO
+            salud.abierto_hasta = time.monotonic() + (
+                SEGUNDOS_MODELO_INEXISTENTE if inexistente else SEGUNDOS_CIRCUITO_ABIERTO
+            )
+        salud.prueba_en_curso = False
+
+
+def percentil_latencia(modelo: str, percentil: float = PERCENTIL_COBERTURA):
+    """Latencia (s) del percentil indicado, o None si hay pocas muestras."""
+    with _lock:
+        latencias = sorted(_salud(modelo).latencias)
+
+    if len(latencias) < MIN_MUESTRAS_COBERTURA:
+        return None
+    return latencias[min(int(len(latencias) * percentil), len(latencias) - 1)]
+
+
+def estado_modelos() -> dict:
+    """Estado del circuito, contadores y p95 de cada modelo usado."""
+    with _lock:
+        nombres = list(_modelos)
+        datos = {
+            nombre: {
+                "estado": salud.estado,
+                "fallos_seguidos": salud.fallos_seguidos,
+                "exitos": salud.exitos,
+                "fallos": salud.fallos,
+                "ultimo_error": salud.ultimo_error,
+            }
+            for nombre, salud in _modelos.items()
+        }
+        ultimo_bueno = {cadena: modelo for cadena, (modelo, _) in _ultimo_bueno.items()}
+
+    for nombre in nombres:
+        datos[nombre]["latencia_p95_s"] = percentil_latencia(nombre, 0.95)
+    return {"modelos": datos, "ultimo_bueno": ultimo_bueno}
+
+
+# =========================
+# LLAMADA CON RESPALDO
+# =========================
+def _orden_modelos(cadena: str, modelos: list) -> list:
+    with _lock:
+        ultimo, hasta = _ultimo_bueno.get(cadena, (None, 0.0))
+    if ultimo in modelos and time.monotonic() < hasta:
+        return [ultimo] + [m for m in modelos if m != ultimo]
+    return list(modelos)
+
+
+def _recordar_ultimo_bueno(cadena: str, modelo: str, preferido: str):
+    with _lock:
+        if modelo == preferido:
+            _ultimo_bueno.pop(cadena, None)
+        else:
+            # Pasado el plazo se vuelve a probar el orden preferido
+            _ultimo_bueno[cadena] = (modelo, time.monotonic() + SEGUNDOS_ULTIMO_BUENO)
+
+
+def _llamar(api_key: str, modelo: str, contenidos, config):
+    inicio = time.perf_counter()
+    try:
+        respuesta = generar_contenido(api_key, modelo, contenidos, config=config, intentos=INTENTOS_POR_MODELO)
+    except ServicioSaturadoError:
+        # La cola propia no dice nada de la salud del modelo
+        with _lock:
+            _salud(modelo).prueba_en_curso = False
+        raise
+    except Exception as e:
+        if es_cuota_agotada(e):
+            # Un 429 es falta de cuota, no un modelo caído: no abre el circuito
+            with _lock:
+                _salud(modelo).prueba_en_curso = False
+        else:
+            registrar_fallo(modelo, e)
+        raise
+    registrar_exito(modelo, time.perf_counter() - inicio)
+    return respuesta
+
+
+def generar_con_respaldo(api_key: str, modelos: list, contenidos, config=None, cadena: str = None):
+    """
+    generate_content() con el primer modelo sano de la lista.
+
+    Se salta los modelos con el circuito abierto, así que un modelo caído
+    no se vuelve a probar en cada petición, y tras un cambio de modelo
+    empieza durante SEGUNDOS_ULTIMO_BUENO por el último que respondió
+    bien. Los errores de cuota (429) pasan al siguiente modelo sin contar
+    como fallo del circuito. Con COBERTURA_ACTIVA, si el modelo tarda más
+    que su percentil de latencia se lanza también el siguiente modelo
+    sano y gana la primera respuesta.
+
+    :param cadena: Nombre de la cadena de respaldo (por defecto, el primer modelo)
+    :return: (modelo usado, respuesta)
+    """
+    cadena = cadena or modelos[0]
+    candidatos = _orden_modelos(cadena, modelos)
+    ultimo_error = None
+
+    while candidatos:
+        modelo = candidatos.pop(0)
+        if not modelo_disponible(modelo):
+            continue
+
+        try:
+            if COBERTURA_ACTIVA:
+                modelo, respuesta = _llamar_con_cobertura(api_key, modelo, candidatos, contenidos, config)
+            else:
+                respuesta = _llamar(api_key, modelo, contenidos, config)
+        except ServicioSaturadoError:
+            raise
+        except Exception as e:
+            ultimo_error = e
+            continue
+
+        _recordar_ultimo_bueno(cadena, modelo, modelos[0])
+        return modelo, respuesta
+
+    if ultimo_error is not None:
+        raise RuntimeError(
+            f"❌ No se pudo generar contenido con ningún modelo disponible: {ultimo_error}"
+        ) from ultimo_error
+    raise RuntimeError("❌ Todos los modelos de respaldo están marcados como no disponibles")
+
+
+def _llamar_con_cobertura(api_key: str, modelo: str, candidatos: list, contenidos, config):
+    limite = percentil_latencia(modelo)
+    if limite is None:
+        return modelo, _llamar(api_key, modelo, contenidos, config)
+
+    ejecutor = ThreadPoolExecutor(max_workers=2)
+    try:
+        principal = ejecutor.submit(
+            contextvars.copy_context().run, _llamar, api_key, modelo, contenidos, config
+        )
+        hecho, _ = wait([principal], timeout=limite)
+        if hecho:
+            return modelo, principal.result()
+
+        respaldo = next((m for m in candidatos if modelo_disponible(m)), None)
+        if respaldo is None:
+            return modelo, principal.result()
+        candidatos.remove(respaldo)
+
+        futuros = {
+            principal: modelo,
+            ejecutor.submit(
+                contextvars.copy_context().run, _llamar, api_key, respaldo, contenidos, config
+            ): respaldo,
+        }
+        pendientes = set(futuros)
+        error = None
+        while pendientes:
+            hechos, pendientes = wait(pendientes, return_when=FIRST_COMPLETED)
+            for futuro in hechos:
+                if futuro.exception() is None:
+                    return futuros[futuro], futuro.result()
+                error = futuro.exception()
+        raise error
+    finally:
+        # No espera a la petición perdedora
+        ejecutor.shutdown(wait=False)
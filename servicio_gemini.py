@@ -0,0 +1,113 @@
+import asyncio
+import io
+import os
+import time
+
+from utils.gemini_vision import extraer_texto_imagen
+from utils.assistant import describir_imagen, analizar_imagen_avanzado
+from utils.social_content import generar_contenido_redes
+from utils.procesado_imagen import leer_imagen
+
+# Peticiones al modelo en curso a la vez por cada análisis
+MAX_TAREAS_SIMULTANEAS = int(os.getenv("GEMINI_MAX_TAREAS_SIMULTANEAS", "4"))
+
+# =========================
+# Tareas disponibles
+# =========================
+# Cada tarea: (función, opciones por defecto). Todas reciben
+# (imagen_subida, api_key, **opciones).
+TAREAS = {
+    "ocr": (extraer_texto_imagen, {}),
+    "descripcion": (describir_imagen, {"nivel_detalle": "normal"}),
+    "analisis": (analizar_imagen_avanzado, {"tipo_analisis": "general"}),
+    "social": (generar_contenido_redes, {"estilo": "profesional", "plataforma": "instagram"}),
+}
+
+
+def _ejecutar_tarea(tarea: str, imagen_bytes: bytes, api_key: str, opciones: dict):
+    funcion, por_defecto = TAREAS[tarea]
+    # Cada tarea lee su propio BytesIO: comparte los bytes sin copiarlos y
+    # no hay carreras con seek()/tell() entre hilos
+    return funcion(io.BytesIO(imagen_bytes), api_key, **{**por_defecto, **opciones})
+
+
+# =========================
+# ANÁLISIS CONCURRENTE
+# =========================
+async def analizar_concurrente(
+    imagen_subida,
+    api_key: str,
+    tareas: list = None,
+    opciones: dict = None,
+    max_simultaneas: int = MAX_TAREAS_SIMULTANEAS,
+):
+    """
+    Ejecuta varias tareas sobre la misma imagen a la vez y va devolviendo
+    cada resultado según termina (generador asíncrono).
+
+    La imagen se lee y valida una sola vez. Las llamadas al SDK son
+    bloqueantes, así que cada una va a un hilo (asyncio.to_thread) y
+    comparte el cliente y el pool HTTP del proceso; el semáforo limita
+    las peticiones en curso.
+
+    :param tareas: Nombres de TAREAS (None = todas)
+    :param opciones: {tarea: {opción: valor}}, p. ej. {"social": {"estilo": "creativo"}}
+    :return: dicts {"tarea", "resultado", "error", "segundos"} en orden de llegada
+    """
+    tareas = list(tareas or TAREAS)
+    desconocidas = [t for t in tareas if t not in TAREAS]
+    if desconocidas:
+        raise ValueError(f"❌ Tareas no válidas: {', '.join(desconocidas)}")
+
+    opciones = opciones or {}
+    imagen_bytes = leer_imagen(imagen_subida).obj
+    semaforo = asyncio.Semaphore(max(max_simultaneas, 1))
+
+    async def ejecutar(tarea):
+        async with semaforo:
+            inicio = time.perf_counter()
+            try:
+                resultado = await asyncio.to_thread(
+                    _ejecutar_tarea, tarea, imagen_bytes, api_key, opciones.get(tarea, {})
+                )
+                error = None
+            except Exception as e:
+                resultado, error = None, str(e)
+
+            return {
+                "tarea": tarea,
+                "resultado": resultado,
+                "error": error,
+                "segundos": time.perf_counter() - inicio,
+            }
+
+    for siguiente in asyncio.as_completed([ejecutar(t) for t in tareas]):
+        yield await siguiente
+
+
+def analizar_todo(
+    imagen_subida,
+    api_key: str,
+    tareas: list = None,
+    opciones: dict = None,
+    al_completar=None,
+    max_simultaneas: int = MAX_TAREAS_SIMULTANEAS,
+) -> dict:
+    """
+    Versión síncrona de analizar_concurrente() para el script de Streamlit.
+
+    :param al_completar: Función llamada con cada resultado en cuanto llega
+                         (para ir mostrando el progreso)
+    :return: {tarea: {"resultado", "error", "segundos"}}
+    """
+    async def recoger():
+        resultados = {}
+        async for item in analizar_concurrente(
+            imagen_subida, api_key, tareas, opciones, max_simultaneas
+        ):
+            resultados[item["tarea"]] = item
+            if al_completar:
+                al_completar(item)
+        return resultados
+
+    return asyncio.run(recoger())
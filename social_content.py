@@ -1,11 +1,59 @@
-import base64
-import io
-from PIL import Image
-from google import genai
 import json
 import re
 
-MAX_IMAGE_SIZE_MB = 5
+from utils.gemini_client import obtener_cliente
+from utils.salud_modelos import generar_con_respaldo
+from utils.cache_resultados import clave_cache, obtener_resultado, guardar_resultado
+from utils.procesado_imagen import leer_imagen, preparar_imagen, parte_imagen
+from utils.planificador import ServicioSaturadoError, es_cuota_agotada
+
+MODELO_SOCIAL = "gemini-2.0-flash-exp"  # Modelo experimental gratuito y rápido
+
+# Modelos de respaldo si falla el principal (de más reciente a menos).
+# Los que fallan seguido se saltan durante un tiempo (ver salud_modelos)
+MODELOS_RESPALDO_SOCIAL = [
+    "gemini-1.5-flash-8b",  # Versión de 8B parámetros
+    "gemini-1.5-pro",
+    "gemini-1.0-pro",
+]
+
+CONFIG_SOCIAL = {
+    "temperature": 0.7,
+    "max_output_tokens": 500
+}
+
+# =========================
+# Estilos y plataformas
+# =========================
+ESTILOS_SOCIAL = {
+    "profesional": "profesional y formal, adecuado para LinkedIn o comunicados corporativos",
+    "creativo": "creativo y visual, perfecto para Instagram o Pinterest",
+    "humoristico": "divertido y humorístico, ideal para Twitter o memes",
+    "inspirador": "inspirador y motivacional, bueno para Facebook o historias personales"
+}
+
+PLATAFORMAS_SOCIAL = {
+    "instagram": {
+        "max_caracteres": 2200,
+        "hashtags_recomendados": 5,
+        "emoji_frecuentes": True
+    },
+    "twitter": {
+        "max_caracteres": 280,
+        "hashtags_recomendados": 3,
+        "emoji_frecuentes": True
+    },
+    "linkedin": {
+        "max_caracteres": 3000,
+        "hashtags_recomendados": 3,
+        "emoji_frecuentes": False
+    },
+    "tiktok": {
+        "max_caracteres": 150,
+        "hashtags_recomendados": 5,
+        "emoji_frecuentes": True
+    }
+}
 
 def generar_contenido_redes(imagen_subida, api_key: str, estilo: str = "profesional", plataforma: str = "instagram") -> dict:
     """
@@ -19,65 +67,19 @@ def generar_contenido_redes(imagen_subida, api_key: str, estilo: str = "profesio
     
     Returns:
         Diccionario con contenido generado
+
+    Raises:
+        ServicioSaturadoError: Cola llena o cuota de la API agotada; no se
+        sustituye por contenido genérico
     """
     
     # =========================
     # Validar tamaño de imagen
     # =========================
-    imagen_subida.seek(0, io.SEEK_END)
-    size_mb = imagen_subida.tell() / (1024 * 1024)
-    imagen_subida.seek(0)
-
-    if size_mb > MAX_IMAGE_SIZE_MB:
-        raise ValueError(
-            f"❌ La imagen pesa {size_mb:.2f} MB. "
-            f"El máximo permitido es {MAX_IMAGE_SIZE_MB} MB."
-        )
-
-    # =========================
-    # Preparar imagen para Gemini
-    # =========================
-    image = Image.open(imagen_subida)
-    buffer = io.BytesIO()
-    image.save(buffer, format="PNG")
-    image_bytes = buffer.getvalue()
-    image_base64 = base64.b64encode(image_bytes).decode("utf-8")
+    original_bytes = leer_imagen(imagen_subida)
 
-    # =========================
-    # Definir estilos según plataforma
-    # =========================
-    estilos_descripcion = {
-        "profesional": "profesional y formal, adecuado para LinkedIn o comunicados corporativos",
-        "creativo": "creativo y visual, perfecto para Instagram o Pinterest",
-        "humoristico": "divertido y humorístico, ideal para Twitter o memes",
-        "inspirador": "inspirador y motivacional, bueno para Facebook o historias personales"
-    }
-    
-    plataformas_caracteristicas = {
-        "instagram": {
-            "max_caracteres": 2200,
-            "hashtags_recomendados": 5,
-            "emoji_frecuentes": True
-        },
-        "twitter": {
-            "max_caracteres": 280,
-            "hashtags_recomendados": 3,
-            "emoji_frecuentes": True
-        },
-        "linkedin": {
-            "max_caracteres": 3000,
-            "hashtags_recomendados": 3,
-            "emoji_frecuentes": False
-        },
-        "tiktok": {
-            "max_caracteres": 150,
-            "hashtags_recomendados": 5,
-            "emoji_frecuentes": True
-        }
-    }
-    
     # Obtener config de plataforma
-    config = plataformas_caracteristicas.get(plataforma, plataformas_caracteristicas["instagram"])
+    config = PLATAFORMAS_SOCIAL.get(plataforma, PLATAFORMAS_SOCIAL["instagram"])
     
     # =========================
     # Prompt optimizado para API gratuita
@@ -86,7 +88,7 @@ def generar_contenido_redes(imagen_subida, api_key: str, estilo: str = "profesio
     ANALIZA ESTA IMAGEN Y GENERA CONTENIDO PARA REDES SOCIALES.
     
     REQUISITOS:
-    1. Estilo: {estilos_descripcion.get(estilo, "profesional")}
+    1. Estilo: {ESTILOS_SOCIAL.get(estilo, "profesional")}
     2. Plataforma: {plataforma.upper()}
     3. Límite caracteres: {config['max_caracteres']}
     4. {config['hashtags_recomendados']} hashtags relevantes
@@ -108,63 +110,76 @@ def generar_contenido_redes(imagen_subida, api_key: str, estilo: str = "profesio
     """
     
     # =========================
-    # Llamada a Gemini - USANDO MODELO CORRECTO
+    # Consultar caché (solo respuestas reales del modelo)
+    # =========================
+    clave = clave_cache(original_bytes, "social", prompt, MODELO_SOCIAL, CONFIG_SOCIAL)
+    contenido_cacheado = obtener_resultado(clave)
+    if contenido_cacheado is not None:
+        return contenido_cacheado
+
+    # =========================
+    # Preparar imagen para Gemini
+    # =========================
+    preparada = preparar_imagen(original_bytes, "social")
+    imagen_parte = parte_imagen(preparada)
+
+    # =========================
+    # Llamada a Gemini: primer modelo sano de la cadena
     # =========================
-    client = genai.Client(api_key=api_key)
-    
     try:
-        response = client.models.generate_content(
-            model="gemini-2.0-flash-exp",  # Modelo experimental gratuito y rápido
-            # O alternativamente usa: "gemini-1.5-flash" (pero en versión correcta)
-            contents=[
-                {
-                    "parts": [
-                        {
-                            "inline_data": {
-                                "mime_type": "image/png",
-                                "data": image_base64,
-                            }
-                        },
-                        {"text": prompt},
-                    ]
-                }
+        modelo, response = generar_con_respaldo(
+            api_key,
+            [MODELO_SOCIAL] + MODELOS_RESPALDO_SOCIAL,
+            [
+                imagen_parte,
+                prompt,
             ],
-            config={
-                "temperature": 0.7,
-                "max_output_tokens": 500
-            }
+            config=CONFIG_SOCIAL,
+            cadena="social",
         )
-        
-        # Extraer JSON de la respuesta
-        response_text = response.text.strip()
-        
-        # Limpiar y encontrar JSON
-        response_text = response_text.replace('```json', '').replace('```', '').strip()
-        
-        try:
-            contenido = json.loads(response_text)
-            
-            # Validar estructura básica
-            campos_requeridos = ["titulo", "contenido_post", "hashtags"]
-            for campo in campos_requeridos:
-                if campo not in contenido:
-                    contenido[campo] = ""
-            
-            return contenido
-            
-        except json.JSONDecodeError:
-            # Si falla el JSON, intentar extraer información manualmente
-            return extraer_contenido_manual(response_text, estilo, plataforma)
-            
+    except ServicioSaturadoError:
+        raise
     except Exception as e:
-        # Si hay error con el modelo, probar con alternativas
-        try:
-            return generar_contenido_con_modelo_alternativo(
-                image_base64, prompt, api_key, estilo, plataforma
-            )
-        except:
-            # Si todo falla, generar respuesta básica
-            return generar_respuesta_fallback(estilo, plataforma)
+        if es_cuota_agotada(e):
+            raise ServicioSaturadoError(
+                "❌ Se ha agotado la cuota de la API. Inténtalo de nuevo en unos minutos."
+            ) from e
+        # Si todo falla, generar respuesta básica
+        return generar_respuesta_fallback(estilo, plataforma)
+
+    # Extraer JSON de la respuesta
+    response_text = response.text.strip()
+
+    # Limpiar y encontrar JSON
+    response_text = response_text.replace('```json', '').replace('```', '').strip()
+
+    try:
+        contenido = json.loads(response_text)
+
+        # Validar estructura básica
+        campos_requeridos = ["titulo", "contenido_post", "hashtags"]
+        for campo in campos_requeridos:
+            if campo not in contenido:
+                contenido[campo] = ""
+
+        valido = True
+
+    except json.JSONDecodeError:
+        # Si falla el JSON, intentar extraer información manualmente
+        contenido = extraer_contenido_manual(response_text, estilo, plataforma)
+        valido = False
+
+    if modelo != MODELO_SOCIAL:
+        # Añadir metadatos del modelo usado
+        contenido["modelo_usado"] = modelo
+
+    # Una respuesta mal formada no se cachea: la siguiente petición
+    # vuelve a preguntar al modelo. La de un modelo de respaldo tampoco:
+    # la clave es la de MODELO_SOCIAL y, cuando vuelva a responder, su
+    # resultado debe sustituir al degradado.
+    if valido and modelo == MODELO_SOCIAL:
+        guardar_resultado(clave, "social", contenido)
+    return contenido
 
 
 def extraer_contenido_manual(texto_respuesta: str, estilo: str, plataforma: str) -> dict:
@@ -182,58 +197,6 @@ def extraer_contenido_manual(texto_respuesta: str, estilo: str, plataforma: str)
     return contenido
 
 
-def generar_contenido_con_modelo_alternativo(image_base64: str, prompt: str, api_key: str, estilo: str, plataforma: str) -> dict:
-    """Prueba con otros modelos disponibles"""
-    client = genai.Client(api_key=api_key)
-    
-    # Lista de modelos a probar (de más reciente a menos)
-    modelos_a_probar = [
-        "gemini-2.0-flash-exp",
-        "gemini-1.5-flash-8b",  # Versión de 8B parámetros
-        "gemini-1.5-pro",
-        "gemini-1.0-pro"
-    ]
-    
-    for modelo in modelos_a_probar:
-        try:
-            response = client.models.generate_content(
-                model=modelo,
-                contents=[
-                    {
-                        "parts": [
-                            {
-                                "inline_data": {
-                                    "mime_type": "image/png",
-                                    "data": image_base64,
-                                }
-                            },
-                            {"text": prompt},
-                        ]
-                    }
-                ],
-                config={
-                    "temperature": 0.7,
-                    "max_output_tokens": 500
-                }
-            )
-            
-            response_text = response.text.strip()
-            response_text = response_text.replace('```json', '').replace('```', '').strip()
-            
-            contenido = json.loads(response_text)
-            
-            # Añadir metadatos del modelo usado
-            contenido["modelo_usado"] = modelo
-            
-            return contenido
-            
-        except:
-            continue  # Probar siguiente modelo
-    
-    # Si todos los modelos fallan
-    raise RuntimeError("❌ No se pudo generar contenido con ningún modelo disponible")
-
-
 def generar_respuesta_fallback(estilo: str, plataforma: str) -> dict:
     """Genera respuesta básica si falla la API"""
     estilos_fallback = {
@@ -323,7 +286,7 @@ def generar_variaciones_contenido(contenido_base: dict, num_variaciones: int = 3
 def listar_modelos_disponibles(api_key: str) -> list:
     """Lista los modelos disponibles en la API"""
     try:
-        client = genai.Client(api_key=api_key)
+        client = obtener_cliente(api_key)
         modelos = client.models.list()
         
         modelos_disponibles = []
@@ -1,7 +1,9 @@
-import sqlite3
-import json
-from datetime import datetime
-from collections import Counter
+from datetime import date, datetime, timedelta
+
+from utils.conexion_db import conexion
+from utils.resumenes_uso import TIPOS_RESUMEN
+from utils.eventos_traduccion import idiomas_usuario
+from utils.translator import IDIOMAS
 
 DB_NAME = "users.db"
 
@@ -10,53 +12,48 @@ DB_NAME = "users.db"
 # ESTADÍSTICAS DE USUARIO
 # =========================
 def obtener_estadisticas_usuario(usuario_id: int):
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
-    
-    estadisticas = {}
-    
-    # 1. Total de imágenes procesadas
-    cursor.execute(
-        """
-        SELECT COUNT(*) FROM imagenes 
-        WHERE usuario_id = ?
-        """,
-        (usuario_id,)
-    )
-    estadisticas["total_imagenes"] = cursor.fetchone()[0]
+    """
+    Estadísticas del perfil leídas de los resúmenes de uso (ver
+    utils.resumenes_uso): una fila por usuario y una por día con
+    actividad, sin recorrer sus imágenes.
+    """
+    with conexion(DB_NAME) as conn:
+        cursor = conn.cursor()
     
-    # 2. Última actividad (última imagen subida)
-    cursor.execute(
-        """
-        SELECT fecha_subida FROM imagenes 
-        WHERE usuario_id = ? 
-        ORDER BY fecha_subida DESC 
-        LIMIT 1
-        """,
-        (usuario_id,)
-    )
-    ultima_fila = cursor.fetchone()
-    estadisticas["ultima_actividad"] = ultima_fila[0] if ultima_fila else None
+        estadisticas = {}
     
-    # 3. Distribución por fechas (últimos 30 días)
-    cursor.execute(
-        """
-        SELECT DATE(fecha_subida) as fecha, COUNT(*) as cantidad
-        FROM imagenes 
-        WHERE usuario_id = ? 
-        AND fecha_subida >= date('now', '-30 days')
-        GROUP BY DATE(fecha_subida)
-        ORDER BY fecha
-        """,
-        (usuario_id,)
-    )
-    fechas = cursor.fetchall()
-    estadisticas["actividad_30_dias"] = [
-        {"fecha": fecha, "cantidad": cantidad} 
-        for fecha, cantidad in fechas
-    ]
+        # 1. Totales y última actividad
+        cursor.execute(
+            f"""
+            SELECT total_imagenes, caracteres_texto, ultima_actividad,
+                   {", ".join(f"n_{tipo}" for tipo in TIPOS_RESUMEN)}
+            FROM uso_usuario
+            WHERE usuario_id = ?
+            """,
+            (usuario_id,)
+        )
+        fila = cursor.fetchone() or (0, 0, None, *[0] * len(TIPOS_RESUMEN))
+        estadisticas["total_imagenes"] = fila[0]
+        estadisticas["caracteres_texto"] = fila[1]
+        estadisticas["ultima_actividad"] = fila[2]
+        estadisticas["por_tipo"] = dict(zip(TIPOS_RESUMEN, fila[3:]))
     
-    conn.close()
+        # 2. Distribución por fechas (últimos 30 días): como mucho 31 filas
+        cursor.execute(
+            """
+            SELECT dia as fecha, total_imagenes as cantidad
+            FROM uso_usuario_dia
+            WHERE usuario_id = ? 
+            AND dia >= ?
+            ORDER BY dia
+            """,
+            (usuario_id, (date.today() - timedelta(days=30)).isoformat())
+        )
+        fechas = cursor.fetchall()
+        estadisticas["actividad_30_dias"] = [
+            {"fecha": fecha, "cantidad": cantidad} 
+            for fecha, cantidad in fechas
+        ]
     return estadisticas
 
 
@@ -64,71 +61,66 @@ def obtener_estadisticas_usuario(usuario_id: int):
 # EXPORTAR DATOS DE USUARIO
 # =========================
 def exportar_datos_usuario(usuario_id: int):
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
-    
-    datos = {}
-    
-    # 1. Datos del perfil
-    cursor.execute(
-        """
-        SELECT id, email, fecha_registro
-        FROM usuarios
-        WHERE id = ?
-        """,
-        (usuario_id,)
-    )
-    usuario_data = cursor.fetchone()
-    datos["perfil"] = {
-        "id": usuario_data[0],
-        "email": usuario_data[1],
-        "fecha_registro": usuario_data[2],
-        "fecha_exportacion": datetime.now().isoformat()
-    }
+    with conexion(DB_NAME) as conn:
+        cursor = conn.cursor()
     
-    # 2. Imágenes procesadas
-    cursor.execute(
-        """
-        SELECT id, texto_original, fecha_subida
-        FROM imagenes
-        WHERE usuario_id = ?
-        ORDER BY fecha_subida DESC
-        """,
-        (usuario_id,)
-    )
-    imagenes = cursor.fetchall()
+        datos = {}
     
-    datos["imagenes"] = [
-        {
-            "id": img_id,
-            "texto_extraido": texto,
-            "fecha_procesamiento": fecha,
-            "longitud_texto": len(texto) if texto else 0
+        # 1. Datos del perfil
+        cursor.execute(
+            """
+            SELECT id, email, fecha_registro
+            FROM usuarios
+            WHERE id = ?
+            """,
+            (usuario_id,)
+        )
+        usuario_data = cursor.fetchone()
+        datos["perfil"] = {
+            "id": usuario_data[0],
+            "email": usuario_data[1],
+            "fecha_registro": usuario_data[2],
+            "fecha_exportacion": datetime.now().isoformat()
         }
-        for img_id, texto, fecha in imagenes
-    ]
     
-    # 3. Estadísticas resumidas
-    cursor.execute(
-        """
-        SELECT 
-            COUNT(*) as total_imagenes,
-            MIN(fecha_subida) as primera_imagen,
-            MAX(fecha_subida) as ultima_imagen
-        FROM imagenes
-        WHERE usuario_id = ?
-        """,
-        (usuario_id,)
-    )
-    stats = cursor.fetchone()
-    datos["estadisticas"] = {
-        "total_imagenes": stats[0],
-        "primera_imagen": stats[1],
-        "ultima_imagen": stats[2],
-        "total_texto_procesado": sum(len(img[1]) for img in imagenes if img[1])
-    }
+        # 2. Imágenes procesadas
+        cursor.execute(
+            """
+            SELECT id, texto_original, fecha_subida
+            FROM imagenes
+            WHERE usuario_id = ?
+            ORDER BY fecha_subida DESC
+            """,
+            (usuario_id,)
+        )
+        imagenes = cursor.fetchall()
     
-    conn.close()
+        datos["imagenes"] = [
+            {
+                "id": img_id,
+                "texto_extraido": texto,
+                "fecha_procesamiento": fecha,
+                "longitud_texto": len(texto) if texto else 0
+            }
+            for img_id, texto, fecha in imagenes
+        ]
+    
+        # 3. Estadísticas resumidas (resumen de uso, sin recalcular)
+        cursor.execute(
+            """
+            SELECT total_imagenes, primera_actividad, ultima_actividad, caracteres_texto
+            FROM uso_usuario
+            WHERE usuario_id = ?
+            """,
+            (usuario_id,)
+        )
+        stats = cursor.fetchone() or (0, None, None, 0)
+        datos["estadisticas"] = {
+            "total_imagenes": stats[0],
+            "primera_imagen": stats[1],
+            "ultima_imagen": stats[2],
+            "total_texto_procesado": stats[3]
+        }
     return datos
 
 
@@ -137,14 +129,17 @@ def exportar_datos_usuario(usuario_id: int):
 # =========================
 def analizar_idiomas_usuario(usuario_id: int):
     """
-    Analiza los idiomas más usados en las traducciones del usuario
-    (Esta es una versión simplificada - en producción necesitarías guardar el idioma usado)
+    Idiomas destino de las traducciones del usuario, de más a menos
+    usado, a partir del resumen por usuario e idioma (ver
+    utils.eventos_traduccion). Lista vacía si aún no ha traducido nada.
     """
-    # Por ahora devolvemos datos de ejemplo
-    # En una implementación real, necesitarías guardar el idioma de cada traducción
+    nombres = {codigo: nombre.capitalize() for nombre, codigo in IDIOMAS.items()}
     return [
-        {"idioma": "Español", "cantidad": 12},
-        {"idioma": "Inglés", "cantidad": 8},
-        {"idioma": "Francés", "cantidad": 5},
-        {"idioma": "Catalán", "cantidad": 3},
-    ]
\ No newline at end of file
+        {
+            "idioma": nombres.get(uso["codigo"], uso["codigo"]),
+            "cantidad": uso["traducciones"],
+            "latencia_media_ms": uso["latencia_media_ms"],
+            "tasa_memoria": uso["tasa_memoria"],
+        }
+        for uso in idiomas_usuario(usuario_id)
+    ]
@@ -0,0 +1,46 @@
+import pytest
+
+from utils import arranque, blob_store, hash_contrasenas
+from utils.arranque import comprobar_preparacion, iniciar_aplicacion
+
+
+@pytest.fixture
+def entorno(tmp_path, monkeypatch):
+    monkeypatch.setattr(arranque, "DB_NAME", str(tmp_path / "users.db"))
+    monkeypatch.setattr(blob_store, "BLOB_DIR", str(tmp_path / "blobs"))
+    monkeypatch.setattr(hash_contrasenas, "BCRYPT_PROCESOS", 0)
+    monkeypatch.setattr(arranque, "load_dotenv", lambda: None)
+    monkeypatch.delenv("GEMINI_API_KEY", raising=False)
+
+    clientes = []
+    monkeypatch.setattr(arranque, "precalentar_cliente", clientes.append)
+    return clientes
+
+
+def test_arranque_completo_y_listo(entorno):
+    estado = iniciar_aplicacion({"GEMINI_API_KEY": "clave-secreta"}, en_segundo_plano=False)
+
+    assert estado["listo"] and all(estado["comprobaciones"].values())
+    assert estado["api_key"] == "clave-secreta"
+    assert estado["migraciones_aplicadas"] > 0
+    assert entorno == ["clave-secreta"]
+
+    # Un segundo arranque no tiene nada que migrar
+    assert iniciar_aplicacion({"GEMINI_API_KEY": "clave-secreta"}, en_segundo_plano=False)["migraciones_aplicadas"] == 0
+
+
+def test_api_key_del_entorno_si_no_hay_secretos(entorno, monkeypatch):
+    monkeypatch.setenv("GEMINI_API_KEY", "clave-entorno")
+    assert iniciar_aplicacion(en_segundo_plano=False)["api_key"] == "clave-entorno"
+
+
+def test_no_listo_sin_api_key_ni_esquema(entorno):
+    preparacion = comprobar_preparacion(None)
+
+    assert not preparacion["listo"]
+    assert preparacion["comprobaciones"] == {
+        "api_key": False,
+        "base_de_datos": False,
+        "blob_store": True,
+        "servicio_hash": True,
+    }
@@ -0,0 +1,165 @@
+import hashlib
+import io
+import os
+import sqlite3
+
+import pytest
+from PIL import Image
+
+from utils import blob_store, gallery
+from utils.blob_store import ruta_blob
+
+
+@pytest.fixture
+def galeria(tmp_path, monkeypatch):
+    monkeypatch.setattr(gallery, "DB_NAME", str(tmp_path / "users.db"))
+    monkeypatch.setattr(blob_store, "BLOB_DIR", str(tmp_path / "blobs"))
+    return tmp_path
+
+
+def _hashes(db):
+    conn = sqlite3.connect(db)
+    filas = conn.execute("SELECT hash, referencias FROM blobs").fetchall()
+    conn.close()
+    return dict(filas)
+
+
+def _imagenes(usuario_id):
+    # Listado paginado y, por cada imagen, el original
+    listado = gallery.listar_imagenes_usuario(usuario_id, limite=100)["imagenes"]
+    return [(img["id"], gallery.obtener_imagen_por_id(img["id"], usuario_id)[0]) for img in listado]
+
+
+def test_imagen_repetida_se_guarda_una_vez(galeria):
+    gallery.init_gallery_db()
+    gallery.guardar_imagen(1, b"foto", "OCR")
+    gallery.guardar_imagen(1, b"foto", "DESCRIPCIÓN")
+
+    refs = _hashes(gallery.DB_NAME)
+    assert list(refs.values()) == [2]
+
+    assert [imagen for _, imagen in _imagenes(1)] == [b"foto", b"foto"]
+
+
+def test_borrar_ultima_referencia_elimina_archivo(galeria):
+    gallery.init_gallery_db()
+    gallery.guardar_imagen(1, b"foto", "a")
+    gallery.guardar_imagen(1, b"foto", "b")
+    (blob_hash,) = _hashes(gallery.DB_NAME)
+    ids = [img_id for img_id, _ in _imagenes(1)]
+
+    assert gallery.eliminar_imagen(ids[0], 1)
+    assert os.path.exists(ruta_blob(blob_hash))
+
+    assert not gallery.eliminar_imagen(ids[1], 2)  # otro usuario
+    assert gallery.eliminar_imagenes([ids[1]], 1) == 1
+    assert not os.path.exists(ruta_blob(blob_hash))
+    assert _hashes(gallery.DB_NAME) == {}
+
+
+def test_migracion_desde_imagen_blob(galeria):
+    conn = sqlite3.connect(gallery.DB_NAME)
+    conn.execute("""
+        CREATE TABLE imagenes (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            usuario_id INTEGER NOT NULL,
+            imagen_blob BLOB NOT NULL,
+            texto_original TEXT,
+            fecha_subida TEXT NOT NULL
+        )
+    """)
+    conn.executemany(
+        "INSERT INTO imagenes (usuario_id, imagen_blob, texto_original, fecha_subida) VALUES (?, ?, ?, ?)",
+        [(1, b"uno", "t1", "2024-01-01"), (1, b"uno", "t2", "2024-01-02"), (2, b"dos", None, "2024-01-03")]
+    )
+    conn.commit()
+    conn.close()
+
+    gallery.init_gallery_db()
+
+    assert sorted(_hashes(gallery.DB_NAME).values()) == [1, 2]
+    assert gallery.obtener_imagen_por_id(3) == (b"dos", None)
+    assert [imagen for _, imagen in _imagenes(1)] == [b"uno", b"uno"]
+
+
+def test_miniatura_perezosa_para_filas_antiguas(galeria, monkeypatch):
+    buffer = io.BytesIO()
+    Image.new("RGB", (1600, 1200), (200, 30, 30)).save(buffer, format="PNG")
+    foto = buffer.getvalue()
+
+    gallery.init_gallery_db()
+    with monkeypatch.context() as m:
+        m.setattr(gallery, "crear_miniatura", lambda datos: None)  # fila antigua
+        gallery.guardar_imagen(1, foto, "antigua")
+
+    conn = sqlite3.connect(gallery.DB_NAME)
+    assert conn.execute("SELECT miniatura_hash FROM imagenes").fetchone()[0] is None
+
+    (imagen,) = gallery.listar_imagenes_usuario(1)["imagenes"]
+    img_id = imagen["id"]
+    miniatura = gallery.obtener_miniatura(imagen)
+    assert Image.open(io.BytesIO(miniatura)).format == "WEBP"
+    assert max(Image.open(io.BytesIO(miniatura)).size) == 320
+
+    generada = conn.execute("SELECT miniatura_hash FROM imagenes").fetchone()[0]
+    conn.close()
+    assert generada is not None
+    assert gallery.obtener_imagen_por_id(img_id)[0] == foto
+
+    gallery.eliminar_imagen(img_id, 1)
+    assert not os.path.exists(ruta_blob(generada))
+
+
+def test_archivo_de_transaccion_deshecha_se_barre(galeria, monkeypatch):
+    gallery.init_gallery_db()
+    gallery.guardar_imagen(1, b"foto", "se queda")
+
+    # El INSERT falla después de escribir el archivo: la transacción se deshace
+    with pytest.raises(KeyError):
+        gallery.guardar_imagenes(1, [{"imagen_bytes": b"huerfana", "miniatura": None}])
+    huerfana = ruta_blob(hashlib.sha256(b"huerfana").hexdigest())
+    assert os.path.exists(huerfana)
+
+    conn = sqlite3.connect(gallery.DB_NAME)
+    # Dentro del periodo de gracia no se toca
+    assert blob_store.recolectar_basura(conn) == 0
+    assert os.path.exists(huerfana)
+
+    monkeypatch.setattr(blob_store, "BLOB_GRACIA_SEGUNDOS", 0)
+    assert blob_store.recolectar_basura(conn) == 1
+    conn.close()
+    assert not os.path.exists(huerfana)
+    assert [imagen for _, imagen in _imagenes(1)] == [b"foto"]
+
+
+def test_archivo_se_borra_solo_tras_el_commit(galeria, monkeypatch):
+    gallery.init_gallery_db()
+    gallery.guardar_imagen(1, b"foto", "a")
+    (blob_hash,) = _hashes(gallery.DB_NAME)
+    conn = sqlite3.connect(gallery.DB_NAME)
+    conn.execute("UPDATE blobs SET referencias = 0")
+    conn.commit()
+
+    def commit_fallido():
+        raise sqlite3.OperationalError("disk I/O error")
+
+    class _Conexion:
+        def __init__(self, real):
+            self.real = real
+            self.commit = commit_fallido
+
+        def __getattr__(self, nombre):
+            return getattr(self.real, nombre)
+
+    with pytest.raises(sqlite3.OperationalError):
+        blob_store.recolectar_basura(_Conexion(conn), [blob_hash])
+    assert os.path.exists(ruta_blob(blob_hash))
+    assert _hashes(gallery.DB_NAME) == {blob_hash: 0}
+
+    # Si la recolección lo retira después de escribir_blob, guardar_blob
+    # (ya con el bloqueo) lo vuelve a escribir
+    os.remove(ruta_blob(blob_hash))
+    blob_store.guardar_blob(conn.cursor(), b"foto")
+    conn.commit()
+    conn.close()
+    assert blob_store.leer_blob(blob_hash) == b"foto"
@@ -0,0 +1,90 @@
+import sqlite3
+import time
+
+from utils import cache_resultados
+from utils.cache_resultados import (
+    clave_cache,
+    obtener_resultado,
+    guardar_resultado,
+    estadisticas_cache,
+    limpiar_cache,
+)
+from utils.conexion_db import estadisticas_conexiones_db
+
+
+def test_clave_depende_de_imagen_tarea_y_config():
+    base = clave_cache(b"img", "ocr", "prompt", "modelo")
+    assert base == clave_cache(b"img", "ocr", "prompt", "modelo")
+    assert base != clave_cache(b"otra", "ocr", "prompt", "modelo")
+    assert base != clave_cache(b"img", "descripcion", "prompt", "modelo")
+    assert base != clave_cache(b"img", "ocr", "prompt", "modelo", {"temperature": 0.7})
+
+
+def test_acierto_y_fallo(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache_resultados, "CACHE_DB", str(tmp_path / "cache.db"))
+
+    clave = clave_cache(b"img", "social", "prompt", "modelo")
+    assert obtener_resultado(clave) is None
+
+    guardar_resultado(clave, "social", {"titulo": "Hola"})
+    assert obtener_resultado(clave) == {"titulo": "Hola"}
+
+    stats = estadisticas_cache()
+    assert stats["aciertos"] == 1
+    assert stats["fallos"] == 1
+    assert stats["entradas"] == 1
+
+
+def test_expulsion_por_tamano(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache_resultados, "CACHE_DB", str(tmp_path / "cache.db"))
+    monkeypatch.setattr(cache_resultados, "CACHE_MAX_MB", 250 / (1024 * 1024))
+
+    claves = [clave_cache(bytes([i]), "ocr", "p", "m") for i in range(3)]
+    for clave in claves:
+        guardar_resultado(clave, "ocr", "x" * 100)
+
+    assert obtener_resultado(claves[0]) is None
+    assert obtener_resultado(claves[2]) == "x" * 100
+    assert estadisticas_cache()["expulsiones"] == 1
+
+
+def test_acierto_solo_lee(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache_resultados, "CACHE_DB", str(tmp_path / "cache.db"))
+    clave = clave_cache(b"img", "ocr", "p", "m")
+    guardar_resultado(clave, "ocr", "texto")
+
+    antes = estadisticas_conexiones_db()["transacciones"]
+    for _ in range(10):
+        assert obtener_resultado(clave) == "texto"
+    assert estadisticas_conexiones_db()["transacciones"] == antes
+
+    # Los aciertos se escriben juntos al pedir las estadísticas
+    assert estadisticas_cache()["aciertos"] == 10
+
+
+def test_tamano_total_sin_sumar_la_tabla(tmp_path, monkeypatch):
+    db = str(tmp_path / "cache.db")
+    # Caché anterior a los triggers, con una entrada de 4 bytes
+    conn = sqlite3.connect(db)
+    conn.execute("""
+        CREATE TABLE resultados (
+            clave TEXT PRIMARY KEY, tarea TEXT NOT NULL, valor TEXT NOT NULL,
+            tamano INTEGER NOT NULL, creado REAL NOT NULL, ultimo_acceso REAL NOT NULL
+        )
+    """)
+    conn.execute("INSERT INTO resultados VALUES ('vieja', 'ocr', '\"ab\"', 4, ?, ?)", (time.time(), time.time()))
+    conn.commit()
+    conn.close()
+    monkeypatch.setattr(cache_resultados, "CACHE_DB", db)
+
+    guardar_resultado("a", "ocr", "x" * 10)
+    guardar_resultado("a", "ocr", "x" * 20)  # reemplaza
+    guardar_resultado("b", "ocr", "y")
+
+    conn = sqlite3.connect(db)
+    suma = conn.execute("SELECT SUM(tamano) FROM resultados").fetchone()[0]
+    conn.close()
+    assert estadisticas_cache()["tamano_bytes"] == suma == 4 + 22 + 3
+
+    limpiar_cache()
+    assert estadisticas_cache()["tamano_bytes"] == 0
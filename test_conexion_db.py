@@ -0,0 +1,65 @@
+import sqlite3
+import threading
+
+import pytest
+
+from utils import conexion_db
+from utils.conexion_db import conexion, estadisticas_conexiones_db, transaccion
+
+
+@pytest.fixture
+def db(tmp_path):
+    ruta = str(tmp_path / "pool.db")
+    with transaccion(ruta) as conn:
+        conn.execute("CREATE TABLE t (id INTEGER PRIMARY KEY, hilo INTEGER)")
+    yield ruta
+    conexion_db.cerrar_conexiones()
+
+
+def test_conexion_reutilizada_y_configurada(db):
+    antes = estadisticas_conexiones_db()
+    for _ in range(5):
+        with conexion(db) as conn:
+            assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+            assert conn.execute("PRAGMA synchronous").fetchone()[0] == 1  # NORMAL
+
+    despues = estadisticas_conexiones_db()
+    assert despues["conexiones_creadas"] == antes["conexiones_creadas"]
+    assert despues["conexiones_reutilizadas"] - antes["conexiones_reutilizadas"] == 5
+
+
+def test_transaccion_fallida_no_deja_nada_pendiente(db):
+    with pytest.raises(sqlite3.IntegrityError):
+        with transaccion(db) as conn:
+            conn.execute("INSERT INTO t (id, hilo) VALUES (1, 0)")
+            conn.execute("INSERT INTO t (id, hilo) VALUES (1, 0)")
+
+    with conexion(db) as conn:
+        assert not conn.in_transaction
+        assert conn.execute("SELECT COUNT(*) FROM t").fetchone()[0] == 0
+
+
+def test_lectores_y_escritores_concurrentes(db):
+    errores = []
+    creadas = estadisticas_conexiones_db()["conexiones_creadas"]
+
+    def trabajo(hilo):
+        try:
+            for _ in range(20):
+                with transaccion(db) as conn:
+                    conn.execute("INSERT INTO t (hilo) VALUES (?)", (hilo,))
+                with conexion(db) as conn:
+                    conn.execute("SELECT COUNT(*) FROM t WHERE hilo = ?", (hilo,)).fetchone()
+        except Exception as e:
+            errores.append(e)
+
+    hilos = [threading.Thread(target=trabajo, args=(i,)) for i in range(16)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+
+    assert errores == []
+    with conexion(db) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM t").fetchone()[0] == 16 * 20
+    assert estadisticas_conexiones_db()["conexiones_creadas"] - creadas <= 16
@@ -0,0 +1,75 @@
+import json
+import sqlite3
+from types import SimpleNamespace
+
+import pytest
+
+from utils import eventos_traduccion, memoria_traduccion, stats, translator
+from utils.eventos_traduccion import idiomas_usuario
+from utils.migraciones import aplicar_migraciones
+from utils.planificador import como_usuario
+from utils.translator import traducir_multiples, traducir_texto, traducir_texto_con_memoria
+
+
+@pytest.fixture
+def base_datos(tmp_path, monkeypatch):
+    db = str(tmp_path / "users.db")
+    aplicar_migraciones(db)
+    monkeypatch.setattr(eventos_traduccion, "DB_NAME", db)
+    monkeypatch.setattr(memoria_traduccion, "DB_NAME", db)
+
+    def generar(api_key, modelo, prompt, config=None):
+        texto = prompt.rsplit("\n\n", 1)[1]
+        if config and config["response_schema"]["type"] == "ARRAY":
+            return SimpleNamespace(text=json.dumps([s.upper() for s in json.loads(texto)]))
+        if config:
+            codigos = config["response_schema"]["property_ordering"]
+            return SimpleNamespace(text=json.dumps({codigo: texto for codigo in codigos}))
+        return SimpleNamespace(text=texto.upper())
+
+    def generar_en_stream(api_key, modelo, prompt, config=None):
+        yield generar(api_key, modelo, prompt, config).text
+
+    monkeypatch.setattr(translator, "generar_contenido", generar)
+    monkeypatch.setattr(translator, "generar_en_stream", generar_en_stream)
+    return db
+
+
+def test_cada_traduccion_queda_registrada_por_usuario(base_datos):
+    with como_usuario(7):
+        traducir_texto("Hola", "inglés", "clave")
+        traducir_texto("Hola, mundo", "Inglés", "clave")
+        traducir_multiples("Bon dia", ["francés", "inglés"], "clave")
+        traducir_texto_con_memoria("Una frase.", "francés", "clave")
+        traducir_texto_con_memoria("Una frase.", "francés", "clave")
+    with como_usuario(8):
+        traducir_texto("Hola", "alemán", "clave")
+
+    usos = {uso["codigo"]: uso for uso in idiomas_usuario(7)}
+    assert [uso["codigo"] for uso in idiomas_usuario(7)] == ["en", "fr"]
+    assert (usos["en"]["traducciones"], usos["en"]["caracteres"]) == (3, 4 + 11 + 7)
+    assert usos["fr"]["traducciones"] == 3
+    assert usos["fr"]["tasa_memoria"] == pytest.approx(1 / 3)
+
+    # El resumen coincide con los eventos
+    conn = sqlite3.connect(base_datos)
+    assert conn.execute(
+        "SELECT COUNT(*) FROM eventos_traduccion WHERE usuario_id = 7"
+    ).fetchone()[0] == 6
+    conn.close()
+
+
+def test_grafico_de_idiomas_con_datos_reales(base_datos, monkeypatch):
+    assert stats.analizar_idiomas_usuario(1) == []
+
+    with como_usuario(1):
+        traducir_texto("Hola", "catalán", "clave")
+
+    [catalan] = stats.analizar_idiomas_usuario(1)
+    assert (catalan["idioma"], catalan["cantidad"]) == ("Catalán", 1)
+
+
+def test_un_fallo_al_registrar_no_rompe_la_traduccion(tmp_path, monkeypatch):
+    monkeypatch.setattr(eventos_traduccion, "DB_NAME", str(tmp_path / "sin_migrar.db"))
+    monkeypatch.setattr(translator, "generar_contenido", lambda *args, **kwargs: SimpleNamespace(text="Hi"))
+    assert traducir_texto("Hola", "inglés", "clave") == "Hi"
@@ -0,0 +1,95 @@
+import io
+import json
+import os
+import sqlite3
+import zipfile
+
+import pytest
+
+from utils import blob_store, exportacion, gallery
+from utils.exportacion import escribir_exportacion, exportar_ndjson, exportar_zip
+from utils.gallery import guardar_imagenes, guardar_traducciones_imagen
+from utils.migraciones import aplicar_migraciones
+from utils.procesado_imagen import medir_memoria_pico
+
+PNG = b"\x89PNG\r\n\x1a\n"
+
+
+@pytest.fixture
+def base_datos(tmp_path, monkeypatch):
+    db = str(tmp_path / "users.db")
+    monkeypatch.setattr(gallery, "DB_NAME", db)
+    monkeypatch.setattr(exportacion, "DB_NAME", db)
+    monkeypatch.setattr(blob_store, "BLOB_DIR", str(tmp_path / "blobs"))
+    aplicar_migraciones(db)
+
+    conn = sqlite3.connect(db)
+    conn.execute(
+        "INSERT INTO usuarios (id, email, password_hash, fecha_registro) VALUES (1, 'ana@example.com', 'x', '2024-01-01')"
+    )
+    conn.commit()
+    conn.close()
+    return db
+
+
+def _galeria(imagenes, tamano=16):
+    guardar_imagenes(1, [
+        {"imagen_bytes": PNG + i.to_bytes(4, "big") + os.urandom(tamano), "texto_original": f"texto {i}", "miniatura": None}
+        for i in range(imagenes)
+    ])
+
+
+def test_ndjson_un_registro_por_linea(base_datos):
+    _galeria(3)
+    guardar_traducciones_imagen(2, {"en": "text 1"})
+
+    lineas = b"".join(exportar_ndjson(1)).decode("utf-8").splitlines()
+    registros = [json.loads(linea) for linea in lineas]
+
+    assert [r["registro"] for r in registros] == ["perfil", "estadisticas", "imagen", "imagen", "imagen", "traduccion"]
+    assert registros[0]["email"] == "ana@example.com"
+    assert registros[1]["total_imagenes"] == 3
+    assert registros[-1] == {
+        "registro": "traduccion", "imagen_id": 2, "idioma": "en", "texto": "text 1", "fecha": registros[-1]["fecha"]
+    }
+
+
+def test_el_primer_trozo_sale_antes_de_leer_la_galeria(base_datos):
+    _galeria(3)
+    generador = exportar_ndjson(1)
+    assert json.loads(next(generador))["registro"] == "perfil"
+    generador.close()
+
+
+def test_zip_con_datos_e_imagenes_originales(base_datos):
+    _galeria(3)
+    destino = io.BytesIO()
+    escribir_exportacion(1, destino, "zip")
+
+    with zipfile.ZipFile(destino) as archivo_zip:
+        assert archivo_zip.testzip() is None
+        registros = [json.loads(linea) for linea in archivo_zip.read("datos.ndjson").splitlines()]
+        imagenes = [r for r in registros if r["registro"] == "imagen"]
+        assert sorted(r["archivo"] for r in imagenes) == ["imagenes/1.png", "imagenes/2.png", "imagenes/3.png"]
+        for registro in imagenes:
+            assert archivo_zip.read(registro["archivo"]) == blob_store.leer_blob(registro["imagen_hash"])
+
+
+def test_memoria_del_zip_no_crece_con_la_galeria(base_datos):
+    def exportar():
+        return sum(len(trozo) for trozo in exportar_zip(1))
+
+    _galeria(4, tamano=256 * 1024)
+    _, pico_pequena = medir_memoria_pico(exportar)
+
+    _galeria(40, tamano=256 * 1024)
+    total, pico_grande = medir_memoria_pico(exportar)
+
+    assert total > 10 * 1024 * 1024
+    assert pico_grande < 2 * pico_pequena + 256 * 1024
+    assert pico_grande < 2 * 1024 * 1024
+
+
+def test_formato_no_valido(base_datos):
+    with pytest.raises(ValueError):
+        escribir_exportacion(1, io.BytesIO(), "xml")
@@ -0,0 +1,69 @@
+import sqlite3
+
+import pyarrow.parquet as pq
+import pytest
+
+from utils import blob_store, eventos_traduccion, exportacion_columnar, gallery
+from utils.exportacion_columnar import TABLAS, exportar_parquet, lotes_arrow
+from utils.gallery import guardar_imagenes
+from utils.migraciones import aplicar_migraciones
+from utils.planificador import como_usuario
+
+
+@pytest.fixture
+def base_datos(tmp_path, monkeypatch):
+    db = str(tmp_path / "users.db")
+    for modulo in (gallery, eventos_traduccion, exportacion_columnar):
+        monkeypatch.setattr(modulo, "DB_NAME", db)
+    monkeypatch.setattr(blob_store, "BLOB_DIR", str(tmp_path / "blobs"))
+    aplicar_migraciones(db)
+
+    for usuario_id in (1, 2):
+        guardar_imagenes(usuario_id, [
+            {"imagen_bytes": f"{usuario_id}-{i}".encode(), "texto_original": f"texto {i}", "miniatura": None}
+            for i in range(5 * usuario_id)
+        ])
+        with como_usuario(usuario_id):
+            eventos_traduccion.registrar_traduccion(["en", "fr"], 100, 0.25)
+    return db
+
+
+def test_instantanea_de_toda_la_instancia(base_datos, tmp_path):
+    resultado = exportar_parquet(str(tmp_path / "instantanea"))
+
+    assert {tabla: resultado[tabla]["filas"] for tabla in TABLAS} == {
+        "imagenes": 15,
+        "eventos_traduccion": 4,
+        "uso_usuario": 2,
+        "uso_usuario_dia": 2,
+        "uso_idiomas": 4,
+    }
+
+    imagenes = pq.read_table(resultado["imagenes"]["ruta"])
+    assert imagenes.schema.remove_metadata() == TABLAS["imagenes"][1]
+    assert sorted(imagenes.column("longitud_texto").to_pylist())[-1] == len("texto 9")
+
+    eventos = pq.read_table(resultado["eventos_traduccion"]["ruta"]).to_pylist()
+    assert {e["milisegundos"] for e in eventos} == {250}
+    assert all(e["fecha_utc"].year >= 2024 for e in eventos)
+
+
+def test_instantanea_de_un_usuario(base_datos, tmp_path):
+    resultado = exportar_parquet(str(tmp_path / "usuario"), usuario_id=1)
+
+    assert resultado["imagenes"]["filas"] == 5
+    for tabla in TABLAS:
+        assert set(pq.read_table(resultado[tabla]["ruta"]).column("usuario_id").to_pylist()) <= {1}
+
+
+def test_lotes_con_tamano_fijo(base_datos):
+    conn = sqlite3.connect(base_datos)
+    lotes = list(lotes_arrow(conn, "imagenes", filas_por_lote=4))
+    conn.close()
+
+    assert [lote.num_rows for lote in lotes] == [4, 4, 4, 3]
+
+
+def test_tabla_desconocida(base_datos, tmp_path):
+    with pytest.raises(ValueError):
+        exportar_parquet(str(tmp_path), tablas=["usuarios"])
@@ -0,0 +1,78 @@
+import io
+import json
+from types import SimpleNamespace
+
+import pytest
+from PIL import Image
+
+from utils import cache_resultados, extraccion_combinada, gemini_client
+from utils.extraccion_combinada import extraer_todo
+
+
+class _ClienteFalso:
+    def __init__(self, respuesta, finish_reason="STOP"):
+        self.llamadas = []
+        self.models = self
+        self._respuesta = respuesta
+        self._finish_reason = finish_reason
+
+    def generate_content(self, model, contents, config=None):
+        self.llamadas.append({"model": model, "contents": contents, "config": config})
+        texto = self._respuesta if isinstance(self._respuesta, str) else json.dumps(self._respuesta)
+        return SimpleNamespace(
+            text=texto,
+            candidates=[SimpleNamespace(finish_reason=self._finish_reason)],
+        )
+
+
+def _png():
+    buffer = io.BytesIO()
+    Image.new("RGB", (64, 48), "white").save(buffer, format="PNG")
+    return io.BytesIO(buffer.getvalue())
+
+
+def test_una_sola_llamada_con_esquema(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache_resultados, "CACHE_DB", str(tmp_path / "cache.db"))
+    cliente = _ClienteFalso({
+        "texto": "TOTAL 12,50 €",
+        "descripcion": "Un ticket de compra.",
+        "social": {"titulo": "Compra del día", "contenido_post": "...", "hashtags": ["#ticket"]},
+    })
+    monkeypatch.setattr(gemini_client, "obtener_cliente", lambda api_key: cliente)
+
+    resultado = extraer_todo(_png(), "clave", nivel_detalle="breve", plataforma="twitter")
+
+    assert resultado["texto"] == "TOTAL 12,50 €"
+    assert resultado["descripcion"] == "Un ticket de compra."
+    assert resultado["social"]["hashtags"] == ["#ticket"]
+
+    (llamada,) = cliente.llamadas
+    assert llamada["config"]["response_schema"] is extraccion_combinada.ESQUEMA_COMBINADO
+    assert sum(1 for parte in llamada["contents"] if not isinstance(parte, str)) == 1
+    assert "TWITTER" in llamada["contents"][1]
+
+    # La segunda vez sale de la caché
+    assert extraer_todo(_png(), "clave", nivel_detalle="breve", plataforma="twitter") == resultado
+    assert len(cliente.llamadas) == 1
+
+
+def test_campos_sociales_minimos():
+    resultado = extraccion_combinada.separar_respuesta(json.dumps({"texto": None, "descripcion": "d"}))
+    assert resultado["texto"] == ""
+    assert resultado["social"] == {"titulo": "", "contenido_post": "", "hashtags": ""}
+
+
+@pytest.mark.parametrize("texto, finish_reason", [
+    ('{"texto": "TOTAL 12,50', "MAX_TOKENS"),
+    ("Lo siento, no puedo", "STOP"),
+    ("[1, 2]", "STOP"),
+])
+def test_respuesta_invalida_no_se_cachea(tmp_path, monkeypatch, texto, finish_reason):
+    monkeypatch.setattr(cache_resultados, "CACHE_DB", str(tmp_path / "cache.db"))
+    cliente = _ClienteFalso(texto, finish_reason)
+    monkeypatch.setattr(gemini_client, "obtener_cliente", lambda api_key: cliente)
+
+    for _ in range(2):
+        with pytest.raises((ValueError, RuntimeError), match="❌"):
+            extraer_todo(_png(), "clave")
+    assert len(cliente.llamadas) == 2
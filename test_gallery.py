@@ -0,0 +1,90 @@
+import sqlite3
+from datetime import date
+
+import pytest
+
+from utils import blob_store, conexion_db, gallery
+
+
+@pytest.fixture
+def galeria(tmp_path, monkeypatch):
+    monkeypatch.setattr(gallery, "DB_NAME", str(tmp_path / "users.db"))
+    monkeypatch.setattr(blob_store, "BLOB_DIR", str(tmp_path / "blobs"))
+    gallery.init_gallery_db()
+
+
+def _insertar(filas):
+    conn = sqlite3.connect(gallery.DB_NAME)
+    conn.executemany(
+        """
+        INSERT INTO imagenes (usuario_id, imagen_hash, tipo, texto_original, fecha_subida)
+        VALUES (?, 'h', ?, ?, ?)
+        """,
+        filas
+    )
+    conn.commit()
+    conn.close()
+
+
+def test_paginacion_por_clave_recorre_todo_sin_repetir(galeria):
+    # Varias imágenes con la misma fecha: el id desempata
+    _insertar([(1, "ocr", f"texto {i}", f"2024-01-{1 + i // 3:02d}T10:00:00") for i in range(10)])
+    _insertar([(2, "ocr", "de otro usuario", "2024-01-05T10:00:00")])
+
+    vistos, cursor_pagina = [], None
+    while True:
+        pagina = gallery.listar_imagenes_usuario(1, limite=4, cursor_pagina=cursor_pagina)
+        vistos += [img["id"] for img in pagina["imagenes"]]
+        cursor_pagina = pagina["siguiente_cursor"]
+        if cursor_pagina is None:
+            break
+
+    assert vistos == list(range(10, 0, -1))
+
+
+def test_solo_metadatos_y_vista_previa(galeria):
+    _insertar([(1, "ocr", "x" * 5000, "2024-01-01T10:00:00")])
+    (imagen,) = gallery.listar_imagenes_usuario(1)["imagenes"]
+
+    assert len(imagen["vista_previa"]) == gallery.LONGITUD_VISTA_PREVIA
+    assert imagen["longitud_texto"] == 5000
+    assert gallery.obtener_imagen_por_id(imagen["id"], 1, incluir_imagen=False) == (None, "x" * 5000)
+    assert gallery.obtener_imagen_por_id(imagen["id"], 2) is None
+
+
+def test_filtros_por_fecha_y_tipo(galeria):
+    _insertar([
+        (1, "ocr", "a", "2024-01-01T09:00:00"),
+        (1, "social", "b", "2024-01-02T23:59:00"),
+        (1, "descripcion", "c", "2024-01-03T08:00:00"),
+    ])
+
+    por_fecha = gallery.listar_imagenes_usuario(1, desde=date(2024, 1, 2), hasta=date(2024, 1, 2))
+    assert [img["vista_previa"] for img in por_fecha["imagenes"]] == ["b"]
+
+    por_tipo = gallery.listar_imagenes_usuario(1, tipo="descripcion")
+    assert [img["vista_previa"] for img in por_tipo["imagenes"]] == ["c"]
+
+
+def test_lote_en_una_sola_transaccion(galeria):
+    antes = conexion_db.estadisticas_conexiones_db()["transacciones"]
+    guardadas = gallery.guardar_imagenes(1, [
+        {"imagen_bytes": b"uno", "texto_original": "t1", "miniatura": None},
+        {"imagen_bytes": b"dos", "texto_original": "t2", "miniatura": b"mini"},
+        {"imagen_bytes": b"uno", "texto_original": "t3", "tipo": "descripcion", "miniatura": None},
+    ])
+
+    assert guardadas == 3
+    assert conexion_db.estadisticas_conexiones_db()["transacciones"] == antes + 1
+    pagina = gallery.listar_imagenes_usuario(1)["imagenes"]
+    assert [img["vista_previa"] for img in pagina] == ["t3", "t2", "t1"]
+    assert [img["tipo"] for img in pagina] == ["descripcion", "ocr", "ocr"]
+
+
+def test_lote_con_tipo_no_valido_no_guarda_nada(galeria):
+    with pytest.raises(ValueError):
+        gallery.guardar_imagenes(1, [
+            {"imagen_bytes": b"uno", "texto_original": "t1"},
+            {"imagen_bytes": b"dos", "texto_original": "t2", "tipo": "otro"},
+        ])
+    assert gallery.listar_imagenes_usuario(1)["imagenes"] == []
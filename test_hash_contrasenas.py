@@ -0,0 +1,113 @@
+import os
+import signal
+from contextlib import contextmanager
+
+import pytest
+
+from utils import auth, hash_contrasenas
+from utils.auth import cambiar_contraseña, login_usuario, registrar_usuario
+from utils.hash_contrasenas import HashSaturadoError, coste_hash, verificar_contrasena
+from utils.migraciones import aplicar_migraciones
+
+
+@pytest.fixture
+def servicio(tmp_path, monkeypatch):
+    db = str(tmp_path / "users.db")
+    aplicar_migraciones(db)
+    monkeypatch.setattr(auth, "DB_NAME", db)
+    monkeypatch.setattr(hash_contrasenas, "BCRYPT_COSTE", 4)
+    monkeypatch.setattr(hash_contrasenas, "BCRYPT_PROCESOS", 2)
+    monkeypatch.setattr(hash_contrasenas, "_huecos", None)
+    yield db
+    hash_contrasenas.cerrar_servicio_hash()
+
+
+def _hash_guardado(db):
+    with auth.conexion(db) as conn:
+        return conn.execute("SELECT password_hash FROM usuarios").fetchone()[0]
+
+
+def test_registro_y_login_en_el_pool(servicio):
+    registrar_usuario("ana@example.com", "secreto1")
+
+    assert coste_hash(_hash_guardado(servicio)) == 4
+    assert login_usuario("ana@example.com", "secreto1") == 1
+    assert login_usuario("ana@example.com", "otra") is None
+    assert hash_contrasenas._pool is not None
+
+
+def test_rehash_al_cambiar_el_coste(servicio, monkeypatch):
+    registrar_usuario("ana@example.com", "secreto1")
+    anterior = _hash_guardado(servicio)
+
+    # Un login fallido no toca el hash
+    monkeypatch.setattr(hash_contrasenas, "BCRYPT_COSTE", 5)
+    assert login_usuario("ana@example.com", "otra") is None
+    assert _hash_guardado(servicio) == anterior
+
+    assert login_usuario("ana@example.com", "secreto1") == 1
+    nuevo = _hash_guardado(servicio)
+    assert coste_hash(nuevo) == 5 and verificar_contrasena("secreto1", nuevo)
+    assert hash_contrasenas.estadisticas_hash()["rehashes"] >= 1
+
+    assert cambiar_contraseña(1, "secreto1", "secreto2")
+    assert login_usuario("ana@example.com", "secreto2") == 1
+
+
+def test_cola_llena_rechaza_en_vez_de_esperar_sin_limite(servicio, monkeypatch):
+    monkeypatch.setattr(hash_contrasenas, "BCRYPT_PROCESOS", 0)
+    monkeypatch.setattr(hash_contrasenas, "MAX_PENDIENTES_HASH", 1)
+    monkeypatch.setattr(hash_contrasenas, "MAX_ESPERA_HASH_SEGUNDOS", 0.05)
+    _, huecos = hash_contrasenas._obtener_pool()
+
+    huecos.acquire()
+    try:
+        with pytest.raises(HashSaturadoError):
+            hash_contrasenas.hashear_contrasena("secreto1")
+    finally:
+        huecos.release()
+
+    assert hash_contrasenas.hashear_contrasena("secreto1").startswith("$2b$04$")
+
+
+def test_rehash_fuera_de_la_transaccion(servicio, monkeypatch):
+    registrar_usuario("ana@example.com", "secreto1")
+    monkeypatch.setattr(hash_contrasenas, "BCRYPT_COSTE", 5)
+
+    en_transaccion = []
+    transaccion_original = auth.transaccion
+    hashear_original = auth.hashear_contrasena
+
+    @contextmanager
+    def transaccion_vigilada(db):
+        en_transaccion.append(True)
+        try:
+            with transaccion_original(db) as conn:
+                yield conn
+        finally:
+            en_transaccion.pop()
+
+    def hashear_vigilado(password):
+        assert not en_transaccion, "bcrypt con el bloqueo de escritura tomado"
+        return hashear_original(password)
+
+    monkeypatch.setattr(auth, "transaccion", transaccion_vigilada)
+    monkeypatch.setattr(auth, "hashear_contrasena", hashear_vigilado)
+
+    assert login_usuario("ana@example.com", "secreto1") == 1
+    assert coste_hash(_hash_guardado(servicio)) == 5
+
+
+def test_pool_roto_se_reconstruye(servicio, monkeypatch):
+    monkeypatch.setattr(hash_contrasenas, "BCRYPT_PROCESOS", 1)
+    registrar_usuario("ana@example.com", "secreto1")
+    roto = hash_contrasenas._pool
+
+    # Un proceso muerto (como con el OOM killer) rompe el pool
+    for pid in list(roto._processes):
+        os.kill(pid, signal.SIGKILL)
+
+    assert login_usuario("ana@example.com", "secreto1") == 1
+    assert hash_contrasenas._pool is not roto
+    assert hash_contrasenas.servicio_hash_listo()
+    assert hash_contrasenas.estadisticas_hash()["pools_reiniciados"] == 1
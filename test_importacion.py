@@ -0,0 +1,28 @@
+from utils.benchmark import (
+    medir_importacion,
+    modulos_pantalla_login,
+    modulos_pesados_cargados,
+)
+
+# La pantalla de login se compara con importar el SDK en la misma máquina
+# y no con PRESUPUESTO_IMPORTACION_MS (ese lo muestra `python -m
+# utils.benchmark`): hoy ronda el 5 %, el margen deja sitio al ruido
+FRACCION_MAXIMA_SDK = 0.25
+
+
+def test_pantalla_de_login_sin_modulos_pesados():
+    modulos = modulos_pantalla_login()
+    assert "utils.auth" in modulos
+
+    medidas = [medir_importacion(modulos) for _ in range(3)]
+
+    assert all(modulos_pesados_cargados(m["modulos"]) == [] for m in medidas)
+    # La mejor de tres: una pausa del sistema solo puede alargar una medida
+    login_ms = min(m["total_ms"] for m in medidas)
+    sdk_ms = medir_importacion(["google.genai"])["total_ms"]
+    assert login_ms < sdk_ms * FRACCION_MAXIMA_SDK
+
+
+def test_la_medida_detecta_dependencias_pesadas():
+    medida = medir_importacion(["utils.gemini_client"])
+    assert "google.genai" in modulos_pesados_cargados(medida["modulos"])
@@ -0,0 +1,119 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from utils import eventos_traduccion, memoria_traduccion, translator
+from utils.memoria_traduccion import estadisticas_memoria_traduccion, hash_segmento
+from utils.migraciones import aplicar_migraciones
+from utils.translator import traducir_texto_con_memoria
+
+TEXTO = "Primera línea del ticket\nSegunda línea. Con dos frases.\n\nTOTAL 12,50 €\n"
+
+
+@pytest.fixture
+def memoria(tmp_path, monkeypatch):
+    db = str(tmp_path / "users.db")
+    aplicar_migraciones(db)
+    monkeypatch.setattr(memoria_traduccion, "DB_NAME", db)
+    monkeypatch.setattr(eventos_traduccion, "DB_NAME", db)
+
+    peticiones = []
+
+    def generar(api_key, modelo, prompt, config=None):
+        segmentos = json.loads(prompt.rsplit("\n\n", 1)[1])
+        peticiones.append(segmentos)
+        return SimpleNamespace(text=json.dumps([s.upper() for s in segmentos]))
+
+    def generar_en_stream(api_key, modelo, prompt, config=None):
+        # La misma respuesta, a trozos de 5 caracteres
+        texto = translator.generar_contenido(api_key, modelo, prompt, config).text
+        for i in range(0, len(texto), 5):
+            yield texto[i:i + 5]
+
+    monkeypatch.setattr(translator, "generar_contenido", generar)
+    monkeypatch.setattr(translator, "generar_en_stream", generar_en_stream)
+    return peticiones
+
+
+def test_solo_se_traducen_los_segmentos_nuevos(memoria):
+    assert traducir_texto_con_memoria(TEXTO, "inglés", "clave") == TEXTO.upper()
+    assert memoria == [["Primera línea del ticket", "Segunda línea.", "Con dos frases.", "TOTAL 12,50 €"]]
+
+    editado = TEXTO.replace("12,50", "13,00")
+    assert traducir_texto_con_memoria(editado, "inglés", "clave") == editado.upper()
+    assert memoria[1] == ["TOTAL 13,00 €"]
+
+    datos = estadisticas_memoria_traduccion()
+    assert (datos["aciertos"], datos["fallos"]) == (3, 5)
+    assert datos["segmentos_por_idioma"] == {"en": 5}
+
+
+def test_cada_idioma_tiene_su_memoria(memoria):
+    traducir_texto_con_memoria(TEXTO, "inglés", "clave")
+    traducir_texto_con_memoria(TEXTO, "francés", "clave")
+    assert len(memoria) == 2
+
+
+def test_respuesta_que_no_cuadra_se_repite_por_mitades(memoria, monkeypatch):
+    peticiones = []
+
+    def generar(api_key, modelo, prompt, config=None):
+        segmentos = json.loads(prompt.rsplit("\n\n", 1)[1])
+        peticiones.append(segmentos)
+        # Con más de dos segmentos el modelo se "come" uno
+        traducciones = [s.upper() for s in segmentos]
+        return SimpleNamespace(text=json.dumps(traducciones[:-1] if len(segmentos) > 2 else traducciones))
+
+    monkeypatch.setattr(translator, "generar_contenido", generar)
+
+    segmentos = ["Uno.", "Dos.", "Tres.", "Cuatro."]
+    assert translator._traducir_segmentos(segmentos, "inglés", "clave") == [s.upper() for s in segmentos]
+    assert [len(p) for p in peticiones] == [4, 2, 2]
+
+    # En streaming: lo que llegó sale tal cual y lo que falta se pide aparte,
+    # pero el grupo no se guarda en la memoria
+    peticiones.clear()
+    assert traducir_texto_con_memoria(TEXTO, "inglés", "clave") == TEXTO.upper()
+    assert [len(p) for p in peticiones] == [4, 1]
+    assert estadisticas_memoria_traduccion()["segmentos_por_idioma"] == {}
+
+
+def test_elementos_json_segun_llegan():
+    trozos = ['["Ho', 'la", "a', 'dió', 's \\"x\\""', ', "fin"]']
+    elementos = translator._elementos_json(iter(trozos))
+    assert next(elementos) == "Hola"
+    assert list(elementos) == ['adiós "x"', "fin"]
+    assert list(translator._elementos_json(iter(["Esto no es JSON"]))) == []
+
+
+def test_grupos_con_contexto_previo(memoria, monkeypatch):
+    prompts = []
+    generar = translator.generar_contenido
+
+    def generar_vigilado(api_key, modelo, prompt, config=None):
+        prompts.append(prompt)
+        return generar(api_key, modelo, prompt, config)
+
+    monkeypatch.setattr(translator, "generar_contenido", generar_vigilado)
+
+    texto = "".join(f"Frase número {i}. " for i in range(40))
+    traduccion = "".join(translator.traducir_con_memoria(texto, "inglés", "clave", max_tokens=50))
+    assert traduccion == texto.upper()
+
+    # El primer grupo va sin contexto; los siguientes llevan el texto anterior
+    assert len(memoria) > 2
+    sin_contexto = [prompt for prompt in prompts if "Contexto previo" not in prompt]
+    assert len(sin_contexto) == 1 and '"Frase número 0."' in sin_contexto[0]
+    for prompt in prompts:
+        if prompt in sin_contexto:
+            continue
+        # El contexto termina justo antes del primer segmento del grupo
+        contexto, segmentos = prompt.split("Contexto previo:\n")[1].rsplit("\n\n", 1)
+        numero = int(json.loads(segmentos)[0].split()[-1].rstrip("."))
+        assert contexto.endswith(f"Frase número {numero - 1}.")
+
+
+def test_segmentos_normalizados():
+    assert hash_segmento("Hola   mundo.\n") == hash_segmento(" Hola mundo.")
+    assert hash_segmento("Hola mundo.") != hash_segmento("Hola mundo!")
@@ -0,0 +1,100 @@
+import sqlite3
+from datetime import date
+
+import pytest
+
+from utils import blob_store, gallery, stats
+from utils.migraciones import VERSION_ESQUEMA, aplicar_migraciones, version_esquema
+
+
+@pytest.fixture
+def base_datos(tmp_path, monkeypatch):
+    db = str(tmp_path / "users.db")
+    monkeypatch.setattr(gallery, "DB_NAME", db)
+    monkeypatch.setattr(stats, "DB_NAME", db)
+    monkeypatch.setattr(blob_store, "BLOB_DIR", str(tmp_path / "blobs"))
+    return db
+
+
+def _columnas(db, tabla):
+    conn = sqlite3.connect(db)
+    columnas = [fila[1] for fila in conn.execute(f"PRAGMA table_info({tabla})")]
+    conn.close()
+    return columnas
+
+
+def test_base_nueva_llega_a_la_ultima_version(base_datos):
+    assert aplicar_migraciones(base_datos) == VERSION_ESQUEMA
+    assert version_esquema(base_datos) == VERSION_ESQUEMA
+    assert aplicar_migraciones(base_datos) == 0
+
+    columnas = _columnas(base_datos, "imagenes")
+    for columna in ("imagen_hash", "miniatura_hash", "tipo", "fecha_epoch", "dia"):
+        assert columna in columnas
+
+    gallery.guardar_imagen(1, b"foto", "texto", tipo="ocr")
+    conn = sqlite3.connect(base_datos)
+    fecha, epoch, dia = conn.execute("SELECT fecha_subida, fecha_epoch, dia FROM imagenes").fetchone()
+    conn.close()
+    assert dia == date.today().isoformat() == fecha[:10]
+    assert isinstance(epoch, int)
+
+
+def test_base_anterior_sin_version_se_actualiza(base_datos):
+    # Esquema creado por init_gallery_db() antes de las migraciones
+    conn = sqlite3.connect(base_datos)
+    conn.execute("""
+        CREATE TABLE imagenes (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            usuario_id INTEGER NOT NULL,
+            imagen_hash TEXT NOT NULL,
+            miniatura_hash TEXT,
+            texto_original TEXT,
+            fecha_subida TEXT NOT NULL
+        )
+    """)
+    conn.execute(
+        "INSERT INTO imagenes (usuario_id, imagen_hash, texto_original, fecha_subida) "
+        "VALUES (1, 'h', 'ANÁLISIS (técnico):\n...', '2024-03-05T10:30:00')"
+    )
+    conn.commit()
+    conn.close()
+
+    aplicar_migraciones(base_datos)
+
+    conn = sqlite3.connect(base_datos)
+    tipo, epoch, dia = conn.execute("SELECT tipo, fecha_epoch, dia FROM imagenes").fetchone()
+    conn.close()
+    assert (tipo, dia) == ("analisis", "2024-03-05")
+    assert epoch > 0
+    assert version_esquema(base_datos) == VERSION_ESQUEMA
+
+
+def test_consultas_de_estadisticas_y_galeria_usan_indices(base_datos, monkeypatch):
+    aplicar_migraciones(base_datos)
+
+    consultas = []
+    conectar = sqlite3.connect
+
+    def conectar_con_traza(*args, **kwargs):
+        conn = conectar(*args, **kwargs)
+        conn.set_trace_callback(consultas.append)
+        return conn
+
+    monkeypatch.setattr(sqlite3, "connect", conectar_con_traza)
+    stats.obtener_estadisticas_usuario(1)
+    gallery.listar_imagenes_usuario(
+        1, cursor_pagina=("2024-01-01T00:00:00", 10), desde=date(2023, 1, 1), hasta=date(2024, 1, 1)
+    )
+    monkeypatch.setattr(sqlite3, "connect", conectar)
+
+    selects = [sql for sql in consultas if sql.lstrip().upper().startswith("SELECT")]
+    assert len(selects) == 3
+
+    conn = sqlite3.connect(base_datos)
+    for sql in selects:
+        plan = [fila[3] for fila in conn.execute("EXPLAIN QUERY PLAN " + sql)]
+        # Nada de recorrer la tabla o un índice entero, ni ordenar aparte
+        assert not [paso for paso in plan if paso.startswith("SCAN")], (sql, plan)
+        assert not [paso for paso in plan if "TEMP B-TREE" in paso], (sql, plan)
+    conn.close()
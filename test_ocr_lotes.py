@@ -0,0 +1,51 @@
+import io
+import threading
+import time
+
+from utils import gemini_vision
+from utils.gemini_vision import extraer_texto_lote
+
+
+def _ocr_falso(monkeypatch, segundos=0.05):
+    estado = {"en_curso": 0, "maximo": 0}
+    lock = threading.Lock()
+
+    def extraer(archivo, api_key):
+        with lock:
+            estado["en_curso"] += 1
+            estado["maximo"] = max(estado["maximo"], estado["en_curso"])
+        time.sleep(segundos)
+        with lock:
+            estado["en_curso"] -= 1
+        datos = archivo.getvalue()
+        if datos == b"rota":
+            raise ValueError("imagen no válida")
+        return datos.decode()
+
+    monkeypatch.setattr(gemini_vision, "extraer_texto_imagen", extraer)
+    monkeypatch.setattr(gemini_vision, "crear_miniatura", lambda datos: b"mini")
+    return estado
+
+
+def test_lote_continua_tras_un_fallo(monkeypatch):
+    _ocr_falso(monkeypatch)
+    archivos = [io.BytesIO(b"a"), io.BytesIO(b"rota"), io.BytesIO(b"c")]
+
+    resultados = sorted(extraer_texto_lote(archivos, "clave-lote"), key=lambda r: r["indice"])
+
+    assert [r["texto"] for r in resultados] == ["a", None, "c"]
+    assert resultados[1]["error"] == "imagen no válida"
+    assert resultados[0]["miniatura"] == b"mini"
+
+
+def test_limite_de_trabajadores_y_escalado(monkeypatch):
+    estado = _ocr_falso(monkeypatch, segundos=0.1)
+    archivos = [io.BytesIO(str(i).encode()) for i in range(8)]
+
+    inicio = time.perf_counter()
+    assert len(list(extraer_texto_lote(archivos, "clave-limitada", max_trabajadores=4))) == 8
+    segundos = time.perf_counter() - inicio
+
+    # 8 archivos de 0,1 s con 4 a la vez: unas dos rondas, no ocho
+    assert estado["maximo"] == 4
+    assert segundos < 0.5
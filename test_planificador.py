@@ -0,0 +1,140 @@
+import threading
+import time
+
+import pytest
+from google.genai import errors
+
+from utils import planificador
+from utils.planificador import Planificador, como_usuario
+
+
+def _error_api(codigo):
+    return errors.APIError(codigo, {"error": {"message": "prueba", "status": "X"}})
+
+
+def test_reparto_justo_entre_usuarios():
+    # Una petición cada 0,2 s: se ve el orden de salida
+    plan = Planificador(rpm=300, tpm=0, max_simultaneas=1)
+    plan._rpm.tokens = 0
+    orden = []
+    hilos = []
+
+    def lanzar(usuario, etiqueta):
+        with como_usuario(usuario):
+            plan.ejecutar(lambda: orden.append(etiqueta))
+
+    for i in range(4):
+        hilos.append(threading.Thread(target=lanzar, args=("lote", f"lote{i}")))
+        hilos[-1].start()
+        time.sleep(0.01)
+    hilos.append(threading.Thread(target=lanzar, args=("interactivo", "interactivo")))
+    hilos[-1].start()
+
+    time.sleep(0.05)
+    assert plan.estadisticas()["en_cola_por_usuario"] == {"lote": 4, "interactivo": 1}
+
+    for hilo in hilos:
+        hilo.join()
+
+    # El usuario interactivo no espera a que termine todo el lote
+    assert orden.index("interactivo") <= 1
+    assert plan.estadisticas()["max_en_cola"] == 5
+
+
+def test_reintenta_429_y_vacia_la_cubeta(monkeypatch):
+    monkeypatch.setattr(planificador, "ESPERA_BASE_SEGUNDOS", 0.01)
+    monkeypatch.setattr(planificador, "ESPERA_MAXIMA_SEGUNDOS", 0.01)
+    plan = Planificador(rpm=0, tpm=0)
+    respuestas = [_error_api(429), _error_api(503), "ok"]
+
+    def llamada():
+        respuesta = respuestas.pop(0)
+        if isinstance(respuesta, Exception):
+            raise respuesta
+        return respuesta
+
+    assert plan.ejecutar(llamada) == "ok"
+
+    datos = plan.estadisticas()
+    assert (datos["reintentos"], datos["limites_429"], datos["completadas"]) == (2, 1, 1)
+
+
+def test_error_no_transitorio_no_se_reintenta():
+    plan = Planificador(rpm=0, tpm=0)
+    llamadas = []
+
+    def llamada():
+        llamadas.append(1)
+        raise _error_api(400)
+
+    with pytest.raises(errors.APIError):
+        plan.ejecutar(llamada)
+    assert len(llamadas) == 1
+    assert plan.estadisticas()["fallidas"] == 1
+
+
+def test_sobrecarga_rechaza_en_vez_de_esperar_sin_fin(monkeypatch):
+    monkeypatch.setattr(planificador, "MAX_ESPERA_COLA_SEGUNDOS", 0.5)
+    # Cuota de TPM que tardaría un minuto en recargar
+    plan = Planificador(rpm=0, tpm=1000)
+    plan._tpm.tokens = 0
+
+    inicio = time.perf_counter()
+    with pytest.raises(planificador.ServicioSaturadoError):
+        plan.ejecutar(lambda: "ok", tokens=1000)
+
+    assert time.perf_counter() - inicio < 0.5
+    assert plan.estadisticas()["rechazadas_por_espera"] == 1
+
+
+def test_stream_reintenta_solo_antes_del_primer_fragmento(monkeypatch):
+    monkeypatch.setattr(planificador, "ESPERA_BASE_SEGUNDOS", 0.01)
+    plan = Planificador(rpm=0, tpm=0, max_simultaneas=1)
+    aperturas = []
+
+    def abrir():
+        aperturas.append(1)
+        if len(aperturas) == 1:
+            raise _error_api(503)
+        return iter(["a", "b"])
+
+    assert list(plan.ejecutar_stream(abrir)) == ["a", "b"]
+    assert len(aperturas) == 2
+    # La plaza se ha liberado al terminar
+    assert plan.estadisticas()["en_curso"] == 0
+
+
+def test_turnos_con_la_concurrencia_como_limite():
+    # Sin límite de cuota: solo limita la plaza única
+    plan = Planificador(rpm=0, tpm=0, max_simultaneas=1)
+    liberar = threading.Event()
+    orden = []
+    hilos = []
+
+    def lanzar(usuario, funcion):
+        with como_usuario(usuario):
+            plan.ejecutar(funcion)
+
+    hilos.append(threading.Thread(target=lanzar, args=("a", liberar.wait)))
+    hilos[-1].start()
+    time.sleep(0.05)
+
+    # Ráfaga de "a" y después las peticiones de "b"
+    for etiqueta in ("a0", "a1", "a2", "b0", "b1", "b2"):
+        hilos.append(threading.Thread(
+            target=lanzar, args=(etiqueta[0], lambda e=etiqueta: orden.append(e))
+        ))
+        hilos[-1].start()
+        time.sleep(0.01)
+
+    # Esperan en la cola justa, sin haber gastado su turno
+    time.sleep(0.05)
+    try:
+        assert plan.estadisticas()["en_cola_por_usuario"] == {"a": 3, "b": 3}
+    finally:
+        liberar.set()
+        for hilo in hilos:
+            hilo.join()
+
+    assert orden == ["a0", "b0", "a1", "b1", "a2", "b2"]
+    assert plan.estadisticas()["en_curso"] == 0
@@ -0,0 +1,80 @@
+import io
+import os
+
+import pytest
+from PIL import Image
+
+from utils.procesado_imagen import (
+    leer_imagen,
+    preparar_imagen,
+    parte_imagen,
+    medir_memoria_pico,
+)
+
+
+def _codificar(image, formato, **kwargs):
+    buffer = io.BytesIO()
+    image.save(buffer, format=formato, **kwargs)
+    return buffer.getvalue()
+
+
+def _foto(ancho, alto):
+    # Ruido: se comprime mal en PNG, como una foto real
+    return Image.frombytes("RGB", (ancho, alto), os.urandom(ancho * alto * 3))
+
+
+def test_jpeg_pequeno_se_envia_sin_recodificar():
+    datos = _codificar(_foto(400, 300), "JPEG")
+    preparada = preparar_imagen(datos, "descripcion")
+
+    assert preparada["codificacion"] == "original"
+    assert preparada["datos"] is datos
+    assert preparada["mime_type"] == "image/jpeg"
+
+
+def test_png_grande_se_reduce_a_jpeg():
+    datos = _codificar(_foto(2400, 1800), "PNG")
+    preparada = preparar_imagen(datos, "social")
+
+    assert preparada["codificacion"] == "jpeg"
+    assert max(preparada["ancho"], preparada["alto"]) == 1024
+    assert preparada["bytes_enviados"] < preparada["bytes_originales"]
+
+
+def test_ocr_conserva_mas_resolucion_que_social():
+    datos = _codificar(_foto(2400, 1800), "PNG")
+
+    assert preparar_imagen(datos, "ocr")["ancho"] == 2400
+    assert preparar_imagen(datos, "social")["ancho"] == 1024
+
+
+def test_orientacion_exif_aplicada():
+    exif = Image.Exif()
+    exif[0x0112] = 6  # rotada 90º
+    datos = _codificar(_foto(200, 100), "JPEG", exif=exif)
+    preparada = preparar_imagen(datos, "ocr")
+
+    assert (preparada["ancho"], preparada["alto"]) == (100, 200)
+
+
+def test_transparencia_se_codifica_en_webp():
+    datos = _codificar(Image.new("RGBA", (3000, 100), (255, 0, 0, 128)), "PNG")
+    assert preparar_imagen(datos, "social")["mime_type"] == "image/webp"
+
+
+def test_leer_imagen_rechaza_archivos_grandes():
+    with pytest.raises(ValueError):
+        leer_imagen(io.BytesIO(b"0" * (6 * 1024 * 1024)))
+
+
+def test_ruta_directa_no_copia_la_imagen():
+    datos = _codificar(_foto(1200, 900), "JPEG", quality=95)
+    subida = io.BytesIO(datos)
+
+    def enviar():
+        return parte_imagen(preparar_imagen(leer_imagen(subida), "ocr"))
+
+    parte, pico = medir_memoria_pico(enviar)
+
+    assert parte.inline_data.data is datos
+    assert pico < len(datos) // 10
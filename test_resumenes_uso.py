@@ -0,0 +1,76 @@
+import sqlite3
+
+import pytest
+
+from utils import blob_store, gallery, stats
+from utils.gallery import eliminar_imagenes, guardar_imagenes
+from utils.migraciones import aplicar_migraciones
+from utils.resumenes_uso import reconstruir_resumenes
+
+
+@pytest.fixture
+def base_datos(tmp_path, monkeypatch):
+    db = str(tmp_path / "users.db")
+    monkeypatch.setattr(gallery, "DB_NAME", db)
+    monkeypatch.setattr(stats, "DB_NAME", db)
+    monkeypatch.setattr(blob_store, "BLOB_DIR", str(tmp_path / "blobs"))
+    aplicar_migraciones(db)
+    return db
+
+
+def _resumenes(db):
+    conn = sqlite3.connect(db)
+    filas = (
+        conn.execute("SELECT * FROM uso_usuario ORDER BY usuario_id").fetchall(),
+        conn.execute("SELECT * FROM uso_usuario_dia ORDER BY usuario_id, dia").fetchall(),
+    )
+    conn.close()
+    return filas
+
+
+def _imagen(i, texto="abc", tipo="ocr"):
+    return {"imagen_bytes": str(i).encode(), "texto_original": texto, "miniatura": None, "tipo": tipo}
+
+
+def test_triggers_coinciden_con_la_reconstruccion(base_datos):
+    guardar_imagenes(1, [_imagen(i, "x" * i) for i in range(5)])
+    guardar_imagenes(1, [_imagen(9, "hola", "social")])
+    guardar_imagenes(2, [_imagen(7, None, "descripcion")])
+
+    conn = sqlite3.connect(base_datos)
+    conn.execute("UPDATE imagenes SET texto_original = 'editado', dia = '2020-01-01' WHERE id = 2")
+    conn.commit()
+    conn.close()
+    eliminar_imagenes([3], 1)
+
+    incremental = _resumenes(base_datos)
+    reconstruir_resumenes(base_datos)
+    assert _resumenes(base_datos) == incremental
+
+    datos = stats.obtener_estadisticas_usuario(1)
+    assert datos["total_imagenes"] == 5
+    assert datos["por_tipo"] == {"ocr": 4, "descripcion": 0, "analisis": 0, "social": 1}
+    assert datos["caracteres_texto"] == 0 + 7 + 3 + 4 + 4
+
+
+def test_borrar_todo_elimina_el_resumen(base_datos):
+    guardar_imagenes(1, [_imagen(1), _imagen(2)])
+    eliminar_imagenes([1, 2], 1)
+
+    assert _resumenes(base_datos) == ([], [])
+    datos = stats.obtener_estadisticas_usuario(1)
+    assert (datos["total_imagenes"], datos["ultima_actividad"], datos["actividad_30_dias"]) == (0, None, [])
+
+
+def test_ultima_actividad_se_recalcula_al_borrar(base_datos):
+    guardar_imagenes(1, [_imagen(1)])
+    conn = sqlite3.connect(base_datos)
+    conn.execute("INSERT INTO usuarios (id, email, password_hash, fecha_registro) VALUES (1, 'a@b.c', 'x', '2020-01-01')")
+    conn.execute("UPDATE imagenes SET fecha_subida = '2020-01-01T00:00:00' WHERE id = 1")
+    conn.commit()
+    conn.close()
+    guardar_imagenes(1, [_imagen(2)])
+
+    eliminar_imagenes([2], 1)
+    assert stats.obtener_estadisticas_usuario(1)["ultima_actividad"] == "2020-01-01T00:00:00"
+    assert stats.exportar_datos_usuario(1)["estadisticas"]["primera_imagen"] == "2020-01-01T00:00:00"
@@ -0,0 +1,101 @@
+import time
+from types import SimpleNamespace
+
+import pytest
+from google.genai import errors
+
+from utils import salud_modelos
+from utils.salud_modelos import generar_con_respaldo, modelo_disponible
+
+MODELOS = ["principal", "respaldo-1", "respaldo-2"]
+
+
+@pytest.fixture
+def modelos_falsos(monkeypatch):
+    monkeypatch.setattr(salud_modelos, "_modelos", {})
+    monkeypatch.setattr(salud_modelos, "_ultimo_bueno", {})
+    estado = {"caidos": set(), "sin_cuota": set(), "lentos": {}, "llamadas": []}
+
+    def generar(api_key, modelo, contenidos, config=None, intentos=None):
+        estado["llamadas"].append(modelo)
+        time.sleep(estado["lentos"].get(modelo, 0))
+        if modelo in estado["caidos"]:
+            raise errors.APIError(503, {"error": {"message": "caído", "status": "UNAVAILABLE"}})
+        if modelo in estado["sin_cuota"]:
+            raise errors.APIError(429, {"error": {"message": "cuota", "status": "RESOURCE_EXHAUSTED"}})
+        return SimpleNamespace(text=modelo)
+
+    monkeypatch.setattr(salud_modelos, "generar_contenido", generar)
+    return estado
+
+
+def test_se_empieza_por_el_ultimo_modelo_bueno(modelos_falsos):
+    modelos_falsos["caidos"] = {"principal", "respaldo-1"}
+    assert generar_con_respaldo("clave", MODELOS, "hola")[0] == "respaldo-2"
+
+    modelos_falsos["llamadas"].clear()
+    assert generar_con_respaldo("clave", MODELOS, "hola")[0] == "respaldo-2"
+    assert modelos_falsos["llamadas"] == ["respaldo-2"]
+
+
+def test_modelo_caido_se_salta_con_el_circuito_abierto(modelos_falsos, monkeypatch):
+    monkeypatch.setattr(salud_modelos, "FALLOS_PARA_ABRIR", 2)
+    monkeypatch.setattr(salud_modelos, "SEGUNDOS_ULTIMO_BUENO", 0)
+    modelos_falsos["caidos"] = {"principal", "respaldo-1"}
+
+    for _ in range(2):
+        assert generar_con_respaldo("clave", MODELOS, "hola")[0] == "respaldo-2"
+
+    # Ya no se prueban los caídos: una sola llamada
+    modelos_falsos["llamadas"].clear()
+    assert generar_con_respaldo("clave", MODELOS, "hola")[0] == "respaldo-2"
+    assert modelos_falsos["llamadas"] == ["respaldo-2"]
+    assert salud_modelos.estado_modelos()["modelos"]["principal"]["estado"] == salud_modelos.ABIERTO
+
+
+def test_cuota_agotada_no_abre_el_circuito(modelos_falsos, monkeypatch):
+    monkeypatch.setattr(salud_modelos, "FALLOS_PARA_ABRIR", 1)
+    monkeypatch.setattr(salud_modelos, "SEGUNDOS_ULTIMO_BUENO", 0)
+    modelos_falsos["sin_cuota"] = {"principal"}
+
+    for _ in range(3):
+        assert generar_con_respaldo("clave", MODELOS, "hola")[0] == "respaldo-1"
+
+    assert modelo_disponible("principal")
+    assert salud_modelos.estado_modelos()["modelos"]["principal"]["estado"] == salud_modelos.CERRADO
+
+
+def test_semiabierto_deja_pasar_una_prueba(modelos_falsos, monkeypatch):
+    monkeypatch.setattr(salud_modelos, "FALLOS_PARA_ABRIR", 1)
+    monkeypatch.setattr(salud_modelos, "SEGUNDOS_CIRCUITO_ABIERTO", 0.05)
+    modelos_falsos["caidos"] = {"principal"}
+
+    generar_con_respaldo("clave", ["principal"] + MODELOS[1:], "hola", cadena="otra")
+    assert not modelo_disponible("principal")
+
+    time.sleep(0.06)
+    assert modelo_disponible("principal")
+    # Mientras la prueba está en curso, nadie más pasa
+    assert not modelo_disponible("principal")
+
+    salud_modelos.registrar_exito("principal", 0.1)
+    assert modelo_disponible("principal")
+
+
+def test_modelo_inexistente_no_se_reintenta_en_horas(modelos_falsos):
+    salud_modelos.registrar_fallo("viejo", errors.APIError(404, {"error": {"message": "no existe"}}))
+    assert not modelo_disponible("viejo")
+    assert salud_modelos._modelos["viejo"].abierto_hasta - time.monotonic() > 3600
+
+
+def test_cobertura_tras_el_percentil_de_latencia(modelos_falsos, monkeypatch):
+    monkeypatch.setattr(salud_modelos, "COBERTURA_ACTIVA", True)
+    for _ in range(salud_modelos.MIN_MUESTRAS_COBERTURA):
+        salud_modelos.registrar_exito("principal", 0.05)
+    modelos_falsos["lentos"] = {"principal": 1.0}
+
+    inicio = time.perf_counter()
+    modelo, respuesta = generar_con_respaldo("clave", MODELOS, "hola")
+
+    assert (modelo, respuesta.text) == ("respaldo-1", "respaldo-1")
+    assert time.perf_counter() - inicio < 0.5
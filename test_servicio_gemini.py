@@ -0,0 +1,63 @@
+import asyncio
+import io
+import threading
+import time
+
+import pytest
+
+from utils import servicio_gemini
+from utils.servicio_gemini import analizar_concurrente, analizar_todo
+
+
+@pytest.fixture
+def tareas_lentas(monkeypatch):
+    estado = {"en_curso": 0, "maximo": 0}
+    lock = threading.Lock()
+
+    def tarea(segundos, fallar=False):
+        def funcion(imagen_subida, api_key, **opciones):
+            with lock:
+                estado["en_curso"] += 1
+                estado["maximo"] = max(estado["maximo"], estado["en_curso"])
+            time.sleep(segundos)
+            with lock:
+                estado["en_curso"] -= 1
+            if fallar:
+                raise RuntimeError("cuota agotada")
+            return f"{imagen_subida.read().decode()}:{opciones.get('nivel', '-')}"
+        return funcion
+
+    monkeypatch.setattr(servicio_gemini, "TAREAS", {
+        "rapida": (tarea(0.05), {}),
+        "media": (tarea(0.15), {"nivel": "normal"}),
+        "lenta": (tarea(0.3), {}),
+        "rota": (tarea(0.1, fallar=True), {}),
+    })
+    return estado
+
+
+def test_tardan_lo_que_la_mas_lenta_y_llegan_en_orden(tareas_lentas):
+    inicio = time.perf_counter()
+    resultados = analizar_todo(
+        io.BytesIO(b"img"), "clave", opciones={"media": {"nivel": "alto"}}
+    )
+    segundos = time.perf_counter() - inicio
+
+    assert segundos < 0.5  # la suma secuencial sería 0.6
+    assert list(resultados) == ["rapida", "rota", "media", "lenta"]
+    assert resultados["media"]["resultado"] == "img:alto"
+    assert resultados["rota"]["error"] == "cuota agotada"
+    assert resultados["lenta"]["error"] is None
+
+
+def test_limite_de_peticiones_en_curso(tareas_lentas):
+    async def recoger():
+        return [item async for item in analizar_concurrente(io.BytesIO(b"img"), "clave", max_simultaneas=2)]
+
+    assert len(asyncio.run(recoger())) == 4
+    assert tareas_lentas["maximo"] == 2
+
+
+def test_tarea_desconocida(tareas_lentas):
+    with pytest.raises(ValueError):
+        analizar_todo(io.BytesIO(b"img"), "clave", tareas=["rapida", "magia"])
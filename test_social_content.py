@@ -0,0 +1,100 @@
+import io
+
+import pytest
+from google.genai import errors
+from PIL import Image
+
+from utils import cache_resultados, social_content
+from utils.planificador import ServicioSaturadoError
+from utils.social_content import generar_contenido_redes
+
+
+class _Respuesta:
+    def __init__(self, text):
+        self.text = text
+
+
+def _imagen():
+    buffer = io.BytesIO()
+    Image.new("RGB", (32, 32), (0, 128, 255)).save(buffer, "PNG")
+    buffer.seek(0)
+    return buffer
+
+
+@pytest.fixture
+def modelo_falso(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache_resultados, "CACHE_DB", str(tmp_path / "cache.db"))
+    llamadas = []
+    respuestas = []
+
+    def generar(api_key, modelos, contenidos, config=None, cadena=None):
+        llamadas.append(1)
+        respuesta = respuestas.pop(0)
+        if isinstance(respuesta, Exception):
+            raise respuesta
+        return respuesta
+
+    monkeypatch.setattr(social_content, "generar_con_respaldo", generar)
+    return llamadas, respuestas
+
+
+def test_cola_saturada_no_se_sustituye_por_contenido_generico(modelo_falso):
+    _, respuestas = modelo_falso
+    respuestas.append(ServicioSaturadoError("❌ Hay demasiadas peticiones en cola."))
+
+    with pytest.raises(ServicioSaturadoError):
+        generar_contenido_redes(_imagen(), "clave")
+
+
+def test_cuota_agotada_avisa_de_servicio_ocupado(modelo_falso):
+    _, respuestas = modelo_falso
+    cuota = errors.APIError(429, {"error": {"message": "cuota", "status": "RESOURCE_EXHAUSTED"}})
+    try:
+        raise RuntimeError("❌ No se pudo generar contenido") from cuota
+    except RuntimeError as e:
+        respuestas.append(e)
+
+    with pytest.raises(ServicioSaturadoError):
+        generar_contenido_redes(_imagen(), "clave")
+
+
+def test_otros_errores_usan_el_contenido_generico(modelo_falso):
+    _, respuestas = modelo_falso
+    respuestas.append(RuntimeError("❌ Todos los modelos de respaldo están marcados como no disponibles"))
+
+    contenido = generar_contenido_redes(_imagen(), "clave", estilo="creativo")
+    assert contenido["titulo"] == social_content.generar_respuesta_fallback("creativo", "instagram")["titulo"]
+
+
+def test_solo_se_cachean_respuestas_json_validas(modelo_falso):
+    llamadas, respuestas = modelo_falso
+    respuestas += [
+        (social_content.MODELO_SOCIAL, _Respuesta("Esto no es JSON")),
+        (social_content.MODELO_SOCIAL, _Respuesta('{"titulo": "Hola", "contenido_post": "Post", "hashtags": []}')),
+    ]
+
+    manual = generar_contenido_redes(_imagen(), "clave")
+    assert manual["contenido_post"] == "Esto no es JSON"
+
+    # La respuesta mal formada no se sirve desde la caché
+    assert generar_contenido_redes(_imagen(), "clave")["titulo"] == "Hola"
+    assert generar_contenido_redes(_imagen(), "clave")["titulo"] == "Hola"
+    assert len(llamadas) == 2
+
+
+def test_resultado_de_modelo_de_respaldo_no_se_cachea(modelo_falso):
+    llamadas, respuestas = modelo_falso
+    json_valido = '{"titulo": "Hola", "contenido_post": "Post", "hashtags": []}'
+    respuestas += [
+        (social_content.MODELOS_RESPALDO_SOCIAL[0], _Respuesta(json_valido)),
+        (social_content.MODELO_SOCIAL, _Respuesta(json_valido)),
+    ]
+
+    respaldo = generar_contenido_redes(_imagen(), "clave")
+    assert respaldo["modelo_usado"] == social_content.MODELOS_RESPALDO_SOCIAL[0]
+
+    # Con el modelo principal de vuelta se le pregunta a él
+    principal = generar_contenido_redes(_imagen(), "clave")
+    assert "modelo_usado" not in principal
+    assert generar_contenido_redes(_imagen(), "clave") == principal
+    assert len(llamadas) == 2
@@ -0,0 +1,68 @@
+import io
+import time
+from types import SimpleNamespace
+
+from PIL import Image
+
+from utils import assistant, cache_resultados, gemini_client
+from utils.assistant import describir_imagen_stream
+from utils.benchmark import medir_stream
+
+
+class _ClienteStream:
+    def __init__(self, fragmentos, pausa=0.0):
+        self.models = self
+        self.llamadas = 0
+        self._fragmentos = fragmentos
+        self._pausa = pausa
+
+    def generate_content_stream(self, model, contents, config=None):
+        self.llamadas += 1
+        for texto in self._fragmentos:
+            time.sleep(self._pausa)
+            yield SimpleNamespace(text=texto)
+
+
+def _png():
+    buffer = io.BytesIO()
+    Image.new("RGB", (32, 32), "white").save(buffer, format="PNG")
+    return io.BytesIO(buffer.getvalue())
+
+
+def test_stream_guarda_en_cache_al_terminar(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache_resultados, "CACHE_DB", str(tmp_path / "cache.db"))
+    cliente = _ClienteStream(["Una ", "playa ", None, "al atardecer."])
+    monkeypatch.setattr(gemini_client, "obtener_cliente", lambda api_key: cliente)
+
+    assert "".join(describir_imagen_stream(_png(), "clave")) == "Una playa al atardecer."
+
+    # Segunda vez: de la caché, en un solo fragmento y sin llamar al modelo
+    assert list(describir_imagen_stream(_png(), "clave")) == ["Una playa al atardecer."]
+    assert cliente.llamadas == 1
+
+
+def test_stream_cortado_no_se_guarda(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache_resultados, "CACHE_DB", str(tmp_path / "cache.db"))
+    cliente = _ClienteStream(["uno ", "dos ", "tres"])
+    monkeypatch.setattr(gemini_client, "obtener_cliente", lambda api_key: cliente)
+
+    fragmentos = assistant.analizar_imagen_avanzado_stream(_png(), "clave")
+    assert next(fragmentos) == "uno "
+    fragmentos.close()
+
+    assert list(assistant.analizar_imagen_avanzado_stream(_png(), "clave")) == ["uno ", "dos ", "tres"]
+    assert cliente.llamadas == 2
+
+
+def test_ttft_se_mide_aparte_del_total():
+    def fragmentos():
+        time.sleep(0.05)
+        yield "primero"
+        time.sleep(0.2)
+        yield "segundo"
+
+    medida = medir_stream(fragmentos)
+
+    assert 0.05 <= medida["ttft_s"] < 0.2
+    assert medida["total_s"] >= 0.25
+    assert (medida["fragmentos"], medida["caracteres"]) == (2, 14)
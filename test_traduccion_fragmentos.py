@@ -0,0 +1,84 @@
+import random
+import threading
+import time
+from types import SimpleNamespace
+
+from utils import translator
+from utils.translator import dividir_texto, traducir_texto_largo
+
+
+def _documento(paginas=20):
+    parrafo = "Esta es una frase de prueba. " * 20
+    return "\n\n".join(f"Página {i}. {parrafo.strip()}" for i in range(paginas)) + "\n"
+
+
+def _traductor_falso(monkeypatch, segundos=0.05):
+    estado = {"prompts": [], "en_curso": 0, "maximo": 0}
+    lock = threading.Lock()
+
+    def generar(api_key, modelo, prompt, config=None):
+        with lock:
+            estado["prompts"].append(prompt)
+            estado["en_curso"] += 1
+            estado["maximo"] = max(estado["maximo"], estado["en_curso"])
+        time.sleep(segundos * random.uniform(0.5, 1.5))
+        with lock:
+            estado["en_curso"] -= 1
+        if "Texto a traducir:\n" in prompt:
+            texto = prompt.split("Texto a traducir:\n", 1)[1]
+        else:
+            texto = prompt.split("\n\n", 1)[1]
+        return SimpleNamespace(text=texto.upper() + "\n")
+
+    monkeypatch.setattr(translator, "generar_contenido", generar)
+    monkeypatch.setattr(translator, "registrar_traduccion", lambda *args, **kwargs: None)
+    return estado
+
+
+def test_dividir_respeta_limite_y_texto_original():
+    texto = _documento() + "x" * 9000
+
+    fragmentos = dividir_texto(texto, max_tokens=500)
+
+    assert "".join(fragmentos) == texto
+    assert all(len(f) <= 2000 for f in fragmentos)
+    # Se corta al final de un párrafo...
+    assert all(f.endswith("\n\n") for f in fragmentos[:6])
+
+    # ... o, si un párrafo no cabe, al final de una frase
+    parrafo = "".join(f"Frase número {i}. " for i in range(300))
+    assert all(f.endswith(". ") for f in dividir_texto(parrafo, max_tokens=200)[:-1])
+
+
+def test_texto_largo_en_paralelo_y_en_orden(monkeypatch):
+    estado = _traductor_falso(monkeypatch)
+    texto = _documento()
+    fragmentos = dividir_texto(texto, 300)
+
+    inicio = time.perf_counter()
+    traduccion = traducir_texto_largo(texto, "inglés", "clave", max_tokens=300)
+    segundos = time.perf_counter() - inicio
+
+    assert traduccion == texto.upper()
+    assert len(estado["prompts"]) == len(fragmentos) > 6
+    assert estado["maximo"] > 1
+    # Unas pocas rondas de 0,05 s, no una por fragmento
+    assert segundos < 0.05 * len(fragmentos) / 2
+
+
+def test_solape_pasa_contexto_sin_traducirlo(monkeypatch):
+    estado = _traductor_falso(monkeypatch, segundos=0)
+    texto = _documento(4)
+
+    traduccion = "".join(translator.traducir_por_fragmentos(texto, "inglés", "clave", max_tokens=200, solape=True))
+
+    assert traduccion == texto.upper()
+    assert "Contexto previo" not in estado["prompts"][0]
+    assert all("Contexto previo" in p for p in estado["prompts"][1:])
+
+
+def test_texto_corto_igual_que_una_sola_llamada(monkeypatch):
+    estado = _traductor_falso(monkeypatch, segundos=0)
+
+    assert traducir_texto_largo("Hola, mundo.", "inglés", "clave") == "HOLA, MUNDO.\n"
+    assert estado["prompts"] == [translator._prompt_traduccion("Hola, mundo.", "inglés")]
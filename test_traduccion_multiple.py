@@ -0,0 +1,74 @@
+import json
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from utils import blob_store, gallery, translator
+from utils.gallery import eliminar_imagenes, guardar_imagenes, obtener_traducciones_imagen
+from utils.translator import traducir_imagenes, traducir_multiples
+
+
+@pytest.fixture
+def modelo_falso(monkeypatch):
+    llamadas = []
+    lock = threading.Lock()
+
+    def generar(api_key, modelo, prompt, config=None):
+        with lock:
+            llamadas.append(config)
+        time.sleep(0.1)
+        texto = prompt.rsplit("\n\n", 1)[1]
+        codigos = config["response_schema"]["property_ordering"]
+        return SimpleNamespace(text=json.dumps({codigo: f"[{codigo}] {texto}" for codigo in codigos}))
+
+    monkeypatch.setattr(translator, "generar_contenido", generar)
+    monkeypatch.setattr(translator, "registrar_traduccion", lambda *args, **kwargs: None)
+    return llamadas
+
+
+def test_varios_idiomas_en_una_peticion(modelo_falso):
+    traducciones = traducir_multiples("Hola, mundo.\n", ["Inglés", "catalán", "francés"], "clave")
+
+    assert traducciones == {
+        "inglés": "[en] Hola, mundo.\n",
+        "catalán": "[ca] Hola, mundo.\n",
+        "francés": "[fr] Hola, mundo.\n",
+    }
+    assert len(modelo_falso) == 1
+
+
+def test_idioma_no_soportado_antes_de_llamar(modelo_falso):
+    with pytest.raises(ValueError):
+        traducir_multiples("Hola", ["inglés", "klingon"], "clave")
+    assert modelo_falso == []
+
+
+def test_traducir_galeria_en_paralelo_y_guardar(tmp_path, monkeypatch, modelo_falso):
+    monkeypatch.setattr(gallery, "DB_NAME", str(tmp_path / "users.db"))
+    monkeypatch.setattr(blob_store, "BLOB_DIR", str(tmp_path / "blobs"))
+    gallery.init_gallery_db()
+
+    guardar_imagenes(1, [
+        {"imagen_bytes": str(i).encode(), "texto_original": f"texto {i}", "miniatura": None}
+        for i in range(6)
+    ] + [{"imagen_bytes": b"vacia", "texto_original": "", "miniatura": None}])
+    ids = list(range(1, 8))
+
+    inicio = time.perf_counter()
+    resultados = list(traducir_imagenes(1, ids, ["inglés", "español"], "clave"))
+    segundos = time.perf_counter() - inicio
+
+    # La imagen sin texto se omite; el resto, a la vez (no 6 x 0,1 s)
+    assert len(resultados) == 6 and not any(r["error"] for r in resultados)
+    assert segundos < 0.4
+    assert obtener_traducciones_imagen(3, 1) == {"en": "[en] texto 2", "es": "[es] texto 2"}
+
+    # Otro usuario no ve ni traduce imágenes ajenas
+    assert obtener_traducciones_imagen(3, 2) == {}
+    assert list(traducir_imagenes(2, ids, ["inglés"], "clave")) == []
+
+    eliminar_imagenes([3], 1)
+    with gallery.conexion(gallery.DB_NAME) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM traducciones WHERE imagen_id = 3").fetchone()[0] == 0
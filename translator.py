@@ -1,4 +1,38 @@
-from google import genai
+import contextvars
+import json
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from utils.gemini_client import generar_contenido, generar_en_stream
+from utils.memoria_traduccion import buscar_traducciones, guardar_traducciones, hash_segmento
+from utils.gallery import obtener_textos_imagenes, guardar_traducciones_imagen
+from utils.eventos_traduccion import registrar_traduccion
+
+MODELO_TRADUCCION = "gemini-2.5-flash"
+
+# =========================
+# Textos largos: traducción por fragmentos
+# =========================
+# Tamaño máximo de cada fragmento (tokens aproximados, ~4 caracteres cada uno)
+TOKENS_POR_FRAGMENTO = int(os.getenv("GEMINI_TRADUCCION_TOKENS_FRAGMENTO", "1500"))
+# Fragmentos traducidos a la vez (la cuota la sigue poniendo el planificador)
+MAX_FRAGMENTOS_SIMULTANEOS = int(os.getenv("GEMINI_TRADUCCION_SIMULTANEOS", "6"))
+# Caracteres del fragmento anterior que se pasan como contexto con solape=True
+CARACTERES_SOLAPE = 300
+
+_FIN_PARRAFO = re.compile(r"\n\s*\n")
+_FIN_FRASE = re.compile(r"(?<=[.!?…。！？])\s+")
+# Segmentos de la memoria de traducción: frases y líneas
+_FIN_SEGMENTO = re.compile(r"(?<=[.!?…。！？])\s+|\n\s*")
+
+# Segmentos pendientes por petición a la memoria de traducción
+MAX_SEGMENTOS_POR_PETICION = 100
+CONFIG_SEGMENTOS = {
+    "response_mime_type": "application/json",
+    "response_schema": {"type": "ARRAY", "items": {"type": "STRING"}},
+}
 
 
 # =========================
@@ -17,16 +51,7 @@ IDIOMAS = {
 }
 
 
-def traducir_texto(texto: str, idioma_destino: str, api_key: str) -> str:
-    """
-    Traduce un texto al idioma indicado usando Gemini.
-
-    :param texto: Texto original a traducir
-    :param idioma_destino: Idioma en texto ('español', 'catalán', etc.)
-    :param api_key: API Key de Gemini
-    :return: Texto traducido
-    """
-
+def _prompt_traduccion(texto: str, idioma_destino: str, contexto: str = "") -> str:
     # =========================
     # 1. Validaciones
     # =========================
@@ -38,31 +63,583 @@ def traducir_texto(texto: str, idioma_destino: str, api_key: str) -> str:
     if idioma_destino not in IDIOMAS:
         raise ValueError(f"❌ Idioma no soportado: {idioma_destino}")
 
-    # =========================
-    # 2. Crear cliente Gemini
-    # =========================
-    client = genai.Client(api_key=api_key)
-
     codigo_idioma = IDIOMAS[idioma_destino]
 
     # =========================
-    # 3. Prompt de traducción
+    # 2. Prompt de traducción
     # =========================
-    prompt = (
+    if contexto:
+        return (
+            f"Traduce el siguiente texto al idioma con código '{codigo_idioma}'. "
+            f"Es la continuación de un documento; el contexto previo solo sirve "
+            f"para mantener la coherencia y NO debe traducirse. "
+            f"No añadas explicaciones. Devuelve solo la traducción.\n\n"
+            f"Contexto previo:\n{contexto}\n\n"
+            f"Texto a traducir:\n{texto}"
+        )
+
+    return (
         f"Traduce el siguiente texto al idioma con código '{codigo_idioma}'. "
         f"No añadas explicaciones. Devuelve solo la traducción.\n\n"
         f"{texto}"
     )
 
+
+def traducir_texto(texto: str, idioma_destino: str, api_key: str) -> str:
+    """
+    Traduce un texto al idioma indicado usando Gemini.
+
+    :param texto: Texto original a traducir
+    :param idioma_destino: Idioma en texto ('español', 'catalán', etc.)
+    :param api_key: API Key de Gemini
+    :return: Texto traducido
+    """
+    prompt = _prompt_traduccion(texto, idioma_destino)
+    inicio = time.perf_counter()
+
     # =========================
-    # 4. Llamada a la API
+    # Llamada a la API (planificador compartido)
     # =========================
     try:
-        response = client.models.generate_content(
-            model="gemini-2.5-flash",
-            contents=prompt
+        response = generar_contenido(api_key, MODELO_TRADUCCION, prompt)
+    except Exception as e:
+        raise RuntimeError(f"❌ Error al traducir con Gemini: {e}")
+
+    registrar_traduccion(IDIOMAS[idioma_destino.lower()], len(texto), time.perf_counter() - inicio)
+    return response.text
+
+
+def traducir_texto_stream(texto: str, idioma_destino: str, api_key: str):
+    """
+    Como traducir_texto(), pero devuelve un generador con la traducción
+    por fragmentos según llega. Las validaciones se hacen antes de
+    devolverlo.
+    """
+    prompt = _prompt_traduccion(texto, idioma_destino)
+    inicio = time.perf_counter()
+
+    def fragmentos():
+        try:
+            yield from generar_en_stream(api_key, MODELO_TRADUCCION, prompt)
+        except Exception as e:
+            raise RuntimeError(f"❌ Error al traducir con Gemini: {e}")
+        registrar_traduccion(IDIOMAS[idioma_destino.lower()], len(texto), time.perf_counter() - inicio)
+
+    return fragmentos()
+
+
+# =========================
+# TEXTOS LARGOS
+# =========================
+def _partir(texto: str, separador: re.Pattern) -> list:
+    # Trozos que conservan el separador al final: "".join(trozos) == texto
+    trozos = []
+    inicio = 0
+    for coincidencia in separador.finditer(texto):
+        trozos.append(texto[inicio:coincidencia.end()])
+        inicio = coincidencia.end()
+    if inicio < len(texto):
+        trozos.append(texto[inicio:])
+    return trozos
+
+
+def _unidades(texto: str, max_caracteres: int) -> list:
+    # Párrafos; los que no caben, por frases; las frases que no caben, a trozos fijos
+    unidades = []
+    for parrafo in _partir(texto, _FIN_PARRAFO):
+        if len(parrafo) <= max_caracteres:
+            unidades.append(parrafo)
+            continue
+        for frase in _partir(parrafo, _FIN_FRASE):
+            if len(frase) <= max_caracteres:
+                unidades.append(frase)
+            else:
+                unidades.extend(
+                    frase[i:i + max_caracteres] for i in range(0, len(frase), max_caracteres)
+                )
+    return unidades
+
+
+def dividir_texto(texto: str, max_tokens: int = TOKENS_POR_FRAGMENTO) -> list:
+    """
+    Divide un texto en fragmentos de como mucho `max_tokens` (aprox.),
+    cortando por párrafos y, si no cabe, por frases. Juntar los
+    fragmentos devuelve el texto original exacto.
+    """
+    max_caracteres = max(max_tokens * 4, 1)
+
+    fragmentos = []
+    actual = ""
+    for unidad in _unidades(texto, max_caracteres):
+        if actual and len(actual) + len(unidad) > max_caracteres:
+            fragmentos.append(actual)
+            actual = ""
+        actual += unidad
+    if actual:
+        fragmentos.append(actual)
+    return fragmentos
+
+
+def es_texto_largo(texto: str, max_tokens: int = TOKENS_POR_FRAGMENTO) -> bool:
+    """True si el texto no cabe en un solo fragmento."""
+    return len(texto or "") > max_tokens * 4
+
+
+def _traducir_fragmento(fragmento: str, idioma_destino: str, api_key: str, contexto: str) -> str:
+    # Los espacios y saltos de los extremos no se mandan: se reponen tal cual
+    cuerpo = fragmento.strip()
+    if not cuerpo:
+        return fragmento
+
+    inicio = fragmento[:len(fragmento) - len(fragmento.lstrip())]
+    final = fragmento[len(fragmento.rstrip()):]
+
+    prompt = _prompt_traduccion(cuerpo, idioma_destino, contexto)
+    try:
+        response = generar_contenido(api_key, MODELO_TRADUCCION, prompt)
+    except Exception as e:
+        raise RuntimeError(f"❌ Error al traducir con Gemini: {e}")
+    return inicio + (response.text or "").strip() + final
+
+
+def traducir_por_fragmentos(
+    texto: str,
+    idioma_destino: str,
+    api_key: str,
+    max_tokens: int = TOKENS_POR_FRAGMENTO,
+    solape: bool = False,
+    max_simultaneos: int = MAX_FRAGMENTOS_SIMULTANEOS,
+):
+    """
+    Traduce un texto largo por fragmentos en paralelo y devuelve un
+    generador con las traducciones EN ORDEN: cada fragmento sale en
+    cuanto él y los anteriores están listos.
+
+    Las validaciones se hacen antes de devolver el generador.
+
+    :param solape: Pasa el final del fragmento anterior como contexto
+                   (no se traduce), para mantener términos y estilo
+    """
+    _prompt_traduccion(texto, idioma_destino)
+    fragmentos = dividir_texto(texto, max_tokens)
+    inicio = time.perf_counter()
+
+    def traducciones():
+        with ThreadPoolExecutor(max_workers=max(max_simultaneos, 1)) as ejecutor:
+            futuros = []
+            for i, fragmento in enumerate(fragmentos):
+                contexto = fragmentos[i - 1][-CARACTERES_SOLAPE:].strip() if solape and i else ""
+                # Cada hilo con una copia del contexto (usuario del planificador)
+                futuros.append(ejecutor.submit(
+                    contextvars.copy_context().run,
+                    _traducir_fragmento, fragmento, idioma_destino, api_key, contexto,
+                ))
+            try:
+                for futuro in futuros:
+                    yield futuro.result()
+            finally:
+                for futuro in futuros:
+                    futuro.cancel()
+        registrar_traduccion(IDIOMAS[idioma_destino.lower()], len(texto), time.perf_counter() - inicio)
+
+    return traducciones()
+
+
+def traducir_texto_largo(
+    texto: str,
+    idioma_destino: str,
+    api_key: str,
+    max_tokens: int = TOKENS_POR_FRAGMENTO,
+    solape: bool = False,
+) -> str:
+    """
+    Como traducir_texto(), para textos de cualquier longitud: si el texto
+    cabe en un fragmento hace la misma llamada única; si no, lo traduce
+    por fragmentos en paralelo y los junta en orden.
+    """
+    if not es_texto_largo(texto, max_tokens):
+        return traducir_texto(texto, idioma_destino, api_key)
+    return "".join(traducir_por_fragmentos(texto, idioma_destino, api_key, max_tokens, solape))
+
+
+# =========================
+# MEMORIA DE TRADUCCIÓN
+# =========================
+def _prompt_segmentos(segmentos: list, codigo_idioma: str, contexto: str = "") -> str:
+    previo = ""
+    if contexto:
+        previo = (
+            f"El contexto previo solo sirve para mantener la coherencia y NO debe "
+            f"traducirse.\n\nContexto previo:\n{contexto}\n\n"
         )
-        return response.text
+    return (
+        f"Traduce cada elemento de la lista JSON al idioma con código '{codigo_idioma}'. "
+        f"Son segmentos consecutivos de un mismo documento. Devuelve una lista JSON "
+        f"con exactamente {len(segmentos)} traducciones, en el mismo orden, "
+        f"sin explicaciones.\n\n"
+        f"{previo}"
+        f"{json.dumps(segmentos, ensure_ascii=False)}"
+    )
+
 
+def _traducir_segmentos(segmentos: list, idioma_destino: str, api_key: str, contexto: str = "") -> list:
+    # Una petición estructurada para todo el grupo; si la respuesta no
+    # cuadra, se repite con cada mitad (un segmento suelto va como texto
+    # normal). Un fallo aislado cuesta unas pocas peticiones, no una por
+    # segmento.
+    codigo_idioma = IDIOMAS[idioma_destino.lower()]
+    try:
+        response = generar_contenido(
+            api_key, MODELO_TRADUCCION, _prompt_segmentos(segmentos, codigo_idioma, contexto),
+            config=CONFIG_SEGMENTOS
+        )
+        traducciones = json.loads(response.text)
+        if isinstance(traducciones, list) and len(traducciones) == len(segmentos):
+            return [str(t).strip() for t in traducciones]
+    except (json.JSONDecodeError, TypeError):
+        pass
     except Exception as e:
         raise RuntimeError(f"❌ Error al traducir con Gemini: {e}")
+
+    if len(segmentos) == 1:
+        return [_traducir_fragmento(segmentos[0], idioma_destino, api_key, contexto)]
+
+    mitad = len(segmentos) // 2
+    return (
+        _traducir_segmentos(segmentos[:mitad], idioma_destino, api_key, contexto)
+        + _traducir_segmentos(segmentos[mitad:], idioma_destino, api_key, contexto)
+    )
+
+
+def _elementos_json(fragmentos):
+    # Elementos de una lista JSON según llegan los trozos de la respuesta.
+    # Un elemento a medias espera al siguiente trozo; si la respuesta no es
+    # una lista JSON simplemente no sale ninguno.
+    decodificador = json.JSONDecoder()
+    pendiente = ""
+    for fragmento in fragmentos:
+        pendiente += fragmento
+        while True:
+            pendiente = pendiente.lstrip(" \t\r\n[,")
+            if not pendiente or pendiente[0] == "]":
+                break
+            try:
+                elemento, fin = decodificador.raw_decode(pendiente)
+            except json.JSONDecodeError:
+                break
+            yield elemento
+            pendiente = pendiente[fin:]
+
+
+def _traducir_segmentos_stream(segmentos: list, idioma_destino: str, api_key: str, contexto: str = ""):
+    """
+    Como _traducir_segmentos(), pero genera la traducción de cada segmento
+    en cuanto llega su elemento de la respuesta en streaming. Si faltan
+    elementos, el resto se traduce con _traducir_segmentos().
+
+    El valor de retorno del generador es True si la respuesta traía
+    exactamente un elemento por segmento (solo entonces se guarda).
+    """
+    codigo_idioma = IDIOMAS[idioma_destino.lower()]
+    prompt = _prompt_segmentos(segmentos, codigo_idioma, contexto)
+
+    recibidos = 0
+    try:
+        for traduccion in _elementos_json(
+            generar_en_stream(api_key, MODELO_TRADUCCION, prompt, config=CONFIG_SEGMENTOS)
+        ):
+            if recibidos < len(segmentos):
+                yield str(traduccion).strip()
+            recibidos += 1
+    except Exception as e:
+        raise RuntimeError(f"❌ Error al traducir con Gemini: {e}")
+
+    if recibidos < len(segmentos):
+        yield from _traducir_segmentos(segmentos[recibidos:], idioma_destino, api_key, contexto)
+    return recibidos == len(segmentos)
+
+
+def _valor_final(generador):
+    # Termina un generador ya consumido y devuelve su valor de retorno
+    try:
+        while True:
+            next(generador)
+    except StopIteration as fin:
+        return fin.value
+
+
+def _agrupar(segmentos: list, max_caracteres: int) -> list:
+    grupos = []
+    actual = []
+    tamano = 0
+    for segmento in segmentos:
+        if actual and (tamano + len(segmento) > max_caracteres or len(actual) >= MAX_SEGMENTOS_POR_PETICION):
+            grupos.append(actual)
+            actual, tamano = [], 0
+        actual.append(segmento)
+        tamano += len(segmento)
+    if actual:
+        grupos.append(actual)
+    return grupos
+
+
+def traducir_con_memoria(
+    texto: str,
+    idioma_destino: str,
+    api_key: str,
+    max_tokens: int = TOKENS_POR_FRAGMENTO,
+    max_simultaneos: int = MAX_FRAGMENTOS_SIMULTANEOS,
+):
+    """
+    Traduce usando la memoria de traducción: el texto se parte en
+    segmentos (frases y líneas) y solo los que no están en la memoria
+    para ese idioma van al modelo, agrupados en peticiones estructuradas.
+    Los segmentos nuevos se guardan.
+
+    Como traducir_texto_stream() y traducir_por_fragmentos(solape=True):
+    el primer grupo pendiente llega en streaming, segmento a segmento, y
+    el resto se traduce en paralelo; cada grupo lleva como contexto (sin
+    traducirlo) el texto original que lo precede.
+
+    Devuelve un generador con la traducción EN ORDEN (los segmentos en
+    memoria salen al momento). Las validaciones se hacen antes.
+    """
+    _prompt_traduccion(texto, idioma_destino)
+    codigo_idioma = IDIOMAS[idioma_destino.lower()]
+    comienzo = time.perf_counter()
+
+    # Segmento: (espacio inicial, cuerpo, espacio final), y dónde empieza
+    # cada cuerpo por primera vez para sacar el contexto previo
+    segmentos = []
+    posiciones = {}
+    posicion = 0
+    for trozo in _partir(texto, _FIN_SEGMENTO):
+        cuerpo = trozo.strip()
+        inicio = trozo[:len(trozo) - len(trozo.lstrip())]
+        segmentos.append((inicio, cuerpo, trozo[len(inicio) + len(cuerpo):]))
+        posiciones.setdefault(cuerpo, posicion + len(inicio))
+        posicion += len(trozo)
+
+    cuerpos = list(dict.fromkeys(cuerpo for _, cuerpo, _ in segmentos if cuerpo))
+    hashes = {cuerpo: hash_segmento(cuerpo) for cuerpo in cuerpos}
+    en_memoria = buscar_traducciones(cuerpos, codigo_idioma)
+
+    # El mismo segmento normalizado solo se traduce una vez (la primera
+    # vez que aparece, que es cuando se necesita)
+    primeros = {}
+    for cuerpo in cuerpos:
+        primeros.setdefault(hashes[cuerpo], cuerpo)
+    pendientes = [cuerpo for clave, cuerpo in primeros.items() if clave not in en_memoria]
+    aciertos = len({hashes[c] for c in cuerpos}) - len(pendientes)
+
+    grupos = _agrupar(pendientes, max(max_tokens * 4, 1))
+
+    def contexto(grupo):
+        previo = posiciones[grupo[0]]
+        return texto[max(previo - CARACTERES_SOLAPE, 0):previo].strip()
+
+    def guardar(grupo, traducciones):
+        guardar_traducciones(
+            list(zip(grupo, traducciones)), codigo_idioma, MODELO_TRADUCCION, fallos=len(grupo)
+        )
+
+    def traducir_grupo(grupo):
+        traducciones = _traducir_segmentos(grupo, idioma_destino, api_key, contexto(grupo))
+        guardar(grupo, traducciones)
+        return dict(zip((hashes[c] for c in grupo), traducciones))
+
+    def traducciones():
+        if aciertos:
+            guardar_traducciones([], codigo_idioma, MODELO_TRADUCCION, aciertos=aciertos)
+
+        primero = grupos[0] if grupos else []
+        en_stream = {hashes[c] for c in primero}
+        stream = _traducir_segmentos_stream(primero, idioma_destino, api_key, contexto(primero)) if primero else None
+        recibidas = []
+
+        with ThreadPoolExecutor(max_workers=max(min(max_simultaneos, len(grupos) - 1), 1)) as ejecutor:
+            futuros = {}
+            for grupo in grupos[1:]:
+                futuro = ejecutor.submit(contextvars.copy_context().run, traducir_grupo, grupo)
+                for cuerpo in grupo:
+                    futuros[hashes[cuerpo]] = futuro
+            try:
+                for inicio, cuerpo, final in segmentos:
+                    if not cuerpo:
+                        yield inicio + final
+                        continue
+                    clave = hashes[cuerpo]
+                    if clave not in en_memoria:
+                        if clave in en_stream:
+                            # El stream devuelve los pendientes en el orden del texto
+                            en_memoria[clave] = next(stream)
+                            recibidas.append(en_memoria[clave])
+                        else:
+                            en_memoria.update(futuros[clave].result())
+                    yield inicio + en_memoria[clave] + final
+
+                if stream is not None:
+                    # Se termina de leer la respuesta para saber si cuadraba
+                    cuadra = _valor_final(stream)
+                    guardar(primero, recibidas if cuadra else [])
+            finally:
+                if stream is not None:
+                    stream.close()
+                for futuro in futuros.values():
+                    futuro.cancel()
+        registrar_traduccion(
+            codigo_idioma, len(texto), time.perf_counter() - comienzo, desde_memoria=not pendientes
+        )
+
+    return traducciones()
+
+
+def traducir_texto_con_memoria(texto: str, idioma_destino: str, api_key: str) -> str:
+    """Como traducir_con_memoria(), pero devuelve el texto completo."""
+    return "".join(traducir_con_memoria(texto, idioma_destino, api_key))
+
+
+# =========================
+# VARIOS IDIOMAS EN UNA PETICIÓN
+# =========================
+def _codigos_destino(idiomas_destino: list) -> dict:
+    # {nombre: código}, validando todos los idiomas antes de llamar al modelo
+    if not idiomas_destino:
+        raise ValueError("❌ Selecciona al menos un idioma")
+
+    codigos = {}
+    for idioma in idiomas_destino:
+        idioma = idioma.lower()
+        if idioma not in IDIOMAS:
+            raise ValueError(f"❌ Idioma no soportado: {idioma}")
+        codigos[idioma] = IDIOMAS[idioma]
+    return codigos
+
+
+def _config_multiples(codigos: list) -> dict:
+    return {
+        "response_mime_type": "application/json",
+        "response_schema": {
+            "type": "OBJECT",
+            "properties": {codigo: {"type": "STRING"} for codigo in codigos},
+            "required": codigos,
+            "property_ordering": codigos,
+        },
+    }
+
+
+def _traducir_multiples_fragmento(fragmento: str, codigos: list, api_key: str) -> dict:
+    cuerpo = fragmento.strip()
+    if not cuerpo:
+        return {codigo: fragmento for codigo in codigos}
+
+    inicio = fragmento[:len(fragmento) - len(fragmento.lstrip())]
+    final = fragmento[len(fragmento.rstrip()):]
+
+    prompt = (
+        f"Traduce el siguiente texto a cada uno de estos idiomas (códigos): "
+        f"{', '.join(codigos)}. Devuelve un objeto JSON con una clave por código "
+        f"y la traducción como valor, sin explicaciones.\n\n"
+        f"{cuerpo}"
+    )
+    try:
+        response = generar_contenido(api_key, MODELO_TRADUCCION, prompt, config=_config_multiples(codigos))
+        traducciones = json.loads(response.text)
+    except Exception as e:
+        raise RuntimeError(f"❌ Error al traducir con Gemini: {e}")
+
+    return {codigo: inicio + (traducciones.get(codigo) or "").strip() + final for codigo in codigos}
+
+
+def traducir_multiples(
+    texto: str,
+    idiomas_destino: list,
+    api_key: str,
+    max_tokens: int = TOKENS_POR_FRAGMENTO,
+    max_simultaneos: int = MAX_FRAGMENTOS_SIMULTANEOS,
+) -> dict:
+    """
+    Traduce un texto a varios idiomas con una sola petición estructurada
+    (una clave por código de idioma en la respuesta). Los textos largos se
+    parten en fragmentos que se traducen en paralelo, cada uno a todos
+    los idiomas a la vez.
+
+    :param idiomas_destino: Idiomas en texto ('español', 'catalán'...)
+    :return: {idioma: traducción}
+    """
+    if not texto or not texto.strip():
+        raise ValueError("❌ El texto a traducir está vacío")
+    codigos = _codigos_destino(idiomas_destino)
+    lista_codigos = list(dict.fromkeys(codigos.values()))
+    inicio = time.perf_counter()
+
+    fragmentos = dividir_texto(texto, max_tokens)
+    if len(fragmentos) == 1:
+        partes = [_traducir_multiples_fragmento(fragmentos[0], lista_codigos, api_key)]
+    else:
+        with ThreadPoolExecutor(max_workers=max(max_simultaneos, 1)) as ejecutor:
+            partes = list(ejecutor.map(
+                lambda fragmento, contexto: contexto.run(
+                    _traducir_multiples_fragmento, fragmento, lista_codigos, api_key
+                ),
+                fragmentos,
+                [contextvars.copy_context() for _ in fragmentos],
+            ))
+
+    registrar_traduccion(lista_codigos, len(texto), time.perf_counter() - inicio)
+    return {
+        idioma: "".join(parte[codigo] for parte in partes)
+        for idioma, codigo in codigos.items()
+    }
+
+
+# =========================
+# TRADUCCIÓN DE LA GALERÍA POR LOTES
+# =========================
+def traducir_imagenes(
+    usuario_id: int,
+    imagenes_ids: list,
+    idiomas_destino: list,
+    api_key: str,
+    max_simultaneos: int = MAX_FRAGMENTOS_SIMULTANEOS,
+):
+    """
+    Traduce el texto guardado de varias imágenes de la galería a uno o
+    varios idiomas, en paralelo, y guarda cada resultado en la tabla
+    traducciones en cuanto termina. Las imágenes sin texto se omiten.
+
+    Devuelve cada resultado en cuanto termina (generador), no en el orden
+    de entrada. Una imagen que falla no detiene el resto.
+
+    :return: dicts {"imagen_id", "traducciones": {idioma: texto}, "error", "segundos"}
+    """
+    codigos = _codigos_destino(idiomas_destino)
+    textos = obtener_textos_imagenes(imagenes_ids, usuario_id)
+
+    def procesar(imagen_id, texto):
+        inicio = time.perf_counter()
+        resultado = {"imagen_id": imagen_id, "traducciones": None, "error": None}
+        try:
+            traducciones = traducir_multiples(texto, list(codigos), api_key)
+            guardar_traducciones_imagen(
+                imagen_id, {codigos[idioma]: traduccion for idioma, traduccion in traducciones.items()}
+            )
+            resultado["traducciones"] = traducciones
+        except Exception as e:
+            resultado["error"] = str(e)
+
+        resultado["segundos"] = time.perf_counter() - inicio
+        return resultado
+
+    with ThreadPoolExecutor(max_workers=max(max_simultaneos, 1)) as ejecutor:
+        futuros = [
+            ejecutor.submit(contextvars.copy_context().run, procesar, imagen_id, texto)
+            for imagen_id, texto in textos.items()
+        ]
+        try:
+            for futuro in as_completed(futuros):
+                yield futuro.result()
+        finally:
+            # Si se deja de consumir el generador, no empezar los pendientes
+            for futuro in futuros:
+                futuro.cancel()